@@ -0,0 +1,328 @@
+"""
+ANN Index Module
+Pluggable nearest-neighbour index over every stored chunk embedding.
+- exact: flat brute-force scan (always 100% recall)
+- ivf:   inverted-file index with spherical k-means centroids; ANN_NPROBE
+         trades recall for latency
+The index is built incrementally as documents are stored and persisted to
+local disk so a restart does not have to rebuild it. Each server process
+holds its own copy; mongodb_client.sync_ann_index reconciles it with the
+stored embeddings at startup and periodically, which also picks up uploads
+handled by other processes.
+"""
+
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple, Iterable
+import numpy as np
+
+ANN_BACKEND = os.getenv("ANN_BACKEND", "exact")        # "exact" or "ivf"
+ANN_INDEX_DIR = os.getenv("ANN_INDEX_DIR", "ann_index")
+ANN_NLIST = int(os.getenv("ANN_NLIST", "64"))            # number of IVF clusters
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))           # clusters scanned per query
+ANN_TRAIN_SIZE = int(os.getenv("ANN_TRAIN_SIZE", "0"))   # vectors needed before training (0 = 40 * nlist)
+
+INDEX_FILENAME = "index.npz"
+
+# (document_id, chunk_id, cosine similarity)
+SearchHit = Tuple[str, str, float]
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+class ExactIndex:
+    """Flat index: append-only normalized matrix with per-row document labels"""
+
+    kind = "exact"
+
+    def __init__(self, dim: Optional[int] = None):
+        self.dim = dim
+        self._vectors = np.zeros((0, dim or 0), dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._doc_codes = np.zeros(0, dtype=np.int32)
+        self._size = 0
+        self.chunk_ids: List[str] = []
+        self.document_names: List[str] = []
+        self._document_codes = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return int(self._alive[:self._size].sum())
+
+    # Building
+    def add(self, document_id: str, chunk_ids: Sequence[str], embeddings: Sequence[Sequence[float]]):
+        """Append one document's chunk embeddings"""
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        if vectors.size == 0:
+            return
+        with self._lock:
+            if self.dim is None or self._size == 0 and self._vectors.shape[1] != vectors.shape[1]:
+                self.dim = vectors.shape[1]
+                self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {self.dim}")
+
+            n = vectors.shape[0]
+            start = self._size
+            self._reserve(start + n)
+            self._vectors[start:start + n] = vectors
+            self._alive[start:start + n] = True
+            self._doc_codes[start:start + n] = self._document_code(document_id)
+            self.chunk_ids.extend(chunk_ids)
+            self._size += n
+            self._on_add(start, vectors)
+
+    def remove_document(self, document_id: str):
+        """Drop every chunk of a document (rows are tombstoned, then compacted)"""
+        with self._lock:
+            code = self._document_codes.get(document_id)
+            if code is None:
+                return
+            self._alive[:self._size][self._doc_codes[:self._size] == code] = False
+            if self._size and len(self) < self._size // 2:
+                self._compact()
+
+    def clear(self):
+        with self._lock:
+            self.__init__(self.dim)
+
+    def document_counts(self) -> Dict[str, int]:
+        """Live chunk count per document"""
+        with self._lock:
+            codes = self._doc_codes[:self._size][self._alive[:self._size]]
+            counts = np.bincount(codes, minlength=len(self.document_names)) if codes.size else []
+            return {self.document_names[code]: int(count) for code, count in enumerate(counts) if count}
+
+    def _reserve(self, capacity: int):
+        if capacity <= self._vectors.shape[0]:
+            return
+        new_capacity = max(capacity, 2 * self._vectors.shape[0], 1024)
+        vectors = np.zeros((new_capacity, self.dim), dtype=np.float32)
+        vectors[:self._size] = self._vectors[:self._size]
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        codes = np.zeros(new_capacity, dtype=np.int32)
+        codes[:self._size] = self._doc_codes[:self._size]
+        self._vectors, self._alive, self._doc_codes = vectors, alive, codes
+        self._on_reserve(new_capacity)
+
+    def _document_code(self, document_id: str) -> int:
+        code = self._document_codes.get(document_id)
+        if code is None:
+            code = len(self.document_names)
+            self.document_names.append(document_id)
+            self._document_codes[document_id] = code
+        return code
+
+    def _compact(self):
+        keep = np.flatnonzero(self._alive[:self._size])
+        self._vectors = np.ascontiguousarray(self._vectors[keep])
+        self._doc_codes = self._doc_codes[keep]
+        self._alive = np.ones(len(keep), dtype=bool)
+        self.chunk_ids = [self.chunk_ids[i] for i in keep]
+        self._size = len(keep)
+        self._on_compact(keep)
+
+    # Hooks for subclasses
+    def _on_add(self, start: int, vectors: np.ndarray):
+        pass
+
+    def _on_reserve(self, capacity: int):
+        pass
+
+    def _on_compact(self, keep: np.ndarray):
+        pass
+
+    def _candidate_rows(self, query: np.ndarray, k: int) -> Optional[np.ndarray]:
+        """Rows to score for a query; None means every row"""
+        return None
+
+    # Searching
+    def search(
+        self,
+        query_embedding: Sequence[float],
+        k: int = 5,
+        document_ids: Optional[Iterable[str]] = None
+    ) -> List[SearchHit]:
+        """Top-k chunks across the index, optionally restricted to some documents"""
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        with self._lock:
+            if self._size == 0 or k <= 0:
+                return []
+            rows = self._candidate_rows(query, k)
+            hits = self._score(query, rows, k, document_ids)
+            if rows is not None and len(hits) < k:
+                # Probed clusters were too sparse for this filter - fall back to a full scan
+                hits = self._score(query, None, k, document_ids)
+            return hits
+
+    def _score(self, query, rows, k, document_ids) -> List[SearchHit]:
+        if rows is None:
+            rows = np.arange(self._size)
+        mask = self._alive[rows]
+        if document_ids is not None:
+            codes = [self._document_codes[d] for d in document_ids if d in self._document_codes]
+            mask &= np.isin(self._doc_codes[rows], codes)
+        rows = rows[mask]
+        if len(rows) == 0:
+            return []
+
+        scores = self._vectors[rows] @ query
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(rows) else np.arange(len(rows))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            (self.document_names[self._doc_codes[rows[i]]], self.chunk_ids[rows[i]], float(scores[i]))
+            for i in top
+        ]
+
+    # Persistence
+    def _state(self) -> dict:
+        return {
+            "kind": np.array(self.kind),
+            "vectors": self._vectors[:self._size],
+            "alive": self._alive[:self._size],
+            "doc_codes": self._doc_codes[:self._size],
+            "chunk_ids": np.array(self.chunk_ids, dtype=str),
+            "document_names": np.array(self.document_names, dtype=str)
+        }
+
+    def _restore(self, state):
+        self._vectors = np.ascontiguousarray(state["vectors"], dtype=np.float32)
+        self.dim = self._vectors.shape[1] if self._vectors.shape[0] else None
+        self._alive = state["alive"].astype(bool)
+        self._doc_codes = state["doc_codes"].astype(np.int32)
+        self._size = self._vectors.shape[0]
+        self.chunk_ids = state["chunk_ids"].tolist()
+        self.document_names = state["document_names"].tolist()
+        self._document_codes = {name: code for code, name in enumerate(self.document_names)}
+
+    def save(self, directory: str = ANN_INDEX_DIR):
+        """Atomically write the index to directory/index.npz"""
+        with self._lock:
+            state = self._state()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, INDEX_FILENAME)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **state)
+        os.replace(tmp_path, path)
+
+
+class IVFIndex(ExactIndex):
+    """Inverted-file index: only the nprobe clusters nearest the query are scanned"""
+
+    kind = "ivf"
+
+    def __init__(self, dim: Optional[int] = None, nlist: int = ANN_NLIST, nprobe: int = ANN_NPROBE,
+                 train_size: int = ANN_TRAIN_SIZE):
+        super().__init__(dim)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size or 40 * nlist
+        self.centroids: Optional[np.ndarray] = None
+        self._assign = np.zeros(0, dtype=np.int32)
+        self._lists: Optional[List[np.ndarray]] = None
+
+    def clear(self):
+        with self._lock:
+            self.__init__(self.dim, self.nlist, self.nprobe, self.train_size)
+
+    def _on_reserve(self, capacity: int):
+        assign = np.full(capacity, -1, dtype=np.int32)
+        assign[:self._size] = self._assign[:self._size]
+        self._assign = assign
+
+    def _on_add(self, start: int, vectors: np.ndarray):
+        if self.centroids is None:
+            if len(self) >= self.train_size:
+                self.train()
+            return
+        self._assign[start:start + len(vectors)] = np.argmax(vectors @ self.centroids.T, axis=1)
+        self._lists = None
+
+    def _on_compact(self, keep: np.ndarray):
+        self._assign = self._assign[keep]
+        self._lists = None
+
+    def train(self, iterations: int = 10, sample_size: int = 50000, seed: int = 0):
+        """Fit spherical k-means centroids on the live vectors and assign every row"""
+        with self._lock:
+            live = np.flatnonzero(self._alive[:self._size])
+            if len(live) < self.nlist:
+                return
+            rng = np.random.default_rng(seed)
+            sample = self._vectors[rng.choice(live, min(sample_size, len(live)), replace=False)]
+            centroids = sample[rng.choice(len(sample), self.nlist, replace=False)].copy()
+            for _ in range(iterations):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, sample)
+                empty = np.bincount(labels, minlength=self.nlist) == 0
+                sums[empty] = centroids[empty]
+                centroids = _normalize(sums)
+            self.centroids = centroids
+            self._assign[:self._size] = np.argmax(self._vectors[:self._size] @ centroids.T, axis=1)
+            self._lists = None
+
+    def _inverted_lists(self) -> List[np.ndarray]:
+        if self._lists is None:
+            assign = self._assign[:self._size]
+            order = np.argsort(assign, kind="stable")
+            bounds = np.searchsorted(assign[order], np.arange(self.nlist + 1))
+            self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(self.nlist)]
+        return self._lists
+
+    def _candidate_rows(self, query: np.ndarray, k: int) -> Optional[np.ndarray]:
+        if self.centroids is None or self.nprobe >= self.nlist:
+            return None
+        probes = np.argpartition(-(self.centroids @ query), self.nprobe - 1)[:self.nprobe]
+        lists = self._inverted_lists()
+        return np.concatenate([lists[p] for p in probes])
+
+    def _state(self) -> dict:
+        state = super()._state()
+        state["assign"] = self._assign[:self._size]
+        state["params"] = np.array([self.nlist, self.nprobe, self.train_size])
+        if self.centroids is not None:
+            state["centroids"] = self.centroids
+        return state
+
+    def _restore(self, state):
+        super()._restore(state)
+        self.nlist, _, self.train_size = (int(v) for v in state["params"])
+        self._assign = state["assign"].astype(np.int32)
+        self.centroids = state["centroids"] if "centroids" in state.files else None
+        self._lists = None
+
+
+INDEX_TYPES = {
+    ExactIndex.kind: ExactIndex,
+    IVFIndex.kind: IVFIndex
+}
+
+def create_index(backend: str = ANN_BACKEND) -> ExactIndex:
+    """Create an empty index for the configured backend"""
+    if backend not in INDEX_TYPES:
+        raise ValueError(f"Unknown ANN backend '{backend}'. Choose from: {', '.join(INDEX_TYPES)}")
+    return INDEX_TYPES[backend]()
+
+def load_index(directory: str = ANN_INDEX_DIR, backend: str = ANN_BACKEND) -> Optional[ExactIndex]:
+    """Load a persisted index, or None if there is none for this backend"""
+    path = os.path.join(directory, INDEX_FILENAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as state:
+            if str(state["kind"]) != backend:
+                print(f"⚠️ Persisted ANN index is '{state['kind']}', configured backend is '{backend}' - rebuilding")
+                return None
+            index = create_index(backend)
+            index._restore(state)
+        return index
+    except Exception as e:
+        print(f"⚠️ Could not load ANN index from {path}: {e}")
+        return None
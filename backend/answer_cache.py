@@ -0,0 +1,150 @@
+"""
+Answer Cache Module
+Semantic cache of RAG answers. An entry is keyed by document id and the
+question embedding; a lookup hits when a cached question for the same
+document is at least ANSWER_CACHE_THRESHOLD cosine-similar AND retrieval
+returned the exact same chunk set, so re-indexed or changed content never
+serves a stale answer. Entries are evicted LRU and expire after a TTL.
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(6 * 3600)))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+
+def chunk_set_signature(chunks: Sequence[str]) -> str:
+    """Order-insensitive hash of the retrieved chunk texts"""
+    digest = hashlib.sha256()
+    for chunk_digest in sorted(hashlib.sha256(chunk.encode("utf-8")).digest() for chunk in chunks):
+        digest.update(chunk_digest)
+    return digest.hexdigest()
+
+@dataclass
+class CachedAnswer:
+    document_id: str
+    chunk_signature: str
+    embedding: np.ndarray      # unit-normalized question embedding
+    response: str
+    sources: List[str]
+    expires_at: float
+
+class AnswerCache:
+    def __init__(
+        self,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        enabled: bool = ANSWER_CACHE_ENABLED
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.enabled = enabled
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        # (document_id, chunk_signature) -> entry ids, so a lookup only compares candidates that share the chunk set
+        self._by_chunks: Dict[Tuple[str, str], List[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm > 0 else vector
+
+    def get(self, document_id: str, query_embedding: Sequence[float], chunks: Sequence[str]) -> Optional[CachedAnswer]:
+        """Best cached answer for a similar question over the same retrieved chunks"""
+        if not self.enabled:
+            return None
+        signature = chunk_set_signature(chunks)
+        query = self._normalize(query_embedding)
+        now = time.time()
+        with self._lock:
+            candidates = []
+            for entry_id in list(self._by_chunks.get((document_id, signature), ())):
+                entry = self._entries[entry_id]
+                if entry.expires_at < now:
+                    self._remove(entry_id)
+                    self.expirations += 1
+                else:
+                    candidates.append(entry_id)
+            if candidates:
+                similarities = np.stack([self._entries[i].embedding for i in candidates]) @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    entry_id = candidates[best]
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return self._entries[entry_id]
+            self.misses += 1
+            return None
+
+    def put(self, document_id: str, query_embedding: Sequence[float], chunks: Sequence[str], response: str, sources: List[str]):
+        if not self.enabled:
+            return
+        signature = chunk_set_signature(chunks)
+        entry = CachedAnswer(
+            document_id=document_id,
+            chunk_signature=signature,
+            embedding=self._normalize(query_embedding),
+            response=response,
+            sources=list(sources),
+            expires_at=time.time() + self.ttl_seconds
+        )
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            self._by_chunks.setdefault((document_id, signature), []).append(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        key = (entry.document_id, entry.chunk_signature)
+        ids = self._by_chunks.get(key)
+        if ids is not None:
+            ids.remove(entry_id)
+            if not ids:
+                del self._by_chunks[key]
+
+    def invalidate(self, document_id: Optional[str] = None):
+        """Drop one document's answers, or everything"""
+        with self._lock:
+            if document_id is None:
+                self._entries.clear()
+                self._by_chunks.clear()
+                return
+            for entry_id in [i for i, entry in self._entries.items() if entry.document_id == document_id]:
+                self._remove(entry_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+answer_cache = AnswerCache()
@@ -0,0 +1,310 @@
+"""
+Audio Processing Module
+PCM helpers for the voice endpoints.
+- EnergyVAD: streaming voice-activity segmenter for 16-bit mono PCM. Speech
+  is any frame sufficiently louder than a running estimate of the noise
+  floor; a segment ends after VAD_HANGOVER_MS of silence.
+- pcm16_to_wav: wrap raw PCM in a WAV container for Whisper
+- preprocess_for_stt: shrink an uploaded recording before it goes to
+  Whisper - downmix to mono, resample to 16 kHz, trim leading/trailing
+  silence and optionally re-encode. Everything happens on in-memory
+  buffers (no temp files, no ffmpeg subprocess). WAV is handled with the
+  standard library; other containers (such as the browser's WebM/Opus) and
+  re-encoding use PyAV (`av`, in requirements.txt). Without it they are
+  passed through unchanged.
+"""
+
+import io
+import os
+import time
+import wave
+import importlib.util
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, List, Tuple
+import numpy as np
+
+VAD_FRAME_MS = int(os.getenv("VAD_FRAME_MS", "30"))
+VAD_MARGIN_DB = float(os.getenv("VAD_MARGIN_DB", "10"))
+VAD_MIN_DBFS = float(os.getenv("VAD_MIN_DBFS", "-50"))
+VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", "600"))
+VAD_MIN_SPEECH_MS = int(os.getenv("VAD_MIN_SPEECH_MS", "250"))
+VAD_MAX_SEGMENT_MS = int(os.getenv("VAD_MAX_SEGMENT_MS", "15000"))
+VAD_PRE_ROLL_MS = int(os.getenv("VAD_PRE_ROLL_MS", "200"))
+
+STT_PREPROCESS = os.getenv("STT_PREPROCESS", "1") == "1"
+STT_SAMPLE_RATE = int(os.getenv("STT_SAMPLE_RATE", "16000"))
+# Frames quieter than the loudest frame by more than this are trimmable silence
+STT_TRIM_RANGE_DB = float(os.getenv("STT_TRIM_RANGE_DB", "35"))
+STT_TRIM_PAD_MS = int(os.getenv("STT_TRIM_PAD_MS", "150"))
+# "wav" (16-bit PCM), or "flac" / "opus" when PyAV is installed
+STT_AUDIO_CODEC = os.getenv("STT_AUDIO_CODEC", "wav")
+HAVE_AV = importlib.util.find_spec("av") is not None
+
+FULL_SCALE = 32768.0
+
+def frame_dbfs(samples: np.ndarray) -> float:
+    """RMS level of int16 samples in dB relative to full scale"""
+    if samples.size == 0:
+        return -120.0
+    rms = float(np.sqrt(np.mean(samples.astype(np.float64) ** 2)))
+    return 20 * np.log10(max(rms, 1e-6) / FULL_SCALE)
+
+def pcm16_to_wav(pcm: bytes, sample_rate: int, channels: int = 1) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+class EnergyVAD:
+    """
+    Cuts a stream of 16-bit mono PCM into speech segments. feed() returns
+    the segments it completed; flush() returns whatever is still open once
+    the stream ends. Bursts shorter than min_speech_ms are dropped as noise,
+    and a segment is cut at max_segment_ms even mid-speech.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        frame_ms: int = VAD_FRAME_MS,
+        margin_db: float = VAD_MARGIN_DB,
+        min_dbfs: float = VAD_MIN_DBFS,
+        hangover_ms: int = VAD_HANGOVER_MS,
+        min_speech_ms: int = VAD_MIN_SPEECH_MS,
+        max_segment_ms: int = VAD_MAX_SEGMENT_MS,
+        pre_roll_ms: int = VAD_PRE_ROLL_MS
+    ):
+        self.sample_rate = sample_rate
+        self.frame_samples = max(sample_rate * frame_ms // 1000, 1)
+        self.frame_ms = frame_ms
+        self.margin_db = margin_db
+        self.min_dbfs = min_dbfs
+        self.hangover_frames = max(hangover_ms // frame_ms, 1)
+        self.min_speech_frames = max(min_speech_ms // frame_ms, 1)
+        self.max_segment_frames = max(max_segment_ms // frame_ms, 1)
+        self.noise_db = min_dbfs
+        self._pending = b""
+        # Recent silent frames, prepended when speech starts so onsets are not clipped
+        self.pad_frames = max(pre_roll_ms // frame_ms, 0)
+        self._pre_roll: Deque[bytes] = deque(maxlen=self.pad_frames)
+        self._segment: List[bytes] = []
+        self._speech_frames = 0
+        self._silent_run = 0
+        self.frames = 0
+
+    @property
+    def in_speech(self) -> bool:
+        return bool(self._segment)
+
+    @property
+    def duration_ms(self) -> int:
+        return self.frames * self.frame_ms
+
+    def _is_speech(self, level_db: float) -> bool:
+        speech = level_db > self.min_dbfs and level_db > self.noise_db + self.margin_db
+        if not speech:
+            # Track the noise floor on non-speech frames only
+            self.noise_db = 0.95 * self.noise_db + 0.05 * max(level_db, self.min_dbfs - 30)
+        return speech
+
+    def feed(self, pcm: bytes) -> List[bytes]:
+        data = self._pending + pcm
+        frame_bytes = self.frame_samples * 2
+        usable = len(data) - len(data) % frame_bytes
+        self._pending = data[usable:]
+        segments = []
+        for offset in range(0, usable, frame_bytes):
+            frame = data[offset:offset + frame_bytes]
+            self.frames += 1
+            speech = self._is_speech(frame_dbfs(np.frombuffer(frame, dtype="<i2")))
+            if not self._segment:
+                if speech:
+                    self._segment = [*self._pre_roll, frame]
+                    self._pre_roll.clear()
+                    self._speech_frames = 1
+                    self._silent_run = 0
+                else:
+                    self._pre_roll.append(frame)
+                continue
+
+            self._segment.append(frame)
+            if speech:
+                self._speech_frames += 1
+                self._silent_run = 0
+            else:
+                self._silent_run += 1
+            if self._silent_run >= self.hangover_frames or len(self._segment) >= self.max_segment_frames:
+                segment = self._close()
+                if segment:
+                    segments.append(segment)
+        return segments
+
+    def flush(self) -> List[bytes]:
+        """Close the open segment (the stream ended)"""
+        if self._pending and self._segment:
+            self._segment.append(self._pending[:len(self._pending) & ~1])
+        self._pending = b""
+        segment = self._close()
+        return [segment] if segment else []
+
+    def _close(self) -> bytes:
+        frames, speech_frames = self._segment, self._speech_frames
+        # Keep as much trailing silence as leading pre-roll, not the whole hangover
+        trailing = max(self._silent_run - self.pad_frames, 0)
+        if trailing:
+            frames = frames[:-trailing]
+        self._segment = []
+        self._speech_frames = 0
+        self._silent_run = 0
+        if speech_frames < self.min_speech_frames:
+            return b""
+        return b"".join(frames)
+
+@dataclass
+class PreprocessResult:
+    audio: bytes
+    filename: str
+    original_bytes: int
+    processed_bytes: int
+    original_ms: int
+    processed_ms: int
+    elapsed_ms: float
+    applied: bool
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.processed_bytes
+
+def is_wav(data: bytes) -> bool:
+    return len(data) >= 12 and data[:4] == b"RIFF" and data[8:12] == b"WAVE"
+
+def decode_wav(data: bytes) -> Tuple[np.ndarray, int]:
+    """float32 samples shaped (frames, channels) and the sample rate"""
+    with wave.open(io.BytesIO(data), "rb") as wav:
+        channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) * 256
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32)
+    elif width == 3:
+        bytes_ = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        samples = ((bytes_[:, 0] << 8 | bytes_[:, 1] << 16 | bytes_[:, 2] << 24) >> 16).astype(np.float32)
+    elif width == 4:
+        samples = (np.frombuffer(raw, dtype="<i4") >> 16).astype(np.float32)
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width}")
+    return samples.reshape(-1, channels), rate
+
+def decode_with_av(data: bytes) -> Tuple[np.ndarray, int]:
+    """Any container/codec PyAV can read, decoded straight to 16-bit mono at STT_SAMPLE_RATE"""
+    import av
+    
+    parts = []
+    with av.open(io.BytesIO(data)) as container:
+        resampler = av.AudioResampler(format="s16", layout="mono", rate=STT_SAMPLE_RATE)
+        for frame in container.decode(audio=0):
+            parts.extend(out.to_ndarray().reshape(-1) for out in resampler.resample(frame))
+        parts.extend(out.to_ndarray().reshape(-1) for out in resampler.resample(None))
+    samples = np.concatenate(parts).astype(np.float32) if parts else np.zeros(0, dtype=np.float32)
+    return samples.reshape(-1, 1), STT_SAMPLE_RATE
+
+def resample(samples: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """Mono resampling: windowed-sinc low-pass (when downsampling) then linear interpolation"""
+    if source_rate == target_rate or samples.size == 0:
+        return samples
+    if target_rate < source_rate:
+        cutoff = 0.45 * target_rate / source_rate  # cycles per input sample, a little under Nyquist
+        taps = 2 * int(4 / cutoff) + 1
+        n = np.arange(taps) - (taps - 1) / 2
+        kernel = np.sinc(2 * cutoff * n) * np.hamming(taps)
+        samples = np.convolve(samples, (kernel / kernel.sum()).astype(np.float32), mode="same")
+    positions = np.arange(0, samples.size, source_rate / target_rate)
+    return np.interp(positions, np.arange(samples.size), samples).astype(np.float32)
+
+def trim_silence(samples: np.ndarray, sample_rate: int, frame_ms: int = VAD_FRAME_MS) -> np.ndarray:
+    """Drop leading and trailing frames well below the recording's loudest frame"""
+    frame = max(sample_rate * frame_ms // 1000, 1)
+    count = samples.size // frame
+    if count == 0:
+        return samples
+    frames = samples[:count * frame].reshape(count, frame).astype(np.float64)
+    levels = 20 * np.log10(np.maximum(np.sqrt(np.mean(frames ** 2, axis=1)), 1e-6) / FULL_SCALE)
+    loud = np.flatnonzero(levels > max(VAD_MIN_DBFS, levels.max() - STT_TRIM_RANGE_DB))
+    if loud.size == 0:
+        return samples
+    pad = STT_TRIM_PAD_MS * sample_rate // 1000
+    start = max(loud[0] * frame - pad, 0)
+    end = min((loud[-1] + 1) * frame + pad, samples.size)
+    return samples[start:end]
+
+def encode_with_av(pcm: np.ndarray, sample_rate: int, codec: str) -> Tuple[bytes, str]:
+    import av
+    
+    container_format, codec_name, extension = {
+        "flac": ("flac", "flac", "flac"),
+        "opus": ("ogg", "libopus", "ogg")
+    }[codec]
+    buffer = io.BytesIO()
+    with av.open(buffer, mode="w", format=container_format) as container:
+        stream = container.add_stream(codec_name, rate=sample_rate, layout="mono")
+        frame = av.AudioFrame.from_ndarray(pcm.reshape(1, -1), format="s16", layout="mono")
+        frame.sample_rate = sample_rate
+        for packet in stream.encode(frame):
+            container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return buffer.getvalue(), extension
+
+def preprocess_for_stt(data: bytes, filename: str = "audio.wav", codec: str = STT_AUDIO_CODEC) -> PreprocessResult:
+    """
+    Normalize a recording for Whisper: mono, STT_SAMPLE_RATE, silence
+    trimmed, re-encoded with `codec`. Input that cannot be decoded here is
+    returned unchanged (applied=False), as is output that would be larger.
+    """
+    started = time.perf_counter()
+    
+    def unchanged() -> PreprocessResult:
+        return PreprocessResult(data, filename, len(data), len(data), 0, 0, round((time.perf_counter() - started) * 1000, 1), False)
+    
+    try:
+        if is_wav(data):
+            samples, rate = decode_wav(data)
+        elif HAVE_AV:
+            samples, rate = decode_with_av(data)
+        else:
+            return unchanged()
+        original_ms = samples.shape[0] * 1000 // rate if rate else 0
+        mono = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+        mono = trim_silence(resample(mono, rate, STT_SAMPLE_RATE), STT_SAMPLE_RATE)
+        pcm = np.clip(np.round(mono), -32768, 32767).astype("<i2")
+        
+        stem = os.path.splitext(os.path.basename(filename or "audio"))[0] or "audio"
+        audio, extension = None, "wav"
+        if codec in ("flac", "opus") and HAVE_AV:
+            try:
+                audio, extension = encode_with_av(pcm, STT_SAMPLE_RATE, codec)
+            except Exception as e:
+                print(f"⚠️ {codec} encoding failed, sending WAV: {e}")
+        if audio is None:
+            audio = pcm16_to_wav(pcm.tobytes(), STT_SAMPLE_RATE)
+    except Exception as e:
+        print(f"⚠️ Audio preprocessing failed, sending the original: {e}")
+        return unchanged()
+    
+    if len(audio) >= len(data):
+        return unchanged()
+    return PreprocessResult(
+        audio=audio,
+        filename=f"{stem}.{extension}",
+        original_bytes=len(data),
+        processed_bytes=len(audio),
+        original_ms=original_ms,
+        processed_ms=pcm.size * 1000 // STT_SAMPLE_RATE,
+        elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
+        applied=True
+    )
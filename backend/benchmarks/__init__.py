@@ -0,0 +1,5 @@
+"""
+Benchmarks
+Standalone performance scripts. Run from the backend directory, e.g.
+    python -m benchmarks.bench_retrieval
+"""
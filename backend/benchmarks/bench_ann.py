@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+ANN Benchmark
+Recall@k and query latency of the IVF index against the exact
+VectorIndex path, for a sweep of nprobe values
+"""
+
+import argparse
+import time
+import numpy as np
+
+from ann_index import IVFIndex
+from vector_search import VectorIndex
+
+DIMENSIONS = 384
+
+def make_corpus(n, topics, rng):
+    """Clustered synthetic embeddings - real chunk embeddings group by topic too"""
+    centers = rng.standard_normal((topics, DIMENSIONS)).astype(np.float32)
+    labels = rng.integers(0, topics, n)
+    return centers[labels] + 1.5 * rng.standard_normal((n, DIMENSIONS)).astype(np.float32), centers
+
+def run_benchmark(n, queries, k, nlist, nprobes, documents):
+    rng = np.random.default_rng(7)
+    vectors, centers = make_corpus(n, topics=nlist * 2, rng=rng)
+    chunk_ids = [str(i) for i in range(n)]
+    query_set = centers[rng.integers(0, len(centers), queries)] + 1.5 * rng.standard_normal((queries, DIMENSIONS)).astype(np.float32)
+
+    exact = VectorIndex(vectors, chunk_ids, chunk_ids)
+    truth = [set(exact.search(q, k)) for q in query_set]
+    start = time.perf_counter()
+    for q in query_set:
+        exact.search(q, k)
+    exact_ms = (time.perf_counter() - start) * 1000 / queries
+
+    index = IVFIndex(nlist=nlist)
+    start = time.perf_counter()
+    per_document = n // documents
+    for d in range(documents):
+        rows = slice(d * per_document, (d + 1) * per_document)
+        index.add(f"doc-{d}", chunk_ids[rows], vectors[rows])
+    build_s = time.perf_counter() - start
+
+    print("=" * 64)
+    print(f"ANN benchmark (n={n}, dim={DIMENSIONS}, k={k}, nlist={nlist}, {queries} queries)")
+    print(f"IVF incremental build over {documents} documents: {build_s:.2f}s")
+    print("=" * 64)
+    print(f"{'path':>12} {'recall@k':>10} {'ms/query':>10} {'speedup':>9}")
+    print(f"{'exact':>12} {1.0:>10.3f} {exact_ms:>10.3f} {1.0:>8.1f}x")
+
+    for nprobe in nprobes:
+        index.nprobe = nprobe
+        start = time.perf_counter()
+        results = [index.search(q, k) for q in query_set]
+        ivf_ms = (time.perf_counter() - start) * 1000 / queries
+        recall = np.mean([len(truth[i] & {chunk for _, chunk, _ in hits}) / k for i, hits in enumerate(results)])
+        print(f"{'ivf/' + str(nprobe):>12} {recall:>10.3f} {ivf_ms:>10.3f} {exact_ms / ivf_ms:>8.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--nlist", type=int, default=64)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--documents", type=int, default=50)
+    args = parser.parse_args()
+    run_benchmark(args.chunks, args.queries, args.k, args.nlist, args.nprobe, args.documents)
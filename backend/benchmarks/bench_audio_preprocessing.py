@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+STT Audio Preprocessing Benchmark
+Payload size and latency of sending recordings to Whisper as uploaded vs.
+after preprocess_for_stt (mono, 16 kHz, silence trimmed). Fixtures are
+synthetic browser-style WAV recordings - speech-like bursts between
+leading and trailing silence - unless real files are given with --files.
+Upload time is estimated at --uplink-mbps; --transcribe also times real
+Whisper calls (needs GROQ_API_KEY).
+"""
+
+import io
+import os
+import time
+import asyncio
+import argparse
+import numpy as np
+
+from audio_processing import preprocess_for_stt, pcm16_to_wav
+
+# (name, sample rate, channels, seconds of speech, leading silence, trailing silence)
+FIXTURES = [
+    ("short answer 48k stereo", 48000, 2, 3, 1.5, 2.0),
+    ("long answer 48k stereo", 48000, 2, 25, 1.0, 3.0),
+    ("answer 44.1k mono", 44100, 1, 10, 2.0, 2.0)
+]
+
+def make_recording(rate, channels, speech_seconds, lead, tail, seed=0):
+    """Harmonic 'syllables' under an envelope, with room noise throughout"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(rate * speech_seconds)) / rate
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / rate
+    voice = sum(np.sin(h * phase) / h for h in range(1, 6))
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 0.5
+    speech = 6000 * voice * syllables
+    signal = np.concatenate([np.zeros(int(rate * lead)), speech, np.zeros(int(rate * tail))])
+    signal = signal + rng.normal(0, 40, signal.size)
+    frames = np.repeat(signal[:, None], channels, axis=1)
+    return pcm16_to_wav(np.clip(frames, -32768, 32767).astype("<i2").tobytes(), rate, channels)
+
+def upload_ms(size, uplink_mbps):
+    return size * 8 / (uplink_mbps * 1e6) * 1000
+
+async def whisper_ms(audio, filename):
+    from llm_gateway import transcribe, TRANSCRIPTION_MODEL
+    audio_file = io.BytesIO(audio)
+    audio_file.name = filename
+    start = time.perf_counter()
+    await transcribe(model=TRANSCRIPTION_MODEL, file=audio_file, response_format="text")
+    return (time.perf_counter() - start) * 1000
+
+def run_benchmark(recordings, uplink_mbps, transcribe):
+    print("=" * 96)
+    print(f"STT preprocessing benchmark (upload estimated at {uplink_mbps} Mbit/s)")
+    print("=" * 96)
+    header = f"{'recording':<26} {'orig KB':>8} {'sent KB':>8} {'saved':>7} {'prep ms':>8} {'upload ms':>16}"
+    if transcribe:
+        header += f" {'whisper ms':>18}"
+    print(header)
+    for name, audio, filename in recordings:
+        result = preprocess_for_stt(audio, filename)
+        saved = 1 - result.processed_bytes / result.original_bytes
+        before, after = upload_ms(result.original_bytes, uplink_mbps), upload_ms(result.processed_bytes, uplink_mbps)
+        line = (
+            f"{name:<26} {result.original_bytes / 1024:>8.0f} {result.processed_bytes / 1024:>8.0f} {saved:>6.0%} "
+            f"{result.elapsed_ms:>8.1f} {before:>7.0f} -> {after:>6.0f}"
+        )
+        if transcribe:
+            original = asyncio.run(whisper_ms(audio, filename))
+            processed = asyncio.run(whisper_ms(result.audio, result.filename))
+            line += f" {original:>8.0f} -> {processed:>6.0f}"
+        print(line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", nargs="*", default=[], help="real recordings to use instead of the synthetic fixtures")
+    parser.add_argument("--uplink-mbps", type=float, default=5.0)
+    parser.add_argument("--transcribe", action="store_true", help="also time real Whisper calls")
+    args = parser.parse_args()
+    if args.transcribe and not os.getenv("GROQ_API_KEY"):
+        parser.error("--transcribe needs GROQ_API_KEY")
+
+    if args.files:
+        recordings = []
+        for path in args.files:
+            with open(path, "rb") as f:
+                recordings.append((os.path.basename(path)[:26], f.read(), os.path.basename(path)))
+    else:
+        recordings = [
+            (name, make_recording(rate, channels, speech, lead, tail), "recording.wav")
+            for name, rate, channels, speech, lead, tail in FIXTURES
+        ]
+    run_benchmark(recordings, args.uplink_mbps, args.transcribe)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Chat History Append Benchmark
+Latency of appending one message to a chat session that already holds 10
+vs. 1000 messages:
+- legacy:         find_one on the whole session + update_one $push (two round trips)
+- pipeline:       add_message_to_session, one pipeline update, messages kept inline
+- pipeline+cap:   same, keeping only the newest CHAT_SESSION_MAX_MESSAGES inline
+- pipeline+bucket: same, spilling old messages into chat_history_buckets
+Needs a MongoDB to talk to (BENCH_MONGODB_URI, falling back to MONGODB_URI);
+everything is written to a scratch database that is dropped afterwards.
+"""
+
+import os
+import time
+import uuid
+import argparse
+from datetime import datetime
+import bson
+import numpy as np
+from pymongo import MongoClient
+
+import mongodb_client
+
+MODES = ("legacy", "pipeline", "pipeline+cap", "pipeline+bucket")
+
+def make_message(i):
+    if i % 2 == 0:
+        return {"role": "user", "content": f"Question {i}: could you explain this part of the document again?", "timestamp": datetime.utcnow()}
+    return {
+        "role": "assistant",
+        "content": "An explanation in plain language. " * 25,
+        "timestamp": datetime.utcnow(),
+        "sources": ["A retrieved chunk of the document. " * 14] * 2
+    }
+
+def legacy_append(database, session_id, role, content, sources):
+    # The original add_message_to_session
+    message = {"role": role, "content": content, "timestamp": datetime.utcnow()}
+    if sources:
+        message["sources"] = sources
+    session = database.chat_history.find_one({"session_id": session_id})
+    update_data = {"$push": {"messages": message}, "$set": {"updated_at": datetime.utcnow()}}
+    if session and role == "user" and len(session.get("messages", [])) == 0:
+        update_data["$set"]["title"] = content[:50]
+    database.chat_history.update_one({"session_id": session_id}, update_data)
+
+def seed_session(database, mode, existing):
+    """A session holding `existing` messages, laid out the way the mode keeps it"""
+    session_id = str(uuid.uuid4())
+    history = [make_message(i) for i in range(existing)]
+    inline, bucketed = history, 0
+    if mode == "pipeline+cap":
+        inline = history[-mongodb_client.CHAT_SESSION_MAX_MESSAGES:]
+    elif mode == "pipeline+bucket" and existing > mongodb_client.CHAT_SESSION_MAX_MESSAGES:
+        size = mongodb_client.CHAT_BUCKET_SIZE
+        bucketed = -(-(existing - mongodb_client.CHAT_SESSION_MAX_MESSAGES) // size) * size
+        database.chat_history_buckets.insert_many([
+            {"session_id": session_id, "seq": seq, "messages": history[seq * size:(seq + 1) * size]}
+            for seq in range(bucketed // size)
+        ])
+        inline = history[bucketed:]
+    database.chat_history.insert_one({
+        "session_id": session_id,
+        "title": "Question 0",
+        "messages": inline,
+        "message_count": existing,
+        "bucketed_count": bucketed,
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    })
+    return session_id
+
+def run_benchmark(uri, sizes, appends):
+    client = MongoClient(uri, serverSelectionTimeoutMS=10000)
+    database = client[f"bench_chat_history_{uuid.uuid4().hex[:8]}"]
+    database.chat_history.create_index([("session_id", 1)])
+    database.chat_history_buckets.create_index([("session_id", 1), ("seq", 1)], unique=True)
+    mongodb_client.db = database
+    mongodb_client.use_mongodb = True
+
+    print("=" * 76)
+    print(f"Chat history append benchmark ({appends} consecutive appends per cell)")
+    print("=" * 76)
+    print(f"{'mode':>16} {'messages':>9} {'mean ms':>9} {'p99 ms':>9} {'doc KB after':>13}")
+    try:
+        for mode in MODES:
+            if mode != "legacy":
+                mongodb_client.CHAT_HISTORY_OVERFLOW = {"pipeline": "none", "pipeline+cap": "cap", "pipeline+bucket": "bucket"}[mode]
+            for existing in sizes:
+                session_id = seed_session(database, mode, existing)
+                samples = []
+                for i in range(appends):
+                    message = make_message(existing + i)
+                    start = time.perf_counter()
+                    if mode == "legacy":
+                        legacy_append(database, session_id, message["role"], message["content"], message.get("sources"))
+                    else:
+                        mongodb_client.add_message_to_session(session_id, message["role"], message["content"], message.get("sources"))
+                    samples.append((time.perf_counter() - start) * 1000)
+                doc_size = len(bson.encode(database.chat_history.find_one({"session_id": session_id}, {"_id": 0})))
+                print(f"{mode:>16} {existing:>9} {np.mean(samples):>9.2f} {np.percentile(samples, 99):>9.2f} {doc_size / 1024:>13.0f}")
+    finally:
+        client.drop_database(database.name)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--uri", default=os.getenv("BENCH_MONGODB_URI") or os.getenv("MONGODB_URI"))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000])
+    parser.add_argument("--appends", type=int, default=50)
+    args = parser.parse_args()
+    if not args.uri:
+        parser.error("set BENCH_MONGODB_URI or MONGODB_URI, or pass --uri")
+    run_benchmark(args.uri, args.sizes, args.appends)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Embedding Service Benchmark
+Latency of N concurrent query embeddings when encode runs inline on the
+event loop (the old get_embeddings) vs. through the micro-batching
+EmbeddingService. The encoder is simulated with a fixed per-call overhead
+plus a per-text cost, which is how a SentenceTransformer forward pass scales.
+"""
+
+import argparse
+import asyncio
+import time
+import numpy as np
+
+from embedding_service import EmbeddingService
+
+def make_encoder(call_ms, per_text_ms):
+    def encode(texts):
+        # time.sleep releases the GIL, like a torch forward pass
+        time.sleep((call_ms + per_text_ms * len(texts)) / 1000)
+        return [[0.0] * 384 for _ in texts]
+    return encode
+
+async def inline_query(encode, text):
+    """What get_embeddings used to do: encode synchronously inside the coroutine"""
+    return encode([text])[0]
+
+async def run_users(embed, users):
+    latencies = []
+    # Every user sends at t=0, so latency is measured from the shared start
+    start = time.perf_counter()
+
+    async def one_user(i):
+        await embed(f"question {i}")
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one_user(i) for i in range(users)))
+    return latencies, time.perf_counter() - start
+
+def report(name, latencies, wall):
+    p50, p99 = np.percentile(latencies, [50, 99])
+    print(f"{name:>12} {p50:>10.1f} {p99:>10.1f} {wall * 1000:>10.1f}")
+
+async def main(users, call_ms, per_text_ms, window_ms):
+    encode = make_encoder(call_ms, per_text_ms)
+    print("=" * 48)
+    print(f"{users} concurrent queries, encode = {call_ms}ms + {per_text_ms}ms/text")
+    print("=" * 48)
+    print(f"{'path':>12} {'p50 ms':>10} {'p99 ms':>10} {'wall ms':>10}")
+
+    latencies, wall = await run_users(lambda text: inline_query(encode, text), users)
+    report("inline", latencies, wall)
+
+    service = EmbeddingService(encode, batch_window_ms=window_ms)
+    latencies, wall = await run_users(service.embed_query, users)
+    report("batched", latencies, wall)
+    print(f"\nService stats: {service.stats()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--call-ms", type=float, default=8.0)
+    parser.add_argument("--per-text-ms", type=float, default=0.5)
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.call_ms, args.per_text_ms, args.window_ms))
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Embedding Storage Benchmark
+For each storage format: BSON bytes per chunk, time to decode a document's
+worth of BSON into a float32 matrix (the client-side part of find+decode),
+and recall@k of search over the decoded vectors against float32.
+"""
+
+import argparse
+import time
+import bson
+import numpy as np
+
+from vector_codec import FORMATS, EMBEDDING_FIELDS, encode_embedding, decode_matrix
+from vector_search import VectorIndex
+
+DIMENSIONS = 384
+
+def run_benchmark(n, queries, k, repeats):
+    rng = np.random.default_rng(3)
+    vectors = rng.standard_normal((n, DIMENSIONS)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    query_set = vectors[rng.integers(0, n, queries)] + 0.5 * rng.standard_normal((queries, DIMENSIONS)).astype(np.float32)
+    texts = [str(i) for i in range(n)]
+
+    reference = VectorIndex(vectors, texts)
+    truth = [set(reference.search(q, k)) for q in query_set]
+
+    print("=" * 66)
+    print(f"Embedding storage benchmark (n={n}, dim={DIMENSIONS}, k={k})")
+    print("=" * 66)
+    print(f"{'format':>8} {'bytes/chunk':>12} {'total KB':>10} {'decode ms':>10} {'recall@k':>10}")
+
+    for fmt in FORMATS:
+        # What the server receives: one BSON document per chunk
+        payloads = [
+            bson.encode({"chunk_id": texts[i], "text": "", **encode_embedding(vectors[i], fmt)})
+            for i in range(n)
+        ]
+        size = sum(len(p) for p in payloads) - sum(len(bson.encode({"chunk_id": t, "text": ""})) for t in texts)
+
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            docs = [bson.decode(p) for p in payloads]
+            matrix = decode_matrix([{key: doc[key] for key in EMBEDDING_FIELDS if key in doc} for doc in docs])
+            samples.append((time.perf_counter() - start) * 1000)
+
+        index = VectorIndex(matrix, texts)
+        recall = np.mean([len(truth[i] & set(index.search(q, k))) / k for i, q in enumerate(query_set)])
+        print(f"{fmt:>8} {size / n:>12.0f} {size / 1024:>10.0f} {np.median(samples):>10.1f} {recall:>10.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    run_benchmark(args.chunks, args.queries, args.k, args.repeats)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+LLM Gateway Load Test
+Concurrent chat-completion throughput against a local stub server that
+answers after a fixed delay (standing in for Groq), comparing
+- before: a synchronous OpenAI client called inside async functions
+- after:  the shared AsyncOpenAI gateway with a pooled connection set
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from openai import OpenAI
+
+import llm_gateway
+
+COMPLETION = {
+    "id": "stub",
+    "object": "chat.completion",
+    "created": 0,
+    "model": llm_gateway.CHAT_MODEL,
+    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "Stub answer."}}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+}
+
+def start_stub_server(delay_ms):
+    body = json.dumps(COMPLETION).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(delay_ms / 1000)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 1024
+
+    server = Server(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1"
+
+MESSAGES = [{"role": "user", "content": "What is photosynthesis?"}]
+
+async def run(call, requests):
+    latencies = []
+    start = time.perf_counter()
+
+    async def one():
+        await call()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return time.perf_counter() - start, latencies
+
+def report(name, wall, latencies, requests):
+    p50, p99 = np.percentile(latencies, [50, 99])
+    print(f"{name:>8} {requests / wall:>10.1f} {p50:>10.0f} {p99:>10.0f} {wall:>8.2f}")
+
+async def main(requests, delay_ms):
+    server, base_url = start_stub_server(delay_ms)
+    print("=" * 52)
+    print(f"{requests} concurrent completions, stub latency {delay_ms}ms")
+    print("=" * 52)
+    print(f"{'client':>8} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'wall s':>8}")
+
+    sync_client = OpenAI(api_key="stub", base_url=base_url)
+
+    async def before():
+        # What the model modules used to do: a blocking call inside async def
+        sync_client.chat.completions.create(model=llm_gateway.CHAT_MODEL, messages=MESSAGES, max_tokens=10)
+
+    wall, latencies = await run(before, requests)
+    report("sync", wall, latencies, requests)
+
+    async_client = llm_gateway.create_client(base_url=base_url, api_key="stub")
+
+    async def after():
+        await async_client.chat.completions.create(model=llm_gateway.CHAT_MODEL, messages=MESSAGES, max_tokens=10)
+
+    wall, latencies = await run(after, requests)
+    report("gateway", wall, latencies, requests)
+
+    await async_client.close()
+    server.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--delay-ms", type=float, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.delay_ms))
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Retrieval Benchmark
+Compares the per-chunk Python cosine loop with the vectorized VectorIndex
+for increasing chunk counts (MiniLM-sized 384-d embeddings)
+"""
+
+import argparse
+import time
+import numpy as np
+
+from mongodb_client import cosine_similarity
+from vector_search import VectorIndex
+
+DIMENSIONS = 384
+
+def python_loop_search(query, embeddings, texts, k):
+    """The original search_similar_chunks scoring loop"""
+    results = []
+    for text, embedding in zip(texts, embeddings):
+        results.append({"text": text, "similarity": cosine_similarity(query, embedding)})
+    results.sort(key=lambda x: x["similarity"], reverse=True)
+    return [r["text"] for r in results[:k]]
+
+def time_call(fn, repeats):
+    """Return the median wall time of fn() in milliseconds"""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples))
+
+def run_benchmark(chunk_counts, k, repeats):
+    rng = np.random.default_rng(42)
+    print("=" * 72)
+    print(f"Retrieval benchmark (dim={DIMENSIONS}, k={k}, median of {repeats} runs)")
+    print("=" * 72)
+    print(f"{'chunks':>8} {'python loop ms':>16} {'build ms':>10} {'vectorized ms':>15} {'speedup':>9}")
+
+    for n in chunk_counts:
+        matrix = rng.standard_normal((n, DIMENSIONS)).astype(np.float32)
+        embeddings = matrix.tolist()
+        texts = [f"chunk {i}" for i in range(n)]
+        query = rng.standard_normal(DIMENSIONS).astype(np.float32).tolist()
+
+        loop_ms = time_call(lambda: python_loop_search(query, embeddings, texts, k), repeats)
+        build_ms = time_call(lambda: VectorIndex(embeddings, texts), repeats)
+        index = VectorIndex(embeddings, texts)
+        search_ms = time_call(lambda: index.search(query, k), repeats)
+
+        # Both paths must agree on the result
+        assert index.search(query, k) == python_loop_search(query, embeddings, texts, k)
+
+        print(f"{n:>8} {loop_ms:>16.2f} {build_ms:>10.2f} {search_ms:>15.3f} {loop_ms / max(search_ms, 1e-6):>8.0f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, nargs="+", default=[100, 500, 1000, 5000, 10000])
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    run_benchmark(args.chunks, args.k, args.repeats)
@@ -3,22 +3,15 @@ Chat Model Module
 Handles chat-related GPT interactions via Groq API
 """
 
-import os
-from typing import List
+from typing import AsyncIterator, List
 from dotenv import load_dotenv
-from openai import OpenAI
+from llm_gateway import chat_completion, CHAT_MODEL
 
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client for Groq
-client = OpenAI(
-    api_key=os.environ.get("GROQ_API_KEY"),
-    base_url="https://api.groq.com/openai/v1"
-)
-
-async def generate_chat_response(user_message: str, context: str) -> str:
-    """Generate a chat response using document context"""
+def build_chat_messages(user_message: str, context: str) -> List[dict]:
+    """Prompt messages for answering a question from document context"""
     prompt = f"""You are a helpful tutor explaining concepts from a document. Answer the user's question in a clear, conversational way using simple language. Avoid technical formatting, markdown, or complex symbols.
 
 Document Content:
@@ -28,13 +21,17 @@ User Question: {user_message}
 
 Please explain this in simple, easy-to-understand language as if you're talking to a student:"""
     
+    return [
+        {"role": "system", "content": "You are a helpful assistant that answers questions based on provided document content."},
+        {"role": "user", "content": prompt}
+    ]
+
+async def generate_chat_response(user_message: str, context: str) -> str:
+    """Generate a chat response using document context"""
     try:
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that answers questions based on provided document content."},
-                {"role": "user", "content": prompt}
-            ],
+        response = await chat_completion(
+            model=CHAT_MODEL,
+            messages=build_chat_messages(user_message, context),
             max_tokens=300,
             temperature=0.7
         )
@@ -43,6 +40,27 @@ Please explain this in simple, easy-to-understand language as if you're talking
         print(f"Chat API error: {e}")
         return f"Error generating response: {str(e)}"
 
+async def stream_chat_response(user_message: str, context: str) -> AsyncIterator[str]:
+    """
+    Generate a chat response token by token as the model produces it.
+    A failure is raised, not yielded, so callers never mistake a partial
+    answer plus an error message for a complete response.
+    """
+    try:
+        stream = await chat_completion(
+            model=CHAT_MODEL,
+            messages=build_chat_messages(user_message, context),
+            max_tokens=300,
+            temperature=0.7,
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    except Exception as e:
+        print(f"Chat API streaming error: {e}")
+        raise
+
 def is_greeting_message(message: str) -> bool:
     """Check if the message is a greeting or casual response"""
     greeting_words = ["hi", "hello", "hey", "good morning", "good afternoon", "good evening", "how are you", "what's up"]
@@ -64,6 +82,10 @@ def is_greeting_message(message: str) -> bool:
     
     return False
 
+GREETING_RESPONSE = "Hello! I'm here to help you understand the document you've uploaded. Feel free to ask me any questions about its content!"
+THANKS_RESPONSE = "You're welcome! Do you have any other questions about the document?"
+PROMPT_RESPONSE = "I'm here to help you with questions about the document. What would you like to know?"
+
 def get_greeting_response(message: str) -> str:
     """Get appropriate response for greetings and casual messages"""
     greeting_words = ["hi", "hello", "hey", "good morning", "good afternoon", "good evening", "how are you", "what's up"]
@@ -73,14 +95,14 @@ def get_greeting_response(message: str) -> str:
     
     # Handle greetings
     if any(greeting in message_lower for greeting in greeting_words):
-        return "Hello! I'm here to help you understand the document you've uploaded. Feel free to ask me any questions about its content!"
+        return GREETING_RESPONSE
     
     # Handle casual responses
     if any(casual in message_lower for casual in casual_words) and len(message_lower.split()) <= 3:
-        return "You're welcome! Do you have any other questions about the document?"
+        return THANKS_RESPONSE
     
     # Handle very short messages that aren't questions
     if len(message_lower.split()) <= 2 and "?" not in message_lower:
-        return "I'm here to help you with questions about the document. What would you like to know?"
+        return PROMPT_RESPONSE
     
-    return "I'm here to help you with questions about the document. What would you like to know?"
+    return PROMPT_RESPONSE
@@ -3,47 +3,49 @@ Conversational Tutor Module
 Handles conversational learning sessions with context and progress tracking
 """
 
-from openai import OpenAI
-import os
+import asyncio
 from dotenv import load_dotenv
+from llm_gateway import chat_completion, CHAT_MODEL
+from tutor_session_store import TutorSession, create_session_store
 
 load_dotenv()
 
-# Initialize Groq client
-client = OpenAI(
-    api_key=os.environ.get("GROQ_API_KEY"),
-    base_url="https://api.groq.com/openai/v1"
-)
-
-# Store active sessions (in production, use Redis or database)
-active_sessions = {}
-
-class TutorSession:
-    def __init__(self, session_id: str):
-        self.session_id = session_id
-        self.conversation_history = []
-        self.current_topic = None
-        self.questions_asked = 0
-        self.correct_answers = 0
-    
-    def to_dict(self):
-        return {
-            "session_id": self.session_id,
-            "current_topic": self.current_topic,
-            "questions_asked": self.questions_asked,
-            "correct_answers": self.correct_answers,
-            "accuracy": (self.correct_answers / self.questions_asked * 100) if self.questions_asked > 0 else 0
-        }
+TUTOR_ERROR_RESPONSE = "Hmm, I'm having a bit of trouble right now. Could you say that again?"
+TUTOR_ERROR_FEEDBACK = "Hey, I couldn't quite process that. Let's keep going though!"
+
+# Active sessions live in a pluggable store (TUTOR_SESSION_STORE=memory|mongo)
+session_store = create_session_store()
 
-def get_or_create_session(session_id: str) -> TutorSession:
+async def get_or_create_session(session_id: str) -> TutorSession:
     """Get existing session or create new one"""
-    if session_id not in active_sessions:
-        active_sessions[session_id] = TutorSession(session_id)
-    return active_sessions[session_id]
+    if session_store.remote:
+        session = await asyncio.to_thread(session_store.get, session_id)
+    else:
+        session = session_store.get(session_id)
+    if session is None:
+        session = TutorSession(session_id)
+        await save_session(session)
+    return session
+
+async def save_session(session: TutorSession):
+    """Store a changed session (written through to MongoDB for the mongo store)"""
+    if session_store.remote:
+        await asyncio.to_thread(session_store.put, session)
+    else:
+        session_store.put(session)
+
+def start_session_store():
+    session_store.start()
+
+async def stop_session_store():
+    await session_store.stop()
+
+def get_session_store_stats():
+    return session_store.stats()
 
 async def get_tutor_response(session_id: str, user_input: str, mode: str = "conversation") -> dict:
     """Get conversational response from tutor"""
-    session = get_or_create_session(session_id)
+    session = await get_or_create_session(session_id)
     
     try:
         # Build context-aware messages
@@ -84,8 +86,8 @@ Remember: You're not just answering questions - you're having a genuine conversa
         # Add current user input
         messages.append({"role": "user", "content": user_input})
         
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+        completion = await chat_completion(
+            model=CHAT_MODEL,
             messages=messages,
             max_tokens=250,
             temperature=0.9  # Higher temperature for more natural, varied responses
@@ -94,8 +96,8 @@ Remember: You're not just answering questions - you're having a genuine conversa
         response = completion.choices[0].message.content
         
         # Update conversation history
-        session.conversation_history.append({"role": "user", "content": user_input})
-        session.conversation_history.append({"role": "assistant", "content": response})
+        session.add_message("user", user_input)
+        session.add_message("assistant", response)
         
         # Check if this is setting a topic
         if any(word in user_input.lower() for word in ["explain", "what is", "tell me about", "teach me"]):
@@ -104,6 +106,7 @@ Remember: You're not just answering questions - you're having a genuine conversa
                 if phrase in user_input.lower():
                     session.current_topic = user_input.lower().replace(phrase, "").strip()
                     break
+        await save_session(session)
         
         return {
             "response": response,
@@ -113,13 +116,13 @@ Remember: You're not just answering questions - you're having a genuine conversa
     except Exception as e:
         print(f"Tutor response error: {e}")
         return {
-            "response": "Hmm, I'm having a bit of trouble right now. Could you say that again?",
+            "response": TUTOR_ERROR_RESPONSE,
             "session_info": session.to_dict()
         }
 
 async def evaluate_student_answer(session_id: str, question: str, user_answer: str) -> dict:
     """Evaluate student's answer and provide feedback"""
-    session = get_or_create_session(session_id)
+    session = await get_or_create_session(session_id)
     
     try:
         messages = [
@@ -139,8 +142,8 @@ Remember: You're not grading a test - you're helping a friend learn!"""},
             {"role": "user", "content": f"Question: {question}\nStudent's Answer: {user_answer}\n\nGive friendly, conversational feedback."}
         ]
         
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+        completion = await chat_completion(
+            model=CHAT_MODEL,
             messages=messages,
             max_tokens=180,
             temperature=0.9
@@ -159,8 +162,9 @@ Remember: You're not grading a test - you're helping a friend learn!"""},
             is_correct = False
         
         # Add to conversation history
-        session.conversation_history.append({"role": "user", "content": user_answer})
-        session.conversation_history.append({"role": "assistant", "content": feedback})
+        session.add_message("user", user_answer)
+        session.add_message("assistant", feedback)
+        await save_session(session)
         
         return {
             "feedback": feedback,
@@ -171,14 +175,14 @@ Remember: You're not grading a test - you're helping a friend learn!"""},
     except Exception as e:
         print(f"Evaluation error: {e}")
         return {
-            "feedback": "Hey, I couldn't quite process that. Let's keep going though!",
+            "feedback": TUTOR_ERROR_FEEDBACK,
             "is_correct": False,
             "session_info": session.to_dict()
         }
 
 async def generate_practice_question(session_id: str, topic: str = None) -> dict:
     """Generate a practice question"""
-    session = get_or_create_session(session_id)
+    session = await get_or_create_session(session_id)
     
     # Use provided topic or session's current topic
     question_topic = topic or session.current_topic or "general knowledge"
@@ -198,8 +202,8 @@ Create ONE question that tests understanding. Keep it conversational!"""},
             {"role": "user", "content": f"Create a practice question about: {question_topic}"}
         ]
         
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+        completion = await chat_completion(
+            model=CHAT_MODEL,
             messages=messages,
             max_tokens=120,
             temperature=0.9
@@ -208,7 +212,8 @@ Create ONE question that tests understanding. Keep it conversational!"""},
         question = completion.choices[0].message.content
         
         # Add to conversation history
-        session.conversation_history.append({"role": "assistant", "content": question})
+        session.add_message("assistant", question)
+        await save_session(session)
         
         return {
             "question": question,
@@ -224,17 +229,19 @@ Create ONE question that tests understanding. Keep it conversational!"""},
             "session_info": session.to_dict()
         }
 
-def reset_session(session_id: str) -> dict:
+async def reset_session(session_id: str) -> dict:
     """Reset a session"""
-    if session_id in active_sessions:
-        del active_sessions[session_id]
+    if session_store.remote:
+        await asyncio.to_thread(session_store.delete, session_id)
+    else:
+        session_store.delete(session_id)
     
     return {
         "success": True,
         "message": "Session reset successfully"
     }
 
-def get_session_progress(session_id: str) -> dict:
+async def get_session_progress(session_id: str) -> dict:
     """Get session progress"""
-    session = get_or_create_session(session_id)
+    session = await get_or_create_session(session_id)
     return session.to_dict()
@@ -0,0 +1,122 @@
+"""
+Document Registry Module
+Per-request document lookup keyed by (user_id, document_id), replacing the
+single process-global "current document". MongoDB is the source of truth;
+each process only keeps a bounded LRU working set of document metadata,
+loaded lazily on first use. Nothing here is pinned to one server process,
+so any uvicorn worker or replica can serve any user without sticky sessions.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, Optional
+
+DOCUMENT_REGISTRY_MAX_DOCUMENTS = int(os.getenv("DOCUMENT_REGISTRY_MAX_DOCUMENTS", "1000"))
+# Processed documents rarely change; ones still being ingested are re-read often to pick up progress
+DOCUMENT_REGISTRY_TTL_SECONDS = float(os.getenv("DOCUMENT_REGISTRY_TTL_SECONDS", "60"))
+DOCUMENT_REGISTRY_PENDING_TTL_SECONDS = float(os.getenv("DOCUMENT_REGISTRY_PENDING_TTL_SECONDS", "2"))
+
+@dataclass
+class DocumentHandle:
+    document_id: str
+    user_id: str
+    filename: str
+    status: str
+    chunk_count: int
+    source_document_id: Optional[str]
+    expires_at: float
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "processed"
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("expires_at")
+        return data
+
+class DocumentRegistry:
+    def __init__(
+        self,
+        loader: Callable[[str], Optional[Dict[str, Any]]],
+        max_documents: int = DOCUMENT_REGISTRY_MAX_DOCUMENTS,
+        ttl_seconds: float = DOCUMENT_REGISTRY_TTL_SECONDS,
+        pending_ttl_seconds: float = DOCUMENT_REGISTRY_PENDING_TTL_SECONDS
+    ):
+        self._loader = loader
+        self.max_documents = max_documents
+        self.ttl_seconds = ttl_seconds
+        self.pending_ttl_seconds = pending_ttl_seconds
+        # (user_id, document_id) -> handle
+        self._documents: "OrderedDict[tuple, DocumentHandle]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id: str, document_id: str) -> Optional[DocumentHandle]:
+        """
+        The document if it exists and belongs to user_id, loading it from
+        MongoDB when needed. There is no unscoped lookup.
+        """
+        if not user_id:
+            return None
+        key = (user_id, document_id)
+        with self._lock:
+            handle = self._documents.get(key)
+            if handle is not None and handle.expires_at >= time.time():
+                self._documents.move_to_end(key)
+                self.hits += 1
+                return handle
+            self.misses += 1
+
+        doc = self._loader(document_id)
+        if doc is None or doc.get("user_id") != user_id:
+            with self._lock:
+                self._documents.pop(key, None)
+            return None
+
+        status = doc.get("status", "processed")
+        handle = DocumentHandle(
+            document_id=document_id,
+            user_id=doc.get("user_id", ""),
+            filename=doc.get("filename", ""),
+            status=status,
+            chunk_count=doc.get("chunk_count", 0),
+            source_document_id=doc.get("source_document_id"),
+            expires_at=time.time() + (self.ttl_seconds if status in ("processed", "failed") else self.pending_ttl_seconds)
+        )
+        with self._lock:
+            self._documents[key] = handle
+            self._documents.move_to_end(key)
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+                self.evictions += 1
+        return handle
+
+    def invalidate(self, document_id: Optional[str] = None, user_id: Optional[str] = None):
+        """Forget one document, one user's documents, or everything"""
+        with self._lock:
+            if document_id is None and user_id is None:
+                self._documents.clear()
+                return
+            for key in [
+                key for key in self._documents
+                if (document_id is None or key[1] == document_id) and (user_id is None or self._documents[key].user_id == user_id)
+            ]:
+                del self._documents[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "documents": len(self._documents),
+                "max_documents": self.max_documents,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,118 @@
+"""
+Embedding Service Module
+Runs the embedding model off the event loop and micro-batches query
+embeddings: single-text requests arriving within EMBED_BATCH_WINDOW_MS of
+each other are merged into one encode call.
+"""
+
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "64"))
+
+HISTOGRAM_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+def _bucket_label(batch_size: int) -> str:
+    for bucket in HISTOGRAM_BUCKETS:
+        if batch_size <= bucket:
+            return f"<={bucket}"
+    return f">{HISTOGRAM_BUCKETS[-1]}"
+
+class EmbeddingService:
+    """Dedicated encode thread plus a micro-batcher for query embeddings"""
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], List[List[float]]],
+        batch_window_ms: float = EMBED_BATCH_WINDOW_MS,
+        max_batch: int = EMBED_MAX_BATCH
+    ):
+        self._encode = encode
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch = max_batch
+        # One thread: the model is shared, and batching does the parallel work
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        self._queue: Optional[asyncio.Queue] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.max_queue_depth = 0
+        self.encode_seconds = 0.0
+        self.batch_histogram = {_bucket_label(size): 0 for size in HISTOGRAM_BUCKETS + (HISTOGRAM_BUCKETS[-1] + 1,)}
+
+    async def embed_query(self, text: str) -> List[float]:
+        """Embed one text, sharing an encode call with concurrent requests"""
+        self._ensure_batcher()
+        future = self._loop.create_future()
+        await self._queue.put((text, future))
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        return await future
+
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Embed an already-batched list (e.g. document chunks) in the encode thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._timed_encode, texts)
+
+    def _ensure_batcher(self):
+        loop = asyncio.get_running_loop()
+        if self._batcher is None or self._batcher.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._batcher = loop.create_task(self._run_batcher())
+
+    async def _run_batcher(self):
+        while True:
+            batch: List[Tuple[str, asyncio.Future]] = [await self._queue.get()]
+            deadline = self._loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                vectors = await self._loop.run_in_executor(self._executor, self._timed_encode, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+    def _timed_encode(self, texts: List[str]) -> List[List[float]]:
+        start = time.perf_counter()
+        vectors = self._encode(texts)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.requests += len(texts)
+            self.batches += 1
+            self.encode_seconds += elapsed
+            self.batch_histogram[_bucket_label(len(texts))] += 1
+        return vectors
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+                "max_queue_depth": self.max_queue_depth,
+                "requests": self.requests,
+                "batches": self.batches,
+                "mean_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+                "mean_encode_ms": round(1000 * self.encode_seconds / self.batches, 2) if self.batches else 0.0,
+                "batch_size_histogram": dict(self.batch_histogram)
+            }
@@ -3,19 +3,59 @@ Embeddings Module
 Handles text embeddings generation using sentence-transformers
 """
 
-from typing import List
+from typing import List, Dict, Any
 from sentence_transformers import SentenceTransformer
+from embedding_service import EmbeddingService
+from query_embedding_cache import QueryEmbeddingCache
 
 # Initialize the embedding model (lightweight and fast)
-model = SentenceTransformer('all-MiniLM-L6-v2')
+MODEL_NAME = 'all-MiniLM-L6-v2'
+model = SentenceTransformer(MODEL_NAME)
 
-async def get_embeddings(texts: List[str]) -> List[List[float]]:
-    """Get embeddings using sentence-transformers"""
+def encode_texts(texts: List[str]) -> List[List[float]]:
+    """Synchronous encode - only call from the embedding service thread"""
+    return model.encode(texts, convert_to_numpy=True).tolist()
+
+# Encodes off the event loop and merges concurrent query embeddings into one batch
+embedding_service = EmbeddingService(encode_texts)
+
+# Repeated questions skip the model entirely
+query_cache = QueryEmbeddingCache()
+query_cache.load()
+
+async def get_embeddings(texts: List[str], fallback: bool = True) -> List[List[float]]:
+    """
+    Get embeddings using sentence-transformers. If the model fails, zero
+    vectors are returned so a query degrades to an empty match. Pass
+    fallback=False when the vectors are going to be stored: the error is
+    raised instead, so placeholders never reach the database.
+    """
     try:
-        embeddings = model.encode(texts, convert_to_numpy=True)
-        return embeddings.tolist()
+        if len(texts) == 1:
+            cached = query_cache.get(MODEL_NAME, texts[0])
+            if cached is not None:
+                return [cached]
+            embedding = await embedding_service.embed_query(texts[0])
+            query_cache.put(MODEL_NAME, texts[0], embedding)
+            return [embedding]
+        return await embedding_service.embed_many(texts)
     except Exception as e:
         print(f"Error getting embeddings: {e}")
+        if not fallback:
+            raise
         return [[0.0 for _ in range(384)] for _ in texts]
 
+def get_embedding_service_stats() -> Dict[str, Any]:
+    """Queue depth and batch-size histogram of the embedding service"""
+    return embedding_service.stats()
 
+def get_query_cache_stats() -> Dict[str, Any]:
+    """Hit-rate metrics of the query embedding cache"""
+    return query_cache.stats()
+
+def save_query_cache():
+    """Persist the query embedding cache (when QUERY_CACHE_PATH is set)"""
+    try:
+        query_cache.save()
+    except Exception as e:
+        print(f"⚠️ Could not save query embedding cache: {e}")
@@ -0,0 +1,187 @@
+"""
+Ingestion Pipeline Module
+Overlaps extraction, chunking, embedding and MongoDB writes.
+Each stage consumes fixed-size batches from a bounded queue, so peak memory
+stays constant regardless of document size.
+"""
+
+import os
+import time
+import uuid
+import codecs
+import hashlib
+import asyncio
+import inspect
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, Any, Iterator, List, Optional
+
+from embeddings import MODEL_NAME, get_embeddings
+from mongodb_client import insert_embedding_batch, find_embeddings_by_chunk_hash
+from pdf_extraction import ExtractionStats, stream_pdf_pages
+
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))      # chunks per encode / insert_many
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "2"))       # batches buffered between stages
+TXT_READ_SIZE = 64 * 1024
+
+# Embeddings are only reusable between ingestions that agree on all of these
+INGEST_SIGNATURE = f"{MODEL_NAME}|{CHUNK_SIZE}|{CHUNK_OVERLAP}"
+
+def content_hash(file_content: bytes) -> str:
+    return hashlib.sha256(file_content).hexdigest()
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(f"{INGEST_SIGNATURE}\n{text}".encode("utf-8")).hexdigest()
+
+class StreamingChunker:
+    """Fixed-size overlapping character chunks, fed incrementally.
+    Produces exactly the chunks the one-shot splitter produces for the joined text."""
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+        self.chunk_size = chunk_size
+        self.step = chunk_size - chunk_overlap
+        self.chunk_index = 0
+        self.has_text = False
+        self._buffer = ""
+
+    def feed(self, text: str) -> Iterator[Dict[str, Any]]:
+        if not self.has_text and text.strip():
+            self.has_text = True
+        self._buffer += text
+        while len(self._buffer) >= self.chunk_size:
+            yield self._emit()
+
+    def finish(self) -> Iterator[Dict[str, Any]]:
+        while self._buffer:
+            yield self._emit()
+
+    def _emit(self) -> Dict[str, Any]:
+        chunk = {
+            "id": str(uuid.uuid4()),
+            "text": self._buffer[:self.chunk_size],
+            "chunk_index": self.chunk_index
+        }
+        self.chunk_index += 1
+        self._buffer = self._buffer[self.step:]
+        return chunk
+
+@dataclass
+class IngestionStats:
+    chunk_count: int = 0
+    batch_count: int = 0
+    reused_chunks: int = 0
+    has_text: bool = False
+    chunk_refs: List[Dict[str, Any]] = field(default_factory=list)
+    started_at: float = field(default_factory=time.perf_counter)
+    first_chunk_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def time_to_first_chunk(self) -> Optional[float]:
+        """Seconds until the first chunk was queryable in MongoDB"""
+        return self.first_chunk_at - self.started_at if self.first_chunk_at else None
+
+    @property
+    def total_seconds(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def to_dict(self) -> dict:
+        return {
+            "chunks": self.chunk_count,
+            "batches": self.batch_count,
+            "reused_chunks": self.reused_chunks,
+            "time_to_first_chunk": round(self.time_to_first_chunk, 3) if self.time_to_first_chunk is not None else None,
+            "total_seconds": round(self.total_seconds, 3)
+        }
+
+async def pdf_text_pieces(file_content: bytes, stats: Optional[ExtractionStats] = None) -> AsyncIterator[str]:
+    """Page texts of a PDF in order, as the extractor produces them"""
+    async for page in stream_pdf_pages(file_content, stats):
+        if page.text:
+            yield page.text + "\n"
+
+async def txt_text_pieces(file_content: bytes, bytes_done: Optional[List[int]] = None) -> AsyncIterator[str]:
+    """Decode a UTF-8 text file piece by piece"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    view = memoryview(file_content)
+    for start in range(0, len(view), TXT_READ_SIZE):
+        data = view[start:start + TXT_READ_SIZE]
+        if bytes_done is not None:
+            bytes_done[0] = start + len(data)
+        yield decoder.decode(data)
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+async def run_ingestion_pipeline(
+    document_id: str,
+    text_pieces: AsyncIterator[str],
+    on_batch: Optional[Callable[[IngestionStats], Any]] = None
+) -> IngestionStats:
+    """Chunk, embed and store a document as a stream of batches"""
+    stats = IngestionStats()
+    chunker = StreamingChunker()
+    chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=INGEST_QUEUE_SIZE)
+    write_queue: asyncio.Queue = asyncio.Queue(maxsize=INGEST_QUEUE_SIZE)
+
+    async def chunk_stage():
+        batch = []
+        async for piece in text_pieces:
+            for chunk in chunker.feed(piece):
+                batch.append(chunk)
+                if len(batch) == INGEST_BATCH_SIZE:
+                    await chunk_queue.put(batch)
+                    batch = []
+        for chunk in chunker.finish():
+            batch.append(chunk)
+            if len(batch) == INGEST_BATCH_SIZE:
+                await chunk_queue.put(batch)
+                batch = []
+        if batch:
+            await chunk_queue.put(batch)
+        stats.has_text = chunker.has_text
+        await chunk_queue.put(None)
+
+    async def embed_stage():
+        while (batch := await chunk_queue.get()) is not None:
+            for chunk in batch:
+                chunk["hash"] = chunk_hash(chunk["text"])
+            
+            # Reuse vectors of identical chunks embedded before; only new texts hit the model
+            known = await asyncio.to_thread(find_embeddings_by_chunk_hash, list({chunk["hash"] for chunk in batch}))
+            missing = {chunk["hash"]: chunk["text"] for chunk in batch if chunk["hash"] not in known}
+            if missing:
+                vectors = await get_embeddings(list(missing.values()), fallback=False)
+                known.update(zip(missing.keys(), vectors))
+            stats.reused_chunks += sum(1 for chunk in batch if chunk["hash"] not in missing)
+            
+            embeddings = [known[chunk["hash"]] for chunk in batch]
+            await write_queue.put((batch, embeddings))
+        await write_queue.put(None)
+
+    async def write_stage():
+        while (item := await write_queue.get()) is not None:
+            batch, embeddings = item
+            await asyncio.to_thread(insert_embedding_batch, document_id, batch, embeddings)
+            if stats.first_chunk_at is None:
+                stats.first_chunk_at = time.perf_counter()
+            stats.chunk_count += len(batch)
+            stats.batch_count += 1
+            stats.chunk_refs.extend({"id": chunk["id"], "chunk_index": chunk["chunk_index"]} for chunk in batch)
+            if on_batch is not None:
+                result = on_batch(stats)
+                if inspect.isawaitable(result):
+                    await result
+
+    tasks = [asyncio.create_task(stage()) for stage in (chunk_stage, embed_stage, write_stage)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    finally:
+        stats.finished_at = time.perf_counter()
+    return stats
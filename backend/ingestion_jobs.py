@@ -0,0 +1,193 @@
+"""
+Ingestion Jobs Module
+Background document ingestion with progress polling.
+Uploads are stored in GridFS and queued as jobs in MongoDB. Workers in any
+server process claim jobs atomically, report stage/progress/ETA as they go,
+and jobs left behind by a crashed or restarted worker are re-queued until
+they run out of attempts.
+"""
+
+import os
+import time
+import uuid
+import socket
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from mongodb_client import (
+    claim_next_ingestion_job,
+    update_ingestion_job,
+    requeue_stale_ingestion_jobs,
+    fail_stale_ingestion_jobs,
+    read_upload_file,
+    delete_upload_file,
+    delete_embeddings,
+    update_document_metadata
+)
+from pdf_extraction import ExtractionStats
+from question_pool import question_pool
+from ingestion import CHUNK_SIZE, CHUNK_OVERLAP, IngestionStats, run_ingestion_pipeline, pdf_text_pieces, txt_text_pieces
+
+INGEST_JOB_WORKERS = int(os.getenv("INGEST_JOB_WORKERS", "2"))
+INGEST_JOB_POLL_SECONDS = float(os.getenv("INGEST_JOB_POLL_SECONDS", "2"))
+INGEST_JOB_STALE_SECONDS = float(os.getenv("INGEST_JOB_STALE_SECONDS", "120"))
+INGEST_JOB_MAX_ATTEMPTS = int(os.getenv("INGEST_JOB_MAX_ATTEMPTS", "3"))
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+def estimate_eta(started_at: float, progress: float) -> Optional[float]:
+    """Seconds remaining, extrapolated from the rate so far"""
+    if progress <= 0:
+        return None
+    elapsed = time.perf_counter() - started_at
+    return round(elapsed * (1 - progress) / progress, 1)
+
+class IngestionWorkerPool:
+    """asyncio workers that claim and run queued ingestion jobs"""
+
+    def __init__(self, workers: int = INGEST_JOB_WORKERS):
+        self.workers = workers
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def start(self):
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker_loop()) for _ in range(self.workers)]
+        print(f"✅ Started {self.workers} ingestion workers ({WORKER_ID})")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Wake idle workers after a job has been queued"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _worker_loop(self):
+        while True:
+            try:
+                job = await asyncio.to_thread(claim_next_ingestion_job, WORKER_ID)
+            except Exception as e:
+                print(f"⚠️ Ingestion worker could not claim a job: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), INGEST_JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    try:
+                        await self._sweep_stale_jobs()
+                    except Exception:
+                        pass
+                self._wakeup.clear()
+                continue
+
+            await self._run_job(job)
+
+    async def _sweep_stale_jobs(self):
+        """Re-queue abandoned jobs with attempts left; fail the rest so they stop cycling"""
+        await asyncio.to_thread(requeue_stale_ingestion_jobs, INGEST_JOB_STALE_SECONDS, INGEST_JOB_MAX_ATTEMPTS)
+        for job in await asyncio.to_thread(fail_stale_ingestion_jobs, INGEST_JOB_STALE_SECONDS, INGEST_JOB_MAX_ATTEMPTS):
+            print(f"❌ Ingestion job {job['job_id']} failed: worker stopped responding after {INGEST_JOB_MAX_ATTEMPTS} attempts")
+            await asyncio.to_thread(delete_embeddings, job["document_id"])
+            await asyncio.to_thread(update_document_metadata, job["document_id"], status="failed")
+            await asyncio.to_thread(delete_upload_file, job["upload_file_id"])
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(INGEST_JOB_STALE_SECONDS / 3)
+            await asyncio.to_thread(update_ingestion_job, job_id)
+
+    async def _run_job(self, job: Dict[str, Any]):
+        job_id = job["job_id"]
+        document_id = job["document_id"]
+        print(f"🔄 Ingestion job {job_id} started (attempt {job['attempts']}) for document {document_id}")
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+
+        try:
+            await asyncio.to_thread(update_ingestion_job, job_id, stage="extracting", chunks_done=0, pages_done=0, progress=0.0)
+
+            # A retried job starts over, so drop anything a previous attempt wrote
+            await asyncio.to_thread(delete_embeddings, document_id)
+            content = await asyncio.to_thread(read_upload_file, job["upload_file_id"])
+
+            started_at = time.perf_counter()
+            extraction_stats = None
+            if job["filename"].lower().endswith(".pdf"):
+                extraction_stats = ExtractionStats()
+                text_pieces = pdf_text_pieces(content, extraction_stats)
+            else:
+                text_pieces = txt_text_pieces(content)
+
+            async def report_progress(stats: IngestionStats):
+                if stats.batch_count == 1:
+                    # Tutor questions can be drawn from the first chunks while the rest are embedded
+                    question_pool.prefill(document_id)
+                if extraction_stats is not None:
+                    pages_done = len(extraction_stats.page_seconds)
+                    page_count = extraction_stats.page_count
+                    progress = pages_done / page_count if page_count else 0.0
+                else:
+                    # Roughly one chunk per CHUNK_SIZE - CHUNK_OVERLAP bytes of plain text
+                    pages_done, page_count = 0, None
+                    progress = stats.chunk_count * (CHUNK_SIZE - CHUNK_OVERLAP) / len(content) if content else 0.0
+                progress = min(progress, 0.99)
+                await asyncio.to_thread(
+                    update_ingestion_job,
+                    job_id,
+                    stage="embedding",
+                    chunks_done=stats.chunk_count,
+                    pages_done=pages_done,
+                    page_count=page_count,
+                    progress=round(progress, 4),
+                    eta_seconds=estimate_eta(started_at, progress),
+                    time_to_first_chunk=stats.time_to_first_chunk
+                )
+
+            stats = await run_ingestion_pipeline(document_id, text_pieces, on_batch=report_progress)
+
+            if not stats.has_text:
+                raise ValueError("No text could be extracted from the document")
+
+            await asyncio.to_thread(update_ingestion_job, job_id, stage="finalizing")
+            await asyncio.to_thread(update_document_metadata, document_id, status="processed", chunk_count=stats.chunk_count)
+            await asyncio.to_thread(
+                update_ingestion_job,
+                job_id,
+                status="completed",
+                stage="completed",
+                chunks_done=stats.chunk_count,
+                progress=1.0,
+                eta_seconds=0,
+                extraction=extraction_stats.to_dict() if extraction_stats else None,
+                ingestion=stats.to_dict()
+            )
+            await asyncio.to_thread(delete_upload_file, job["upload_file_id"])
+            question_pool.prefill(document_id)
+            print(f"✅ Ingestion job {job_id} completed: {stats.to_dict()}")
+
+        except asyncio.CancelledError:
+            # Server shutting down - leave the job for the stale-job sweep to re-queue
+            raise
+        except Exception as e:
+            print(f"❌ Ingestion job {job_id} failed: {e}")
+            retry = job["attempts"] < INGEST_JOB_MAX_ATTEMPTS and not isinstance(e, ValueError)
+            try:
+                if retry:
+                    await asyncio.to_thread(update_ingestion_job, job_id, status="queued", stage="queued", error=str(e))
+                else:
+                    await asyncio.to_thread(delete_embeddings, document_id)
+                    await asyncio.to_thread(update_document_metadata, document_id, status="failed")
+                    await asyncio.to_thread(update_ingestion_job, job_id, status="failed", stage="failed", error=str(e), eta_seconds=None)
+                    await asyncio.to_thread(delete_upload_file, job["upload_file_id"])
+            except Exception as cleanup_error:
+                print(f"⚠️ Could not record failure for job {job_id}: {cleanup_error}")
+        finally:
+            heartbeat.cancel()
+
+ingestion_workers = IngestionWorkerPool()
@@ -0,0 +1,70 @@
+"""
+LLM Gateway Module
+One shared AsyncOpenAI client for every Groq call (chat, tutor, voice).
+Requests are awaited instead of blocking the event loop, and all modules
+share a pooled keep-alive HTTP connection set (HTTP/2 when h2 is installed),
+so a single worker can keep hundreds of LLM calls in flight.
+"""
+
+import os
+import importlib.util
+from typing import Any, Optional
+import httpx
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+
+load_dotenv()
+
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.groq.com/openai/v1")
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "200"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "50"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+# HTTP/2 multiplexes many requests over one connection; needs the optional h2 package
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "1") == "1" and importlib.util.find_spec("h2") is not None
+
+CHAT_MODEL = "llama-3.3-70b-versatile"
+TRANSCRIPTION_MODEL = "whisper-large-v3"
+
+_client: Optional[AsyncOpenAI] = None
+
+def create_client(base_url: str = LLM_BASE_URL, api_key: Optional[str] = None) -> AsyncOpenAI:
+    """Build an AsyncOpenAI client on a tuned connection pool"""
+    http_client = httpx.AsyncClient(
+        http2=LLM_HTTP2,
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+    )
+    return AsyncOpenAI(
+        api_key=api_key or os.environ.get("GROQ_API_KEY"),
+        base_url=base_url,
+        http_client=http_client,
+        max_retries=LLM_MAX_RETRIES
+    )
+
+def get_client() -> AsyncOpenAI:
+    global _client
+    if _client is None:
+        _client = create_client()
+    return _client
+
+async def chat_completion(**kwargs: Any):
+    """client.chat.completions.create through the shared pool"""
+    return await get_client().chat.completions.create(**kwargs)
+
+async def transcribe(**kwargs: Any):
+    """client.audio.transcriptions.create through the shared pool"""
+    return await get_client().audio.transcriptions.create(**kwargs)
+
+async def close():
+    """Release pooled connections on shutdown"""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
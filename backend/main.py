@@ -1,26 +1,47 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import pdfplumber
-import io
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import uuid
-import random
+from datetime import datetime
+import asyncio
+import json
+import time
 import os
 from dotenv import load_dotenv
-from embeddings import get_embeddings
+from embeddings import (
+    get_embeddings,
+    get_embedding_service_stats,
+    get_query_cache_stats,
+    save_query_cache
+)
 from mongodb_client import (
     connect_mongodb,
     store_document_metadata,
-    store_embeddings,
+    count_document_chunks,
+    store_upload_file,
+    find_document_by_content,
+    create_ingestion_job,
+    get_ingestion_job,
     search_similar_chunks,
+    get_chunk_text,
+    search_library_chunks,
+    get_document_metadata,
+    get_user_documents,
     create_chat_session,
+    get_chat_session,
     add_message_to_session,
-    get_chat_history,
+    get_chat_history_page,
     get_all_sessions,
     delete_session,
-    clear_all_data,
+    clear_user_data,
+    invalidate_document_index,
+    get_index_cache_stats,
+    save_ann_index_if_changed,
+    sync_ann_index,
+    ANN_SAVE_INTERVAL_SECONDS,
+    ANN_SYNC_INTERVAL_SECONDS,
     use_mongodb,
     create_user,
     authenticate_user,
@@ -28,24 +49,51 @@ from mongodb_client import (
 )
 from chat_model import (
     generate_chat_response,
+    stream_chat_response,
     is_greeting_message,
-    get_greeting_response
+    get_greeting_response,
+    GREETING_RESPONSE,
+    THANKS_RESPONSE,
+    PROMPT_RESPONSE
 )
 from tutor_model import (
-    generate_tutor_question,
-    evaluate_tutor_answer
+    evaluate_tutor_answer,
+    evaluate_tutor_answers,
+    explain_answer,
+    is_dont_know_answer,
+    get_evaluation_stats,
+    TUTOR_EVAL_MAX_BATCH,
+    DEFAULT_QUESTION
 )
 from conversational_tutor import (
     get_tutor_response,
     evaluate_student_answer,
     generate_practice_question,
     reset_session,
-    get_session_progress
+    get_session_progress,
+    start_session_store,
+    stop_session_store,
+    get_session_store_stats,
+    TUTOR_ERROR_RESPONSE,
+    TUTOR_ERROR_FEEDBACK
 )
+from ingestion import INGEST_SIGNATURE, content_hash
+from ingestion_jobs import ingestion_workers
+from answer_cache import answer_cache
+from document_registry import DocumentRegistry, DocumentHandle
+from question_pool import question_pool
+import llm_gateway
 from voice_models import (
     speech_to_text_from_bytes,
-    text_to_speech
+    text_to_speech,
+    text_to_speech_sentences,
+    synthesize_sentences,
+    SentenceSplitter,
+    prewarm_tts,
+    get_stt_stats
 )
+from tts_cache import tts_cache
+from audio_processing import EnergyVAD, pcm16_to_wav
 
 app = FastAPI(title="Document Tutor + Chatbot API")
 
@@ -69,17 +117,70 @@ async def startup_event():
     print("🚀 Starting Document Tutor API Server")
     print("="*60)
     ensure_clean_start()
+    
+    from mongodb_client import use_mongodb as mongo_connected
+    if mongo_connected:
+        ingestion_workers.start()
+    start_session_store()
+    global ann_index_saver
+    ann_index_saver = asyncio.create_task(maintain_ann_index())
+    if TTS_PREWARM:
+        prewarm = asyncio.create_task(prewarm_tts_phrases())
+        background_tasks.add(prewarm)
+        prewarm.add_done_callback(background_tasks.discard)
     print("="*60 + "\n")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers and persist caches"""
+    await ingestion_workers.stop()
+    await stop_session_store()
+    if ann_index_saver is not None:
+        ann_index_saver.cancel()
+        await asyncio.gather(ann_index_saver, return_exceptions=True)
+    await asyncio.to_thread(save_ann_index_if_changed)
+    save_query_cache()
+    await llm_gateway.close()
+
 # Global variables
-document_text = ""
-document_chunks = []
-current_document_id = None
+background_tasks = set()  # keeps fire-and-forget tasks referenced until they finish
+ann_index_saver: Optional[asyncio.Task] = None
+# Documents are looked up per request by (user_id, document_id); MongoDB holds the state
+document_registry = DocumentRegistry(get_document_metadata)
+
+async def maintain_ann_index():
+    """
+    Background upkeep of the library index: pick up changes made by other
+    processes every ANN_SYNC_INTERVAL_SECONDS, and write it to disk every
+    ANN_SAVE_INTERVAL_SECONDS instead of on every upload
+    """
+    synced_at = time.monotonic()
+    while True:
+        await asyncio.sleep(min(ANN_SAVE_INTERVAL_SECONDS, ANN_SYNC_INTERVAL_SECONDS))
+        from mongodb_client import use_mongodb as mongo_connected
+        if mongo_connected and time.monotonic() - synced_at >= ANN_SYNC_INTERVAL_SECONDS:
+            synced_at = time.monotonic()
+            try:
+                await asyncio.to_thread(sync_ann_index)
+            except Exception as e:
+                print(f"⚠️ ANN index sync failed: {e}")
+        await asyncio.to_thread(save_ann_index_if_changed)
+
+TTS_PREWARM = os.getenv("TTS_PREWARM", "1") == "1"
+
+async def prewarm_tts_phrases():
+    """Put the fixed phrases the voice and tutor modes speak into the TTS cache"""
+    try:
+        synthesized = await prewarm_tts([
+            GREETING_RESPONSE, THANKS_RESPONSE, PROMPT_RESPONSE, NO_MATCH_RESPONSE,
+            TUTOR_ERROR_RESPONSE, TUTOR_ERROR_FEEDBACK, DEFAULT_QUESTION
+        ])
+        print(f"🔊 TTS cache pre-warmed ({synthesized} clips synthesized)")
+    except Exception as e:
+        print(f"⚠️ TTS pre-warm failed: {e}")
 
 def ensure_clean_start():
     """Ensure we start with a clean database on server startup"""
-    global current_document_id
-    
     try:
         # Connect to MongoDB (required)
         print("🔄 Attempting to connect to MongoDB...")
@@ -92,49 +193,81 @@ def ensure_clean_start():
         else:
             print("✅ MongoDB connected - all features available")
         
-        # Reset document ID
-        current_document_id = None
-        
         print("Startup: Ready for new document")
         
     except Exception as e:
         print(f"⚠️ Startup warning: {e}")
         print("⚠️ Server starting with limited functionality")
-        current_document_id = None
 
 class ChatRequest(BaseModel):
     message: str
+    document_id: Optional[str] = None  # optional for session messages, which know their document
+    user_id: str
+    use_cache: bool = True  # False bypasses the answer cache
+
+class LibrarySearchRequest(BaseModel):
+    query: str
+    user_id: str
+    k: int = 5
 
 class VoiceRequest(BaseModel):
     message: str
     mode: str  # "chat" or "tutor"
+    document_id: Optional[str] = None
+    user_id: str
+    use_cache: bool = True
 
 class VoiceResponse(BaseModel):
     response: str
     audio_text: str
     sources: Optional[List[str]] = None
+    cached: bool = False
 
 class TutorAnswerRequest(BaseModel):
     question: str
     user_answer: str
+    chunk_id: Optional[str] = None  # chunk the question was generated from, as returned with the question
+    document_id: Optional[str] = None
+    user_id: str
+
+class TutorAnswerItem(BaseModel):
+    question: str
+    user_answer: str
+    chunk_id: Optional[str] = None
+
+class TutorBatchAnswerRequest(BaseModel):
+    answers: List[TutorAnswerItem]
+    document_id: Optional[str] = None
+    user_id: str
 
 class DocumentResponse(BaseModel):
     success: bool
     message: str
     chunk_count: int
 
+class UploadJobResponse(BaseModel):
+    success: bool
+    message: str
+    job_id: str
+    document_id: str
+    status: str
+    chunk_count: int = 0
+
 class ChatResponse(BaseModel):
     response: str
     sources: List[str]
+    cached: bool = False  # True when served from the answer cache
 
 class TutorQuestion(BaseModel):
     question: str
+    chunk_id: Optional[str] = None  # send back with the answer so evaluation can skip retrieval
 
 class TutorEvaluation(BaseModel):
     score: int
     correct_points: List[str]
     missing_points: List[str]
     improved_answer: str
+    timings: Optional[Dict[str, float]] = None  # per-stage latency in ms
 
 class RegisterRequest(BaseModel):
     email: str
@@ -152,106 +285,256 @@ class UserResponse(BaseModel):
     first_name: str
     last_name: str
 
-import hashlib
-
-def extract_text_from_pdf(file_content: bytes) -> str:
-    """Extract text from PDF using pdfplumber"""
-    text = ""
-    with pdfplumber.open(io.BytesIO(file_content)) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-    return text
-
-def chunk_document(text: str) -> List[Dict[str, Any]]:
-    """Split document into chunks for RAG"""
-    # Simple text splitter without langchain dependency
-    chunk_size = 500
-    chunk_overlap = 50
-    
-    chunks = []
-    start = 0
-    text_length = len(text)
-    chunk_index = 0
-    
-    while start < text_length:
-        end = start + chunk_size
-        chunk_text = text[start:end]
-        
-        chunks.append({
-            "id": str(uuid.uuid4()),
-            "text": chunk_text,
-            "chunk_index": chunk_index
-        })
-        
-        chunk_index += 1
-        start += chunk_size - chunk_overlap
-    
-    return chunks
-
-async def setup_vector_db(document_id: str, chunks: List[Dict[str, Any]]):
-    """Setup vector database in MongoDB with document chunks"""
+async def retrieve_with_embedding(query: str, document_id: str, k: int = 3):
+    """Query embedding plus the top-k relevant chunks for it from MongoDB"""
     from mongodb_client import use_mongodb as mongo_connected
     
     if not mongo_connected:
-        raise Exception("MongoDB connection required for storing embeddings")
-    
-    # Generate embeddings
-    print(f"Generating embeddings for {len(chunks)} chunks...")
-    texts = [chunk["text"] for chunk in chunks]
-    embeddings = await get_embeddings(texts)
-    
-    # Store embeddings in MongoDB
-    count = store_embeddings(document_id, chunks, embeddings)
-    print(f"✅ {count} embeddings stored in MongoDB")
+        raise Exception("MongoDB connection required for retrieving embeddings")
     
-    return len(chunks)
+    # Use MongoDB search
+    query_embeddings = await get_embeddings([query])
+    results = search_similar_chunks(query_embeddings[0], document_id, k)
+    return query_embeddings[0], results
 
 async def retrieve_relevant_chunks(query: str, document_id: str, k: int = 3) -> List[str]:
     """Retrieve top-k relevant chunks for a query from MongoDB"""
-    from mongodb_client import use_mongodb as mongo_connected
+    _, results = await retrieve_with_embedding(query, document_id, k)
+    return results
+
+NO_MATCH_RESPONSE = "I couldn't find relevant information in the document to answer your question."
+
+def is_error_response(response: str) -> bool:
+    return response.startswith("Error generating response")
+
+async def answer_question(message: str, document_id: str, use_cache: bool = True, no_match_text: str = NO_MATCH_RESPONSE):
+    """
+    RAG answer for a question: (response, sources, cached).
+    Similar questions that retrieve the same chunks reuse a cached answer
+    instead of another LLM call; use_cache=False skips the lookup.
+    """
+    query_embedding, relevant_chunks = await retrieve_with_embedding(message, document_id, k=3)
+    if not relevant_chunks:
+        return no_match_text, [], False
     
+    if use_cache:
+        hit = answer_cache.get(document_id, query_embedding, relevant_chunks)
+        if hit is not None:
+            return hit.response, hit.sources, True
+    
+    # Generate response using GPT with document context
+    context = " ".join(relevant_chunks)
+    response = await generate_chat_response(message, context)
+    sources = relevant_chunks[:2]  # Return top 2 sources
+    if not is_error_response(response):
+        answer_cache.put(document_id, query_embedding, relevant_chunks, response, sources)
+    return response, sources, False
+
+NO_DOCUMENT_DETAIL = "No document uploaded. Please upload a PDF or TXT file first!"
+
+async def require_document(document_id: Optional[str], user_id: str, detail: str = NO_DOCUMENT_DETAIL) -> DocumentHandle:
+    """Resolve the document a request refers to, or raise the matching HTTP error"""
+    if not user_id:
+        raise HTTPException(status_code=401, detail="User ID is required")
+    if not document_id:
+        raise HTTPException(status_code=400, detail=detail)
+    
+    from mongodb_client import use_mongodb as mongo_connected
     if not mongo_connected:
-        raise Exception("MongoDB connection required for retrieving embeddings")
+        raise HTTPException(status_code=503, detail="Database service unavailable")
     
-    # Use MongoDB search
-    query_embeddings = await get_embeddings([query])
-    results = search_similar_chunks(query_embeddings[0], document_id, k)
-    return results
+    handle = await asyncio.to_thread(document_registry.get, user_id, document_id)
+    if handle is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if handle.status == "failed":
+        raise HTTPException(status_code=409, detail="Document processing failed. Please upload it again.")
+    return handle
 
-async def generate_question_from_document() -> str:
-    """Generate a question based on document content using GPT"""
-    if not document_chunks:
-        return "No document loaded."
+async def generate_question_from_document(document_id: str) -> Tuple[str, Optional[str]]:
+    """Generate a question based on document content using GPT: (question, source chunk id)"""
+    # Pre-generated questions are served straight from the pool; a miss generates one from an unasked chunk
+    pooled = await question_pool.take(document_id)
+    if pooled is None:
+        return "No document loaded.", None
+    question = pooled.question
     
-    # Select a random chunk
-    chunk = random.choice(document_chunks)
-    chunk_text = chunk["text"]
+    # Warm the query embedding cache so /tutor/evaluate does not wait on the model
+    warmup = asyncio.create_task(get_embeddings([question]))
+    background_tasks.add(warmup)
+    warmup.add_done_callback(background_tasks.discard)
     
-    return await generate_tutor_question(chunk_text)
+    return question, pooled.chunk_id
 
-async def evaluate_answer(question: str, user_answer: str, document_id: str) -> TutorEvaluation:
-    """Evaluate user answer against document content using GPT"""
-    # Retrieve relevant chunks for the question
+def elapsed_ms(since: float) -> float:
+    return round((time.perf_counter() - since) * 1000, 1)
+
+async def load_evaluation_context(question: str, document_id: str, chunk_id: Optional[str], timings: Dict[str, float]) -> str:
+    """
+    Reference material for evaluating an answer: the chunk the question was
+    generated from when it is known, otherwise the top-5 retrieved chunks.
+    """
+    if chunk_id:
+        started = time.perf_counter()
+        text = await asyncio.to_thread(get_chunk_text, chunk_id, document_id)
+        timings["source_chunk_ms"] = elapsed_ms(started)
+        if text is not None:
+            return text
+    
+    started = time.perf_counter()
     relevant_chunks = await retrieve_relevant_chunks(question, document_id, k=5)
-    context = " ".join(relevant_chunks)
+    timings["retrieval_ms"] = elapsed_ms(started)
+    return " ".join(relevant_chunks)
+
+async def evaluate_answer(
+    question: str,
+    user_answer: str,
+    document_id: str,
+    chunk_id: Optional[str] = None
+) -> TutorEvaluation:
+    """
+    Evaluate user answer against document content using GPT.
+    document_id must already be checked against the user; loading the
+    reference material overlaps answer classification.
+    """
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    context_task = asyncio.create_task(load_evaluation_context(question, document_id, chunk_id, timings))
+    try:
+        stage = time.perf_counter()
+        dont_know = is_dont_know_answer(user_answer)
+        timings["classify_ms"] = elapsed_ms(stage)
+        
+        stage = time.perf_counter()
+        context = await context_task
+        timings["context_wait_ms"] = elapsed_ms(stage)
+    except BaseException:
+        context_task.cancel()
+        await asyncio.gather(context_task, return_exceptions=True)
+        raise
     
-    # Get evaluation from GPT model
-    evaluation_data = await evaluate_tutor_answer(question, user_answer, context)
+    # "I don't know" only needs the answer explained; anything else is graded
+    stage = time.perf_counter()
+    if dont_know:
+        evaluation_data = await explain_answer(question, context)
+    else:
+        evaluation_data = await evaluate_tutor_answer(question, user_answer, context)
+    timings["llm_ms"] = elapsed_ms(stage)
+    timings["total_ms"] = elapsed_ms(started)
     
     return TutorEvaluation(
         score=evaluation_data["score"],
         correct_points=evaluation_data["correct_points"],
         missing_points=evaluation_data["missing_points"],
-        improved_answer=evaluation_data["improved_answer"]
+        improved_answer=evaluation_data["improved_answer"],
+        timings=timings
     )
 
-@app.post("/upload", response_model=DocumentResponse)
-async def upload_document(file: UploadFile = File(...), user_id: str = Form("")):
-    """Upload and process document (PDF or TXT) - Creates embeddings for chat/tutor use"""
-    global document_text, document_chunks, current_document_id
+async def evaluate_answers(items: List[TutorAnswerItem], document_id: str) -> List[TutorEvaluation]:
+    """Evaluate several answers against one document with a single LLM call"""
+    contexts = await asyncio.gather(*(load_evaluation_context(item.question, document_id, item.chunk_id, {}) for item in items))
+    evaluations = await evaluate_tutor_answers([
+        (item.question, item.user_answer, context) for item, context in zip(items, contexts)
+    ])
+    return [TutorEvaluation(**evaluation) for evaluation in evaluations]
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+async def stream_answer(
+    message: str,
+    document_id: str,
+    on_complete=None,
+    no_match_text: str = NO_MATCH_RESPONSE,
+    include_audio_text: bool = False,
+    use_cache: bool = True
+):
+    """
+    Answer a question as server-sent events: a leading `sources` event,
+    one `token` event per model delta, then `done` with the full response.
+    If generation fails mid-answer the stream ends with an `error` event
+    instead. on_complete(response, sources) runs only when the answer is
+    complete, so neither a failed generation nor a client that disconnects
+    mid-answer leaves anything half-written.
+    """
+    done = None
+    try:
+        async for event, data in answer_events(message, document_id, no_match_text, use_cache):
+            if event == "done":
+                done = data
+            else:
+                yield sse_event(event, data)
+    except Exception as e:
+        print(f"Streaming answer failed: {e}")
+        yield sse_event("error", {"detail": f"Error generating response: {str(e)}"})
+        return
     
+    if on_complete is not None:
+        try:
+            await on_complete(done["response"], done["sources"])
+        except Exception as e:
+            yield sse_event("error", {"detail": f"Error saving response: {str(e)}"})
+            return
+    if include_audio_text:
+        done["audio_text"] = done["response"]
+    yield sse_event("done", done)
+
+async def answer_events(
+    message: str,
+    document_id: str,
+    no_match_text: str = NO_MATCH_RESPONSE,
+    use_cache: bool = True,
+    timings: Optional[Dict[str, float]] = None
+):
+    """
+    The streamed answer as (event, data) pairs: ("sources", [...]), then
+    ("token", text) pieces, then ("done", {"response", "sources", "cached"}).
+    Stage latencies go into timings when given.
+    """
+    timings = {} if timings is None else timings
+    cached = False
+    if is_greeting_message(message):
+        response_text = get_greeting_response(message)
+        sources = []
+        yield "sources", sources
+        yield "token", response_text
+    else:
+        started = time.perf_counter()
+        query_embedding, relevant_chunks = await retrieve_with_embedding(message, document_id, k=3)
+        timings["retrieval_ms"] = elapsed_ms(started)
+        sources = relevant_chunks[:2]  # Return top 2 sources
+        yield "sources", sources
+        
+        hit = answer_cache.get(document_id, query_embedding, relevant_chunks) if use_cache and relevant_chunks else None
+        if not relevant_chunks:
+            response_text = no_match_text
+            yield "token", response_text
+        elif hit is not None:
+            response_text = hit.response
+            cached = True
+            yield "token", response_text
+        else:
+            context = " ".join(relevant_chunks)
+            parts = []
+            started = time.perf_counter()
+            async for token in stream_chat_response(message, context):
+                if not parts:
+                    timings["llm_first_token_ms"] = elapsed_ms(started)
+                parts.append(token)
+                yield "token", token
+            timings["llm_ms"] = elapsed_ms(started)
+            # Only reached when the stream completed - a failed generation raises above
+            response_text = "".join(parts).strip()
+            if response_text:
+                answer_cache.put(document_id, query_embedding, relevant_chunks, response_text, sources)
+    
+    yield "done", {"response": response_text, "sources": sources, "cached": cached}
+
+@app.post("/upload", response_model=UploadJobResponse)
+async def upload_document(file: UploadFile = File(...), user_id: str = Form("")):
+    """Upload a document (PDF or TXT) and queue it for background embedding"""
     try:
         # Check MongoDB connection first
         from mongodb_client import use_mongodb as mongo_connected
@@ -264,70 +547,97 @@ async def upload_document(file: UploadFile = File(...), user_id: str = Form(""))
         if not user_id:
             raise HTTPException(status_code=400, detail="User ID is required")
         
-        print(f"📄 Starting document upload: {file.filename} for user: {user_id}")
-        
-        # Step 1: Clear ALL previous document data
-        document_text = ""
-        document_chunks = []
-        current_document_id = None
-        
-        # Step 2: Read and extract text from uploaded file
-        content = await file.read()
-        
-        if file.filename.lower().endswith('.pdf'):
-            document_text = extract_text_from_pdf(content)
-            print("📖 Extracted text from PDF")
-        elif file.filename.lower().endswith('.txt'):
-            document_text = content.decode('utf-8')
-            print("📖 Loaded text from TXT file")
-        else:
+        if not file.filename.lower().endswith(('.pdf', '.txt')):
             raise HTTPException(status_code=400, detail="Only PDF and TXT files are supported")
         
-        if not document_text.strip():
-            raise HTTPException(status_code=400, detail="No text could be extracted from the document")
-        
-        # Step 3: Generate document ID and store metadata (without content)
-        current_document_id = str(uuid.uuid4())
-        store_document_metadata(current_document_id, file.filename, len(content), user_id)
-        print(f"📝 Document metadata stored with ID: {current_document_id}")
+        print(f"📄 Starting document upload: {file.filename} for user: {user_id}")
         
-        # Step 4: Chunk the document for processing
-        document_chunks = chunk_document(document_text)
-        print(f"✂️ Document chunked into {len(document_chunks)} pieces")
+        content = await file.read()
+        document_id = str(uuid.uuid4())
+        file_hash = content_hash(content)
+        
+        # Step 1: Byte-identical re-uploads reuse the stored embeddings - no extraction or model calls
+        source_document_id = await asyncio.to_thread(find_document_by_content, file_hash, INGEST_SIGNATURE)
+        if source_document_id:
+            store_document_metadata(
+                document_id, file.filename, len(content), user_id,
+                status="processed",
+                content_hash=file_hash,
+                ingest_signature=INGEST_SIGNATURE,
+                source_document_id=source_document_id
+            )
+            job_id = create_ingestion_job(
+                document_id, user_id, file.filename, len(content), None,
+                status="completed",
+                stage="deduplicated",
+                progress=1.0,
+                eta_seconds=0,
+                chunks_done=count_document_chunks(source_document_id),
+                source_document_id=source_document_id
+            )
+            question_pool.prefill(document_id)
+            print(f"♻️ Document {document_id} is identical to {source_document_id} - reusing its embeddings")
+            
+            return UploadJobResponse(
+                success=True,
+                message="Document processed successfully. Ready for chat and tutor modes!",
+                job_id=job_id,
+                document_id=document_id,
+                status="completed"
+            )
         
-        # Step 5: Create embeddings and store in MongoDB (only embeddings, not content)
-        print("🔄 Creating embeddings... (this may take a moment)")
-        await setup_vector_db(current_document_id, document_chunks)
+        # Step 2: Keep the upload in GridFS so any worker (or a restarted one) can process it
+        upload_file_id = await asyncio.to_thread(store_upload_file, content, file.filename)
         
-        print(f"✅ Document '{file.filename}' processed successfully!")
-        print(f"📊 Ready for chat and tutor modes with {len(document_chunks)} chunks")
+        # Step 3: Store metadata and queue the ingestion job
+        store_document_metadata(
+            document_id, file.filename, len(content), user_id,
+            status="processing",
+            content_hash=file_hash,
+            ingest_signature=INGEST_SIGNATURE
+        )
+        job_id = create_ingestion_job(document_id, user_id, file.filename, len(content), upload_file_id)
+        ingestion_workers.notify()
+        print(f"📝 Document {document_id} queued as ingestion job {job_id}")
         
-        return DocumentResponse(
+        # Chat and tutor modes can already query the chunks indexed so far
+        return UploadJobResponse(
             success=True,
-            message=f"Document processed successfully. Ready for chat and tutor modes!",
-            chunk_count=len(document_chunks)
+            message="Document queued for processing. Chat and tutor modes will use it as it is indexed.",
+            job_id=job_id,
+            document_id=document_id,
+            status="queued"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        # If there's an error, make sure we clear the data
         import traceback
         error_details = traceback.format_exc()
         print(f"❌ Error processing document: {str(e)}")
         print(f"Full traceback:\n{error_details}")
-        document_text = ""
-        document_chunks = []
-        current_document_id = None
         raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
 
+@app.get("/upload/{job_id}/status")
+async def get_upload_status(job_id: str):
+    """Poll the stage, progress and ETA of a background ingestion job"""
+    try:
+        job = await asyncio.to_thread(get_ingestion_job, job_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting job status: {str(e)}")
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat_with_document(request: ChatRequest):
     """Chat mode - answer questions using document content and GPT"""
-    # Check if document is uploaded and embeddings are ready
-    if not document_text or not current_document_id:
-        raise HTTPException(
-            status_code=400, 
-            detail="No document uploaded. Please upload a PDF or TXT file first to start chatting!"
-        )
+    # Check if document is uploaded and belongs to the user
+    document = await require_document(
+        request.document_id, request.user_id,
+        detail="No document uploaded. Please upload a PDF or TXT file first to start chatting!"
+    )
     
     try:
         # Check if it's a greeting or casual message
@@ -337,48 +647,83 @@ async def chat_with_document(request: ChatRequest):
                 sources=[]
             )
         
-        # Retrieve relevant chunks for actual questions
-        relevant_chunks = await retrieve_relevant_chunks(request.message, current_document_id, k=3)
-        
-        if not relevant_chunks:
-            return ChatResponse(
-                response="I couldn't find relevant information in the document to answer your question. Could you try rephrasing or asking about a different topic from the document?",
-                sources=[]
-            )
-        
-        # Generate response using GPT with document context
-        context = " ".join(relevant_chunks)
-        response = await generate_chat_response(request.message, context)
-        
-        return ChatResponse(
-            response=response,
-            sources=relevant_chunks[:2]  # Return top 2 sources
+        # Retrieve relevant chunks and answer (or reuse a cached answer) for actual questions
+        response, sources, cached = await answer_question(
+            request.message,
+            document.document_id,
+            use_cache=request.use_cache,
+            no_match_text="I couldn't find relevant information in the document to answer your question. Could you try rephrasing or asking about a different topic from the document?"
         )
         
+        return ChatResponse(response=response, sources=sources, cached=cached)
+        
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing chat request: {str(e)}")
 
+@app.post("/chat/stream")
+async def chat_with_document_stream(request: ChatRequest):
+    """Chat mode - stream the answer token by token as server-sent events"""
+    document = await require_document(
+        request.document_id, request.user_id,
+        detail="No document uploaded. Please upload a PDF or TXT file first to start chatting!"
+    )
+    
+    return StreamingResponse(
+        stream_answer(
+            request.message,
+            document.document_id,
+            no_match_text="I couldn't find relevant information in the document to answer your question. Could you try rephrasing or asking about a different topic from the document?",
+            use_cache=request.use_cache
+        ),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+@app.post("/library/search")
+async def search_library(request: LibrarySearchRequest):
+    """Search across every document the user has uploaded"""
+    from mongodb_client import use_mongodb as mongo_connected
+    if not mongo_connected:
+        raise HTTPException(status_code=503, detail="Database service unavailable")
+    
+    try:
+        query_embeddings = await get_embeddings([request.query])
+        results = search_library_chunks(query_embeddings[0], request.user_id, request.k)
+        return {"query": request.query, "results": results}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching library: {str(e)}")
+
 # Chat History Endpoints
+async def require_session_document(session_id: str, request: ChatRequest) -> DocumentHandle:
+    """The document a session message is about: explicit in the request, else the session's own"""
+    if not request.user_id:
+        raise HTTPException(status_code=401, detail="User ID is required")
+    session = await asyncio.to_thread(get_chat_session, session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    if session.get("user_id") != request.user_id:
+        raise HTTPException(status_code=403, detail="Chat session belongs to another user")
+    document_id = request.document_id or session.get("document_id")
+    return await require_document(document_id, request.user_id, detail="No document uploaded")
+
 @app.post("/chat/session/create")
-async def create_new_chat_session(user_id: str = ""):
+async def create_new_chat_session(user_id: str = "", document_id: str = ""):
     """Create a new chat session"""
-    if not current_document_id:
-        raise HTTPException(status_code=400, detail="No document uploaded")
-    
     if not user_id:
         raise HTTPException(status_code=400, detail="User ID is required")
     
+    document = await require_document(document_id, user_id, detail="No document uploaded")
+    
     try:
-        session_id = create_chat_session(current_document_id, user_id)
-        return {"session_id": session_id, "document_id": current_document_id, "user_id": user_id}
+        session_id = create_chat_session(document.document_id, user_id)
+        return {"session_id": session_id, "document_id": document.document_id, "user_id": user_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating session: {str(e)}")
 
 @app.post("/chat/session/{session_id}/message")
 async def send_chat_message(session_id: str, request: ChatRequest):
     """Send a message in a chat session and get response"""
-    if not document_text or not current_document_id:
-        raise HTTPException(status_code=400, detail="No document uploaded")
+    document = await require_session_document(session_id, request)
     
     try:
         # Store user message
@@ -390,44 +735,83 @@ async def send_chat_message(session_id: str, request: ChatRequest):
             add_message_to_session(session_id, "assistant", response_text)
             return ChatResponse(response=response_text, sources=[])
         
-        # Retrieve relevant chunks
-        relevant_chunks = await retrieve_relevant_chunks(request.message, current_document_id, k=3)
-        
-        if not relevant_chunks:
-            response_text = "I couldn't find relevant information in the document to answer your question."
-            add_message_to_session(session_id, "assistant", response_text)
-            return ChatResponse(response=response_text, sources=[])
-        
-        # Generate response
-        context = " ".join(relevant_chunks)
-        response_text = await generate_chat_response(request.message, context)
+        # Retrieve relevant chunks and generate (or reuse) a response
+        response_text, sources, cached = await answer_question(request.message, document.document_id, use_cache=request.use_cache)
         
         # Store assistant response with sources
-        add_message_to_session(session_id, "assistant", response_text, relevant_chunks[:2])
+        add_message_to_session(session_id, "assistant", response_text, sources or None)
         
-        return ChatResponse(response=response_text, sources=relevant_chunks[:2])
+        return ChatResponse(response=response_text, sources=sources, cached=cached)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing message: {str(e)}")
 
+@app.post("/chat/session/{session_id}/message/stream")
+async def send_chat_message_stream(session_id: str, request: ChatRequest):
+    """Send a message in a chat session and stream the response as server-sent events"""
+    document = await require_session_document(session_id, request)
+    
+    try:
+        # Store user message
+        await asyncio.to_thread(add_message_to_session, session_id, "user", request.message)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing message: {str(e)}")
+    
+    async def store_response(response_text: str, sources: List[str]):
+        # Persist once the full answer is known
+        await asyncio.to_thread(add_message_to_session, session_id, "assistant", response_text, sources or None)
+    
+    return StreamingResponse(
+        stream_answer(request.message, document.document_id, on_complete=store_response, use_cache=request.use_cache),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
 @app.get("/chat/session/{session_id}/history")
-async def get_session_history(session_id: str):
-    """Get chat history for a session"""
+async def get_session_history(
+    session_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[int] = Query(None, ge=0),
+    after: Optional[int] = Query(None, ge=0)
+):
+    """
+    Get chat history for a session, one page at a time. The newest page comes
+    first; pass the returned `before` to load older messages, or `after` to
+    fetch only messages newer than what the client already has. Both are
+    message positions, not timestamps.
+    """
     try:
-        history = get_chat_history(session_id)
-        return {"session_id": session_id, "messages": history}
+        page = await asyncio.to_thread(get_chat_history_page, session_id, limit, before, after)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting history: {str(e)}")
+    
+    if page is None:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    return {"session_id": session_id, **page}
 
 @app.get("/chat/sessions")
-async def get_chat_sessions():
-    """Get all chat sessions for current document"""
-    if not current_document_id:
-        raise HTTPException(status_code=400, detail="No document uploaded")
+async def get_chat_sessions(
+    user_id: str,
+    document_id: str = "",
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[datetime] = None,
+    before_session_id: Optional[str] = None
+):
+    """
+    Get a document's chat sessions, most recently active first; pass the
+    returned `before` and `before_session_id` together for the next page
+    """
+    document = await require_document(document_id, user_id, detail="No document uploaded")
     
     try:
-        sessions = get_all_sessions(current_document_id)
-        return {"document_id": current_document_id, "sessions": sessions}
+        sessions = await asyncio.to_thread(get_all_sessions, document.document_id, limit, before, before_session_id)
+        last = sessions[-1] if len(sessions) == limit else None
+        return {
+            "document_id": document.document_id,
+            "sessions": sessions,
+            "before": last["updated_at"] if last else None,
+            "before_session_id": last["session_id"] if last else None
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting sessions: {str(e)}")
 
@@ -441,18 +825,17 @@ async def delete_chat_session(session_id: str):
         raise HTTPException(status_code=500, detail=f"Error deleting session: {str(e)}")
 
 @app.get("/tutor/question", response_model=TutorQuestion)
-async def get_tutor_question():
+async def get_tutor_question(user_id: str, document_id: str = ""):
     """Get a question for tutor mode"""
-    # Check if document is uploaded and embeddings are ready
-    if not document_text or not current_document_id:
-        raise HTTPException(
-            status_code=400, 
-            detail="No document uploaded. Please upload a PDF or TXT file first to start tutor mode!"
-        )
+    # Check if document is uploaded and belongs to the user
+    document = await require_document(
+        document_id, user_id,
+        detail="No document uploaded. Please upload a PDF or TXT file first to start tutor mode!"
+    )
     
     try:
-        question = await generate_question_from_document()
-        return TutorQuestion(question=question)
+        question, chunk_id = await generate_question_from_document(document.document_id)
+        return TutorQuestion(question=question, chunk_id=chunk_id)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating question: {str(e)}")
@@ -460,35 +843,59 @@ async def get_tutor_question():
 @app.post("/tutor/evaluate", response_model=TutorEvaluation)
 async def evaluate_tutor_answer_endpoint(request: TutorAnswerRequest):
     """Evaluate user's answer in tutor mode"""
-    # Check if document is uploaded and embeddings are ready
-    if not document_text or not current_document_id:
-        raise HTTPException(
-            status_code=400, 
-            detail="No document uploaded. Please upload a PDF or TXT file first to use tutor mode!"
-        )
+    # Nothing is loaded for the document until it is known to belong to the user
+    document = await require_document(
+        request.document_id, request.user_id,
+        detail="No document uploaded. Please upload a PDF or TXT file first to use tutor mode!"
+    )
     
     try:
-        evaluation = await evaluate_answer(request.question, request.user_answer, current_document_id)
+        evaluation = await evaluate_answer(request.question, request.user_answer, document.document_id, request.chunk_id)
         return evaluation
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error evaluating answer: {str(e)}")
 
-@app.post("/session/start")
-async def start_new_session():
-    """Start a new session - clear all previous document data"""
-    global document_text, document_chunks, current_document_id
+@app.post("/tutor/evaluate/batch", response_model=List[TutorEvaluation])
+async def evaluate_tutor_answers_endpoint(request: TutorBatchAnswerRequest):
+    """Evaluate several tutor answers at once, in request order"""
+    if not request.answers:
+        raise HTTPException(status_code=400, detail="No answers to evaluate")
+    if len(request.answers) > TUTOR_EVAL_MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {TUTOR_EVAL_MAX_BATCH} answers per batch")
+    document = await require_document(
+        request.document_id, request.user_id,
+        detail="No document uploaded. Please upload a PDF or TXT file first to use tutor mode!"
+    )
     
     try:
-        # Clear all memory variables
-        document_text = ""
-        document_chunks = []
-        current_document_id = None
+        return await evaluate_answers(request.answers, document.document_id)
         
-        # Clear MongoDB data
-        clear_all_data()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error evaluating answers: {str(e)}")
+
+def clear_documents(user_id: str):
+    """Delete one user's documents and drop cached copies"""
+    if not user_id:
+        raise ValueError("clear_documents needs a user_id")
+    for document_id in clear_user_data(user_id):
+        answer_cache.invalidate(document_id)
+        question_pool.invalidate(document_id)
+        invalidate_document_index(document_id)
+    document_registry.invalidate(user_id=user_id)
+
+@app.post("/session/start")
+async def start_new_session(user_id: str):
+    """Start a new session - clear the user's previous document data"""
+    if not user_id:
+        raise HTTPException(status_code=401, detail="User ID is required")
+    
+    try:
+        await asyncio.to_thread(clear_documents, user_id)
         
-        print("New session started - all previous data cleared")
+        print(f"New session started - previous data of user {user_id} cleared")
         
         return {
             "success": True, 
@@ -503,42 +910,52 @@ async def start_new_session():
         }
 
 @app.post("/clear")
-async def clear_document():
-    """Clear current document and embeddings"""
-    global document_text, document_chunks, current_document_id
+async def clear_document(user_id: str):
+    """Clear the user's documents and embeddings"""
+    if not user_id:
+        raise HTTPException(status_code=401, detail="User ID is required")
     
     try:
-        # Clear all document data
-        document_text = ""
-        document_chunks = []
-        current_document_id = None
-        
-        # Clear MongoDB data
-        clear_all_data()
+        await asyncio.to_thread(clear_documents, user_id)
         
-        return {"success": True, "message": "All document data cleared from memory and MongoDB"}
+        return {"success": True, "message": "Your document data was cleared from memory and MongoDB"}
     except Exception as e:
         return {"success": False, "message": f"Error clearing data: {str(e)}"}
 
 @app.get("/document/status")
-async def get_document_status():
-    """Get current document status"""
+async def get_document_status(user_id: str, document_id: str = ""):
+    """Get a document's status"""
+    if not document_id:
+        return {"document_loaded": False, "chunks_count": 0, "document_id": None, "has_embeddings": False}
+    
+    document = await require_document(document_id, user_id)
+    chunks_count = await asyncio.to_thread(count_document_chunks, document.document_id)
     return {
-        "document_loaded": bool(document_text),
-        "chunks_count": len(document_chunks) if document_chunks else 0,
-        "document_id": current_document_id,
-        "has_embeddings": current_document_id is not None
+        "document_loaded": True,
+        "chunks_count": chunks_count,
+        "document_id": document.document_id,
+        "status": document.status,
+        "has_embeddings": chunks_count > 0
     }
 
+@app.get("/documents")
+async def list_documents(user_id: str):
+    """List a user's documents, most recent first"""
+    from mongodb_client import use_mongodb as mongo_connected
+    if not mongo_connected:
+        raise HTTPException(status_code=503, detail="Database service unavailable")
+    
+    try:
+        documents = await asyncio.to_thread(get_user_documents, user_id)
+        return {"user_id": user_id, "documents": documents}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error listing documents: {str(e)}")
+
 @app.post("/voice/chat", response_model=VoiceResponse)
 async def voice_chat(request: VoiceRequest):
     """Voice mode - chat with document using voice input"""
     # Check if document is uploaded
-    if not document_text or not current_document_id:
-        raise HTTPException(
-            status_code=400,
-            detail="No document uploaded. Please upload a PDF or TXT file first!"
-        )
+    document = await require_document(request.document_id, request.user_id)
     
     try:
         # Check if it's a greeting
@@ -550,44 +967,41 @@ async def voice_chat(request: VoiceRequest):
                 sources=[]
             )
         
-        # Retrieve relevant chunks
-        relevant_chunks = await retrieve_relevant_chunks(request.message, current_document_id, k=3)
-        
-        if not relevant_chunks:
-            response_text = "I couldn't find relevant information in the document to answer your question."
-            return VoiceResponse(
-                response=response_text,
-                audio_text=response_text,
-                sources=[]
-            )
-        
-        # Generate response
-        context = " ".join(relevant_chunks)
-        response_text = await generate_chat_response(request.message, context)
+        # Retrieve relevant chunks and generate (or reuse) a response
+        response_text, sources, cached = await answer_question(request.message, document.document_id, use_cache=request.use_cache)
         
         return VoiceResponse(
             response=response_text,
             audio_text=response_text,
-            sources=relevant_chunks[:2]
+            sources=sources,
+            cached=cached
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing voice chat: {str(e)}")
 
+@app.post("/voice/chat/stream")
+async def voice_chat_stream(request: VoiceRequest):
+    """Voice mode - stream the answer as server-sent events (done carries audio_text)"""
+    document = await require_document(request.document_id, request.user_id)
+    
+    return StreamingResponse(
+        stream_answer(request.message, document.document_id, include_audio_text=True, use_cache=request.use_cache),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
 @app.get("/voice/tutor/question")
-async def voice_tutor_question():
+async def voice_tutor_question(user_id: str, document_id: str = ""):
     """Voice mode - get a tutor question"""
     # Check if document is uploaded
-    if not document_text or not current_document_id:
-        raise HTTPException(
-            status_code=400,
-            detail="No document uploaded. Please upload a PDF or TXT file first!"
-        )
+    document = await require_document(document_id, user_id)
     
     try:
-        question = await generate_question_from_document()
+        question, chunk_id = await generate_question_from_document(document.document_id)
         return {
             "question": question,
+            "chunk_id": chunk_id,
             "audio_text": question
         }
     except Exception as e:
@@ -597,14 +1011,10 @@ async def voice_tutor_question():
 async def voice_tutor_evaluate(request: TutorAnswerRequest):
     """Voice mode - evaluate tutor answer"""
     # Check if document is uploaded
-    if not document_text or not current_document_id:
-        raise HTTPException(
-            status_code=400,
-            detail="No document uploaded. Please upload a PDF or TXT file first!"
-        )
+    document = await require_document(request.document_id, request.user_id)
     
     try:
-        evaluation = await evaluate_answer(request.question, request.user_answer, current_document_id)
+        evaluation = await evaluate_answer(request.question, request.user_answer, document.document_id, request.chunk_id)
         
         # Create a voice-friendly response
         audio_text = f"You scored {evaluation.score} out of 10. "
@@ -620,7 +1030,8 @@ async def voice_tutor_evaluate(request: TutorAnswerRequest):
             "correct_points": evaluation.correct_points,
             "missing_points": evaluation.missing_points,
             "improved_answer": evaluation.improved_answer,
-            "audio_text": audio_text
+            "audio_text": audio_text,
+            "timings": evaluation.timings
         }
         
     except Exception as e:
@@ -677,7 +1088,7 @@ async def conversational_question(request: dict):
 async def conversational_progress(session_id: str):
     """Get conversational tutor progress"""
     try:
-        progress = get_session_progress(session_id)
+        progress = await get_session_progress(session_id)
         return progress
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
@@ -687,7 +1098,7 @@ async def conversational_reset(request: dict):
     """Reset conversational tutor session"""
     try:
         session_id = request.get("session_id", "default")
-        result = reset_session(session_id)
+        result = await reset_session(session_id)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
@@ -711,6 +1122,116 @@ async def transcribe_audio(audio: UploadFile = File(...)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Transcription error: {str(e)}")
 
+STT_STREAM_MAX_PARALLEL = int(os.getenv("STT_STREAM_MAX_PARALLEL", "4"))
+
+async def receive_turn_start(websocket: WebSocket, send) -> Optional[Dict[str, Any]]:
+    """
+    The JSON object that opens a turn, or None after reporting a bad frame.
+    Audio sent without a start message is skipped up to the turn's end message.
+    """
+    frame = await websocket.receive()
+    if frame["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(frame.get("code", 1000))
+    if frame.get("text") is None:
+        await send({"type": "error", "status": 400, "detail": "Start each turn with a JSON message"})
+        await skip_to_turn_end(websocket)
+        return None
+    try:
+        start = json.loads(frame["text"])
+    except ValueError:
+        start = None
+    if not isinstance(start, dict):
+        await send({"type": "error", "status": 400, "detail": "The start message must be a JSON object"})
+        return None
+    return start
+
+async def skip_to_turn_end(websocket: WebSocket):
+    """Discard binary frames up to the next text frame (the client's end message)"""
+    while True:
+        frame = await websocket.receive()
+        if frame["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(frame.get("code", 1000))
+        if frame.get("text") is not None:
+            return
+
+@app.websocket("/voice/transcribe/stream")
+async def transcribe_audio_stream(websocket: WebSocket):
+    """
+    Incremental transcription while the student is still talking.
+    client: {"sample_rate": 16000} as text, then 16-bit little-endian mono
+            PCM as binary frames, then {"type": "end"}
+    server: {"type": "partial", "index", "text"} as each speech segment is
+            transcribed (segments are cut by voice activity and sent to
+            Whisper in parallel), then {"type": "final", "text", "timings"}
+    Only the last segment is still in flight when the student stops, so the
+    final transcript arrives about one short segment after "end". The
+    connection can be reused for further utterances.
+    """
+    await websocket.accept()
+    send_lock = asyncio.Lock()
+    whisper_slots = asyncio.Semaphore(STT_STREAM_MAX_PARALLEL)
+    
+    async def send(event: Dict[str, Any]):
+        async with send_lock:
+            await websocket.send_json(event)
+    
+    try:
+        while True:
+            start = await receive_turn_start(websocket, send)
+            if start is None:
+                continue
+            try:
+                sample_rate = int(start.get("sample_rate", 16000))
+            except (TypeError, ValueError):
+                sample_rate = 0
+            if start.get("encoding", "pcm_s16le") != "pcm_s16le" or not 8000 <= sample_rate <= 48000:
+                await send({"type": "error", "status": 400, "detail": "Send 16-bit mono PCM (pcm_s16le) at 8-48 kHz"})
+                continue
+            
+            vad = EnergyVAD(sample_rate)
+            texts: Dict[int, str] = {}
+            tasks = []
+            
+            async def transcribe_segment(index: int, pcm: bytes):
+                async with whisper_slots:
+                    text = (await speech_to_text_from_bytes(pcm16_to_wav(pcm, sample_rate), f"segment-{index}.wav")).strip()
+                texts[index] = text
+                if text:
+                    await send({"type": "partial", "index": index, "text": text})
+            
+            def submit(segments: List[bytes]):
+                for pcm in segments:
+                    tasks.append(asyncio.create_task(transcribe_segment(len(tasks), pcm)))
+            
+            try:
+                while True:
+                    frame = await websocket.receive()
+                    if frame["type"] == "websocket.disconnect":
+                        return
+                    if frame.get("bytes") is not None:
+                        submit(vad.feed(frame["bytes"]))
+                    elif frame.get("text") is not None:
+                        break
+                
+                ended = time.perf_counter()
+                submit(vad.flush())
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+            
+            await send({
+                "type": "final",
+                "text": " ".join(texts[i] for i in sorted(texts) if texts[i]),
+                "segments": len(tasks),
+                "timings": {
+                    "audio_ms": vad.duration_ms,
+                    "final_after_end_ms": elapsed_ms(ended)
+                }
+            })
+    except WebSocketDisconnect:
+        pass
+
 @app.post("/voice/synthesize")
 async def synthesize_speech(request: dict):
     """Convert text to speech using Orpheus V1 English"""
@@ -736,6 +1257,148 @@ async def synthesize_speech(request: dict):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"TTS error: {str(e)}")
 
+VOICE_TURN_MAX_AUDIO_BYTES = int(os.getenv("VOICE_TURN_MAX_AUDIO_BYTES", str(25 * 1024 * 1024)))
+
+@app.websocket("/voice/turn")
+async def voice_turn(websocket: WebSocket):
+    """
+    A whole voice turn on one connection: transcribe, retrieve, generate
+    and speak, with speech starting on the first complete sentence while
+    the rest of the answer is still being generated. Per turn:
+      client: {"document_id", "user_id", "filename"?, "use_cache"?} as text,
+              the recording as binary frames, then {"type": "end"}
+      server: {"type": "transcript"}, {"type": "sources"}, {"type": "token"}...
+              as text interleaved with binary audio/mpeg frames, then
+              {"type": "done", ..., "timings"} or {"type": "error"}
+    The connection stays open for further turns.
+    """
+    await websocket.accept()
+    send_lock = asyncio.Lock()
+    
+    async def send(event: Dict[str, Any] = None, audio: bytes = None):
+        # Audio and events are sent from different tasks; one frame at a time
+        async with send_lock:
+            if audio is not None:
+                await websocket.send_bytes(audio)
+            else:
+                await websocket.send_json(event)
+    
+    try:
+        while True:
+            start = await receive_turn_start(websocket, send)
+            if start is None:
+                continue
+            received = time.perf_counter()
+            audio = bytearray()
+            while True:
+                frame = await websocket.receive()
+                if frame["type"] == "websocket.disconnect":
+                    return
+                if frame.get("bytes") is not None:
+                    audio.extend(frame["bytes"])
+                    if len(audio) > VOICE_TURN_MAX_AUDIO_BYTES:
+                        # Reject as soon as the cap is crossed instead of buffering the rest
+                        audio = None
+                        await send({"type": "error", "status": 413, "detail": "Recording too large"})
+                        await skip_to_turn_end(websocket)
+                        break
+                elif frame.get("text") is not None:
+                    break
+            
+            if audio is None:
+                continue
+            try:
+                await run_voice_turn(send, start, bytes(audio), received)
+            except HTTPException as e:
+                await send({"type": "error", "status": e.status_code, "detail": e.detail})
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                await send({"type": "error", "status": 500, "detail": f"Error processing voice turn: {str(e)}"})
+    except WebSocketDisconnect:
+        pass
+
+async def run_voice_turn(send, start: Dict[str, Any], audio: bytes, received: float):
+    timings: Dict[str, float] = {"upload_ms": elapsed_ms(received)}
+    started = time.perf_counter()
+    
+    # The document check overlaps transcription
+    document_check = asyncio.create_task(require_document(start.get("document_id"), start.get("user_id", "")))
+    try:
+        stage = time.perf_counter()
+        text = (await speech_to_text_from_bytes(audio, start.get("filename") or "audio.webm")).strip()
+        timings["stt_ms"] = elapsed_ms(stage)
+        document = await document_check
+    finally:
+        if not document_check.done():
+            document_check.cancel()
+            await asyncio.gather(document_check, return_exceptions=True)
+    if not text:
+        raise HTTPException(status_code=400, detail="Could not transcribe audio")
+    await send({"type": "transcript", "text": text})
+    
+    # Sentences go to the synthesizer as soon as the splitter completes them
+    sentences: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+    
+    async def next_sentences():
+        while True:
+            sentence = await sentences.get()
+            if sentence is None:
+                return
+            yield sentence
+    
+    async def speak():
+        async for chunk in synthesize_sentences(next_sentences()):
+            if "first_audio_ms" not in timings:
+                timings["first_audio_ms"] = elapsed_ms(started)
+            await send(audio=chunk)
+    
+    speaker = asyncio.create_task(speak())
+    splitter = SentenceSplitter()
+    done = None
+    try:
+        async for event, data in answer_events(text, document.document_id, use_cache=start.get("use_cache", True), timings=timings):
+            if event == "token":
+                for sentence in splitter.feed(data):
+                    sentences.put_nowait(sentence)
+                await send({"type": "token", "text": data})
+            elif event == "sources":
+                await send({"type": "sources", "sources": data})
+            else:
+                done = data
+        for sentence in splitter.flush():
+            sentences.put_nowait(sentence)
+        sentences.put_nowait(None)
+        stage = time.perf_counter()
+        await speaker
+        timings["tts_tail_ms"] = elapsed_ms(stage)
+    finally:
+        if not speaker.done():
+            speaker.cancel()
+            await asyncio.gather(speaker, return_exceptions=True)
+    
+    timings["total_ms"] = elapsed_ms(started)
+    await send({"type": "done", "transcript": text, **done, "timings": timings})
+
+AUDIO_STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@app.api_route("/voice/synthesize/stream", methods=["GET", "POST"])
+async def synthesize_speech_stream(text: str = Query(""), request: Optional[Dict[str, Any]] = None):
+    """
+    Stream text as raw audio/mpeg, sentence by sentence, so playback starts
+    after the first sentence. GET ?text=... can be used directly as an
+    <audio> source; POST takes {"text": ...} like /voice/synthesize.
+    """
+    text = text or (request or {}).get("text", "")
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Text is required")
+    
+    return StreamingResponse(
+        text_to_speech_sentences(text),
+        media_type="audio/mpeg",
+        headers=AUDIO_STREAM_HEADERS
+    )
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -743,10 +1406,17 @@ async def health_check():
     
     return {
         "status": "healthy" if mongodb_connected else "degraded",
-        "document_loaded": bool(document_text),
-        "chunks_count": len(document_chunks) if document_chunks else 0,
-        "document_id": current_document_id,
         "mongodb_connected": mongodb_connected,
+        "document_registry": document_registry.stats(),
+        "embedding_cache": get_index_cache_stats(),
+        "embedding_service": get_embedding_service_stats(),
+        "query_embedding_cache": get_query_cache_stats(),
+        "answer_cache": answer_cache.stats(),
+        "tutor_sessions": get_session_store_stats(),
+        "question_pool": question_pool.stats(),
+        "tutor_evaluation": get_evaluation_stats(),
+        "tts_cache": tts_cache.stats(),
+        "speech_to_text": get_stt_stats(),
         "message": "MongoDB connection required" if not mongodb_connected else "All systems operational"
     }
 
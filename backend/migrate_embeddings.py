@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Embedding Storage Migration Script
+Re-encodes every stored embedding into the given storage format
+(array, float32, float16 or int8). Safe to re-run: documents already in
+the target format are skipped, and readers understand every format, so the
+server can stay up while this runs.
+"""
+
+import sys
+import argparse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from vector_codec import FORMATS, EMBEDDING_STORAGE_FORMAT
+from mongodb_client import connect_mongodb, migrate_embedding_storage
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--format", choices=FORMATS, default=EMBEDDING_STORAGE_FORMAT)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    if not connect_mongodb():
+        sys.exit(1)
+
+    print(f"🔄 Migrating embeddings to '{args.format}'...")
+    count = migrate_embedding_storage(args.format, args.batch_size)
+    print(f"✅ Migrated {count} embeddings")
@@ -6,12 +6,16 @@ Handles MongoDB Atlas connection and operations for vector embeddings and chat h
 import os
 import ssl
 from typing import List, Dict, Any, Optional
-from datetime import datetime
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+from datetime import datetime, timedelta, timezone
+from pymongo import MongoClient, ReturnDocument
+from pymongo.errors import ConnectionFailure, DuplicateKeyError
 from dotenv import load_dotenv
 import uuid
 import certifi
+import gridfs
+from vector_search import VectorIndex, DocumentIndexCache
+from vector_codec import EMBEDDING_STORAGE_FORMAT, EMBEDDING_FIELDS, encode_embedding, decode_embedding, decode_matrix
+from ann_index import ANN_BACKEND, create_index, load_index
 
 load_dotenv()
 
@@ -21,8 +25,34 @@ client = None
 db = None
 use_mongodb = False
 
+# Decoded per-document embedding matrices (default budget: 256 MB)
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+index_cache = DocumentIndexCache(EMBEDDING_CACHE_MAX_BYTES)
+
+# document_id -> document_id that owns the embeddings (differs for deduplicated uploads)
+_document_sources: Dict[str, str] = {}
+
+# Chat session size control: "bucket" moves the oldest messages to chat_history_buckets once a
+# session holds CHAT_SESSION_MAX_MESSAGES, "cap" drops them, "none" keeps everything inline
+CHAT_HISTORY_OVERFLOW = os.getenv("CHAT_HISTORY_OVERFLOW", "bucket")
+CHAT_SESSION_MAX_MESSAGES = int(os.getenv("CHAT_SESSION_MAX_MESSAGES", "200"))
+CHAT_BUCKET_SIZE = int(os.getenv("CHAT_BUCKET_SIZE", "100"))
+
+# Library-wide nearest-neighbour index, restored from local disk when available.
+# Each process holds its own copy; sync_ann_index reconciles it with MongoDB at
+# connect time and every ANN_SYNC_INTERVAL_SECONDS, so a stale file or another
+# process's uploads and deletions are picked up.
+ann_index = load_index()
+ann_index_loaded = ann_index is not None
+if ann_index is None:
+    ann_index = create_index()
+# Changes are written to disk by save_ann_index_if_changed (run on a timer and at shutdown), not per upload
+ANN_SAVE_INTERVAL_SECONDS = float(os.getenv("ANN_SAVE_INTERVAL_SECONDS", "30"))
+ANN_SYNC_INTERVAL_SECONDS = float(os.getenv("ANN_SYNC_INTERVAL_SECONDS", "60"))
+_ann_index_changed = False
+
 def connect_mongodb():
-    global client, db, use_mongodb
+    global client, db, use_mongodb, ann_index_loaded
     
     try:
         if not MONGODB_URI:
@@ -56,9 +86,20 @@ def connect_mongodb():
         
         # Create indexes
         print("🔄 Creating database indexes...")
-        db.embeddings.create_index([("document_id", 1)])
+        db.embeddings.create_index([("document_id", 1), ("chunk_index", 1)])
+        db.embeddings.create_index([("chunk_id", 1)])
+        db.embeddings.create_index([("chunk_hash", 1)])
+        db.documents.create_index([("content_hash", 1), ("ingest_signature", 1)])
         db.chat_history.create_index([("session_id", 1)])
+        db.chat_history.create_index([("document_id", 1), ("updated_at", -1), ("session_id", -1)])
+        db.chat_history_buckets.create_index([("session_id", 1), ("seq", 1)], unique=True)
         db.documents.create_index([("document_id", 1)])
+        db.documents.create_index([("user_id", 1), ("uploaded_at", -1)])
+        db.documents.create_index([("source_document_id", 1)])
+        db.ingestion_jobs.create_index([("job_id", 1)], unique=True)
+        db.ingestion_jobs.create_index([("status", 1), ("created_at", 1)])
+        db.tutor_sessions.create_index([("session_id", 1)], unique=True)
+        db.tutor_sessions.create_index([("expires_at", 1)], expireAfterSeconds=0)
         try:
             db.users.create_index([("email", 1)], unique=True)
         except Exception as idx_error:
@@ -66,6 +107,15 @@ def connect_mongodb():
             print(f"   Note: {idx_error}")
         
         print("✅ Database indexes ready")
+        
+        try:
+            if ann_index_loaded:
+                # The file may predate a crash or another process's changes
+                sync_ann_index()
+            else:
+                rebuild_ann_index()
+        except Exception as index_error:
+            print(f"⚠️ ANN index rebuild failed: {index_error}")
 
         return True
 
@@ -162,7 +212,7 @@ def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
     }
 
 # Document operations
-def store_document_metadata(document_id: str, filename: str, file_size: int, user_id: str):
+def store_document_metadata(document_id: str, filename: str, file_size: int, user_id: str, status: str = "processed", **fields):
     """Store document metadata"""
     database = get_db()
     
@@ -172,55 +222,343 @@ def store_document_metadata(document_id: str, filename: str, file_size: int, use
         "filename": filename,
         "file_size": file_size,
         "uploaded_at": datetime.utcnow(),
-        "status": "processed"
+        "status": status,
+        **fields
     }
     database.documents.insert_one(doc)
     return document_id
 
+def find_document_by_content(content_hash: str, ingest_signature: str) -> Optional[str]:
+    """Find an already-embedded document with identical bytes, model and chunking parameters"""
+    database = get_db()
+    
+    doc = database.documents.find_one(
+        {"content_hash": content_hash, "ingest_signature": ingest_signature, "status": "processed"},
+        {"document_id": 1, "source_document_id": 1, "_id": 0}
+    )
+    if not doc:
+        return None
+    return doc.get("source_document_id") or doc["document_id"]
+
+def resolve_document_id(document_id: str) -> str:
+    """Map a deduplicated upload to the document that owns its embeddings"""
+    source = _document_sources.get(document_id)
+    if source is None:
+        database = get_db()
+        doc = database.documents.find_one({"document_id": document_id}, {"source_document_id": 1, "_id": 0})
+        source = (doc or {}).get("source_document_id") or document_id
+        if doc is not None:
+            # Only cache once the metadata exists, so the mapping cannot go stale
+            _document_sources[document_id] = source
+    return source
+
+DOCUMENT_FIELDS = {
+    "document_id": 1, "user_id": 1, "filename": 1, "file_size": 1, "status": 1,
+    "chunk_count": 1, "source_document_id": 1, "uploaded_at": 1, "_id": 0
+}
+
+def get_document_metadata(document_id: str) -> Optional[Dict[str, Any]]:
+    """Metadata of one document (no content)"""
+    database = get_db()
+    
+    return database.documents.find_one({"document_id": document_id}, DOCUMENT_FIELDS)
+
+def get_user_documents(user_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+    """A user's documents, most recent upload first"""
+    database = get_db()
+    
+    return list(database.documents.find({"user_id": user_id}, DOCUMENT_FIELDS).sort("uploaded_at", -1).limit(limit))
+
+def update_document_metadata(document_id: str, **fields):
+    """Update status or other metadata fields of a document"""
+    database = get_db()
+    
+    database.documents.update_one({"document_id": document_id}, {"$set": fields})
+
+def delete_document(document_id: str):
+    """Remove a document's metadata and embeddings"""
+    database = get_db()
+    
+    database.documents.delete_one({"document_id": document_id})
+    delete_embeddings(document_id)
+
 # Vector embedding operations
 def store_embeddings(document_id: str, chunks: List[Dict[str, Any]], embeddings: List[List[float]]):
     """Store document chunks with their embeddings in MongoDB"""
+    # Clear existing embeddings for this document
+    delete_embeddings(document_id)
+    
+    # Store new embeddings
+    return insert_embedding_batch(document_id, chunks, embeddings)
+
+def delete_embeddings(document_id: str):
+    """Delete every stored embedding of a document"""
     database = get_db()
     
-    # Clear existing embeddings for this document
     database.embeddings.delete_many({"document_id": document_id})
+    invalidate_document_index(document_id)
+    ann_index.remove_document(document_id)
+    mark_ann_index_changed()
+
+def insert_embedding_batch(document_id: str, chunks: List[Dict[str, Any]], embeddings: List[List[float]]) -> int:
+    """Append one batch of chunk embeddings with a single insert_many"""
+    database = get_db()
     
-    # Store new embeddings
     embedding_docs = []
     for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
         embedding_docs.append({
             "document_id": document_id,
             "chunk_id": chunk["id"],
-            "chunk_index": i,
+            "chunk_index": chunk.get("chunk_index", i),
             "text": chunk["text"],
-            "embedding": embedding,
+            "chunk_hash": chunk.get("hash"),
+            **encode_embedding(embedding),
             "created_at": datetime.utcnow()
         })
     
     if embedding_docs:
         database.embeddings.insert_many(embedding_docs)
     
+    invalidate_document_index(document_id)
+    
+    # Keep the library index in step with the collection
+    ann_index.add(document_id, [doc["chunk_id"] for doc in embedding_docs], embeddings[:len(embedding_docs)])
+    mark_ann_index_changed()
+    
     return len(embedding_docs)
 
+def find_embeddings_by_chunk_hash(chunk_hashes: List[str]) -> Dict[str, List[float]]:
+    """Previously computed embeddings for chunks with identical text, model and chunking"""
+    database = get_db()
+    
+    found = {}
+    for doc in database.embeddings.find(
+        {"chunk_hash": {"$in": chunk_hashes}},
+        {"chunk_hash": 1, **EMBEDDING_FIELDS, "_id": 0}
+    ):
+        if doc["chunk_hash"] not in found:
+            embedding = decode_embedding(doc)
+            # Zero-vector placeholders from an old failed embedding run are never reused
+            if embedding.any():
+                found[doc["chunk_hash"]] = embedding
+    return found
+
+def get_chunk_text(chunk_id: str, document_id: Optional[str] = None) -> Optional[str]:
+    """Get the text of a single stored chunk, optionally only if it belongs to document_id"""
+    database = get_db()
+    
+    query = {"chunk_id": chunk_id}
+    if document_id is not None:
+        query["document_id"] = resolve_document_id(document_id)
+    doc = database.embeddings.find_one(query, {"text": 1, "_id": 0})
+    return doc["text"] if doc else None
+
+def get_random_chunk(document_id: str) -> Optional[Dict[str, Any]]:
+    """Pick one stored chunk of a document at random"""
+    database = get_db()
+    
+    docs = list(database.embeddings.aggregate([
+        {"$match": {"document_id": resolve_document_id(document_id)}},
+        {"$sample": {"size": 1}},
+        {"$project": {"chunk_id": 1, "chunk_index": 1, "text": 1, "_id": 0}}
+    ]))
+    return docs[0] if docs else None
+
+def get_chunks_by_index(document_id: str, chunk_indexes: List[int]) -> List[Dict[str, Any]]:
+    """Stored chunks of a document at the given positions"""
+    database = get_db()
+    
+    return list(database.embeddings.find(
+        {"document_id": resolve_document_id(document_id), "chunk_index": {"$in": chunk_indexes}},
+        {"chunk_id": 1, "chunk_index": 1, "text": 1, "_id": 0}
+    ))
+
+def count_document_chunks(document_id: str) -> int:
+    """Number of chunks stored (so far) for a document"""
+    database = get_db()
+    
+    return database.embeddings.count_documents({"document_id": resolve_document_id(document_id)})
+
+def load_document_index(document_id: str) -> VectorIndex:
+    """Get the decoded embedding matrix for a document, loading it on a cache miss"""
+    document_id = resolve_document_id(document_id)
+    
+    def load():
+        database = get_db()
+        
+        # Get all embeddings for the document in chunk order
+        embeddings_cursor = database.embeddings.find(
+            {"document_id": document_id},
+            {"chunk_id": 1, "text": 1, **EMBEDDING_FIELDS, "_id": 0}
+        ).sort("chunk_index", 1)
+        return VectorIndex.from_documents(list(embeddings_cursor))
+    
+    # The chunk count read from MongoDB acts as the cache version, so an index
+    # cached before another worker stored or deleted chunks is not served
+    return index_cache.get_or_load(document_id, load, expected_chunks=count_document_chunks(document_id))
+
+def invalidate_document_index(document_id: Optional[str] = None):
+    """Drop cached embeddings for one document, or for all documents"""
+    index_cache.invalidate(document_id)
+
+def get_index_cache_stats() -> Dict[str, Any]:
+    """Hit/miss/eviction counters for the embedding matrix cache"""
+    return index_cache.stats()
+
 def search_similar_chunks(query_embedding: List[float], document_id: str, k: int = 5) -> List[str]:
     """Search for similar chunks using cosine similarity"""
+    if ANN_BACKEND != "exact":
+        hits = ann_index.search(query_embedding, k, document_ids=[resolve_document_id(document_id)])
+        return [hit["text"] for hit in _attach_chunk_texts(hits)]
+    
+    # Score every chunk with one matrix-vector product and select top k
+    index = load_document_index(document_id)
+    return index.search(query_embedding, k)
+
+def search_library_chunks(query_embedding: List[float], user_id: str, k: int = 5) -> List[Dict[str, Any]]:
+    """Search across every document a user has uploaded"""
     database = get_db()
     
-    # Get all embeddings for the document
-    embeddings_cursor = database.embeddings.find({"document_id": document_id})
+    document_ids = set()
+    for doc in database.documents.find({"user_id": user_id}, {"document_id": 1, "source_document_id": 1, "_id": 0}):
+        document_ids.add(doc.get("source_document_id") or doc["document_id"])
+    hits = ann_index.search(query_embedding, k, document_ids=document_ids)
+    return _attach_chunk_texts(hits)
+
+def _attach_chunk_texts(hits) -> List[Dict[str, Any]]:
+    """Resolve (document_id, chunk_id, score) index hits to chunk texts, keeping rank order"""
+    if not hits:
+        return []
+    database = get_db()
     
-    # Calculate cosine similarity
-    results = []
-    for doc in embeddings_cursor:
-        similarity = cosine_similarity(query_embedding, doc["embedding"])
-        results.append({
-            "text": doc["text"],
-            "similarity": similarity
-        })
+    texts = {
+        doc["chunk_id"]: doc["text"]
+        for doc in database.embeddings.find(
+            {"chunk_id": {"$in": [chunk_id for _, chunk_id, _ in hits]}},
+            {"chunk_id": 1, "text": 1, "_id": 0}
+        )
+    }
+    return [
+        {"document_id": document_id, "chunk_id": chunk_id, "text": texts[chunk_id], "similarity": score}
+        for document_id, chunk_id, score in hits
+        if chunk_id in texts
+    ]
+
+def save_ann_index() -> bool:
+    """Persist the library index to local disk"""
+    try:
+        ann_index.save()
+        return True
+    except Exception as e:
+        print(f"⚠️ Could not persist ANN index: {e}")
+        return False
+
+def mark_ann_index_changed():
+    """Record that the library index differs from its copy on disk"""
+    global _ann_index_changed
+    _ann_index_changed = True
+
+def save_ann_index_if_changed() -> bool:
+    """Persist the library index if it changed since the last save; True if it was written"""
+    global _ann_index_changed
+    if not _ann_index_changed:
+        return False
+    # Cleared first: a change made while saving marks the index again for the next round
+    _ann_index_changed = False
+    if not save_ann_index():
+        _ann_index_changed = True
+        return False
+    return True
+
+def rebuild_ann_index():
+    """Rebuild the library index from every stored embedding (only needed without a persisted index)"""
+    global ann_index_loaded
+    database = get_db()
+    
+    print(f"🔄 Building '{ANN_BACKEND}' ANN index from stored embeddings...")
+    ann_index.clear()
+    for document_id in database.embeddings.distinct("document_id"):
+        docs = list(database.embeddings.find(
+            {"document_id": document_id},
+            {"chunk_id": 1, **EMBEDDING_FIELDS, "_id": 0}
+        ).sort("chunk_index", 1))
+        if docs:
+            ann_index.add(document_id, [doc["chunk_id"] for doc in docs], decode_matrix(docs))
+    save_ann_index()
+    ann_index_loaded = True
+    print(f"✅ ANN index ready with {len(ann_index)} chunks")
+
+def sync_ann_index() -> int:
+    """
+    Bring the library index in line with the embeddings collection: add
+    documents it is missing, drop deleted ones, and reload any whose chunk
+    count differs. Documents still being ingested are left to their writer.
+    Returns the number of documents changed.
+    """
+    database = get_db()
+    
+    indexed = ann_index.document_counts()
+    stored_ids = set(database.embeddings.distinct("document_id"))
+    # Cheap check first; the per-document counts below are only read on a mismatch
+    if set(indexed) == stored_ids and sum(indexed.values()) == database.embeddings.estimated_document_count():
+        return 0
+    
+    stored = {
+        row["_id"]: row["count"]
+        for row in database.embeddings.aggregate([{"$group": {"_id": "$document_id", "count": {"$sum": 1}}}])
+    }
+    changed = 0
+    for document_id in set(indexed) - set(stored):
+        ann_index.remove_document(document_id)
+        changed += 1
     
-    # Sort by similarity and return top k
-    results.sort(key=lambda x: x["similarity"], reverse=True)
-    return [r["text"] for r in results[:k]]
+    stale = [document_id for document_id, count in stored.items() if indexed.get(document_id) != count]
+    in_progress = {
+        doc["document_id"] for doc in database.documents.find(
+            {"document_id": {"$in": stale}, "status": "processing"}, {"document_id": 1, "_id": 0}
+        )
+    }
+    for document_id in stale:
+        if document_id in in_progress:
+            continue
+        docs = list(database.embeddings.find(
+            {"document_id": document_id},
+            {"chunk_id": 1, **EMBEDDING_FIELDS, "_id": 0}
+        ).sort("chunk_index", 1))
+        ann_index.remove_document(document_id)
+        if docs:
+            ann_index.add(document_id, [doc["chunk_id"] for doc in docs], decode_matrix(docs))
+        changed += 1
+    
+    if changed:
+        mark_ann_index_changed()
+        print(f"🔄 ANN index synced: {changed} documents updated, {len(ann_index)} chunks")
+    return changed
+
+def migrate_embedding_storage(fmt: str = EMBEDDING_STORAGE_FORMAT, batch_size: int = 500) -> int:
+    """Re-encode stored embeddings that are not yet in the given format"""
+    from pymongo import UpdateOne
+    database = get_db()
+    
+    query = {"embedding_format": {"$ne": fmt}}
+    migrated = 0
+    while True:
+        docs = list(database.embeddings.find(query, {"_id": 1, **EMBEDDING_FIELDS}).limit(batch_size))
+        if not docs:
+            break
+        updates = []
+        for doc in docs:
+            fields = encode_embedding(decode_embedding(doc), fmt)
+            update = {"$set": fields}
+            if "embedding_scale" not in fields:
+                update["$unset"] = {"embedding_scale": ""}
+            updates.append(UpdateOne({"_id": doc["_id"]}, update))
+        database.embeddings.bulk_write(updates, ordered=False)
+        migrated += len(updates)
+        print(f"   Migrated {migrated} embeddings to {fmt}")
+    
+    invalidate_document_index()
+    return migrated
 
 def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
     """Calculate cosine similarity between two vectors"""
@@ -232,6 +570,157 @@ def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
         return 0
     return dot_product / (magnitude1 * magnitude2)
 
+# Ingestion job operations
+def store_upload_file(content: bytes, filename: str) -> Any:
+    """Keep an uploaded file in GridFS until its ingestion job finishes"""
+    return gridfs.GridFS(get_db(), collection="uploads").put(content, filename=filename)
+
+def read_upload_file(file_id: Any) -> bytes:
+    return gridfs.GridFS(get_db(), collection="uploads").get(file_id).read()
+
+def delete_upload_file(file_id: Any):
+    gridfs.GridFS(get_db(), collection="uploads").delete(file_id)
+
+def create_ingestion_job(document_id: str, user_id: str, filename: str, file_size: int, upload_file_id: Any, **fields) -> str:
+    """Queue a document for background ingestion (fields override the initial job state)"""
+    database = get_db()
+    job_id = str(uuid.uuid4())
+    
+    job = {
+        "job_id": job_id,
+        "document_id": document_id,
+        "user_id": user_id,
+        "filename": filename,
+        "file_size": file_size,
+        "upload_file_id": upload_file_id,
+        "status": "queued",
+        "stage": "queued",
+        "attempts": 0,
+        "chunks_done": 0,
+        "pages_done": 0,
+        "page_count": None,
+        "progress": 0.0,
+        "eta_seconds": None,
+        "error": None,
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow(),
+        **fields
+    }
+    database.ingestion_jobs.insert_one(job)
+    return job_id
+
+def claim_next_ingestion_job(worker_id: str) -> Optional[Dict[str, Any]]:
+    """Atomically take the oldest queued job, so each job runs on exactly one worker"""
+    database = get_db()
+    
+    return database.ingestion_jobs.find_one_and_update(
+        {"status": "queued"},
+        {
+            "$set": {"status": "running", "worker_id": worker_id, "started_at": datetime.utcnow(), "updated_at": datetime.utcnow()},
+            "$inc": {"attempts": 1}
+        },
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+def update_ingestion_job(job_id: str, **fields):
+    """Record job progress; also acts as the worker heartbeat"""
+    database = get_db()
+    
+    fields["updated_at"] = datetime.utcnow()
+    database.ingestion_jobs.update_one({"job_id": job_id}, {"$set": fields})
+
+def get_ingestion_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Get job status without internal fields"""
+    database = get_db()
+    
+    return database.ingestion_jobs.find_one({"job_id": job_id}, {"_id": 0, "upload_file_id": 0, "worker_id": 0})
+
+def requeue_stale_ingestion_jobs(stale_seconds: float, max_attempts: int) -> int:
+    """Hand jobs whose worker stopped heartbeating back to the queue, while they have attempts left"""
+    database = get_db()
+    
+    result = database.ingestion_jobs.update_many(
+        {
+            "status": "running",
+            "updated_at": {"$lt": datetime.utcnow() - timedelta(seconds=stale_seconds)},
+            "attempts": {"$lt": max_attempts}
+        },
+        {"$set": {"status": "queued", "stage": "queued", "updated_at": datetime.utcnow()}}
+    )
+    return result.modified_count
+
+def fail_stale_ingestion_jobs(stale_seconds: float, max_attempts: int) -> List[Dict[str, Any]]:
+    """Mark stale jobs that used up their attempts as failed; returns them so their data can be cleaned up"""
+    database = get_db()
+    
+    failed = []
+    while True:
+        # One job at a time, so two sweeping workers never clean up the same job
+        job = database.ingestion_jobs.find_one_and_update(
+            {
+                "status": "running",
+                "updated_at": {"$lt": datetime.utcnow() - timedelta(seconds=stale_seconds)},
+                "attempts": {"$gte": max_attempts}
+            },
+            {"$set": {
+                "status": "failed",
+                "stage": "failed",
+                "error": "Ingestion worker stopped responding",
+                "eta_seconds": None,
+                "updated_at": datetime.utcnow()
+            }},
+            projection={"_id": 0, "job_id": 1, "document_id": 1, "upload_file_id": 1}
+        )
+        if job is None:
+            return failed
+        failed.append(job)
+
+# Conversational tutor session operations
+def load_tutor_session(session_id: str) -> Optional[Dict[str, Any]]:
+    """Stored state of a conversational tutor session"""
+    database = get_db()
+    
+    return database.tutor_sessions.find_one({"session_id": session_id}, {"_id": 0, "expires_at": 0, "updated_at": 0})
+
+def update_tutor_session(
+    session_id: str,
+    new_messages: List[Dict[str, str]],
+    asked_delta: int,
+    correct_delta: int,
+    current_topic: Optional[str],
+    set_topic: bool,
+    max_messages: int,
+    ttl_seconds: float
+) -> Dict[str, Any]:
+    """
+    Apply one turn to a session atomically and return the resulting state.
+    History is appended with $push/$slice and counters with $inc, so turns
+    from different workers on the same session are merged, never overwritten.
+    """
+    database = get_db()
+    
+    now = datetime.utcnow()
+    fields = {"updated_at": now, "expires_at": now + timedelta(seconds=ttl_seconds)}
+    if set_topic:
+        fields["current_topic"] = current_topic
+    return database.tutor_sessions.find_one_and_update(
+        {"session_id": session_id},
+        {
+            "$push": {"conversation_history": {"$each": new_messages, "$slice": -max_messages}},
+            "$inc": {"questions_asked": asked_delta, "correct_answers": correct_delta},
+            "$set": fields
+        },
+        projection={"_id": 0, "expires_at": 0, "updated_at": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+def delete_tutor_session(session_id: str):
+    database = get_db()
+    
+    database.tutor_sessions.delete_one({"session_id": session_id})
+
 # Chat history operations
 def create_chat_session(document_id: str, user_id: str) -> str:
     """Create a new chat session"""
@@ -255,50 +744,240 @@ def add_message_to_session(session_id: str, role: str, content: str, sources: Op
     """Add a message to chat session and update title if first user message"""
     database = get_db()
     
+    now = datetime.utcnow()
     message = {
         "role": role,
         "content": content,
-        "timestamp": datetime.utcnow()
+        "timestamp": now
     }
     
     if sources:
         message["sources"] = sources
     
-    # Get current session to check if this is the first user message
-    session = database.chat_history.find_one({"session_id": session_id})
-    update_data = {
-        "$push": {"messages": message},
-        "$set": {"updated_at": datetime.utcnow()}
+    # One pipeline update: append, count, and title the session from its first
+    # user message - no read of the messages array beforehand
+    messages = {"$ifNull": ["$messages", []]}
+    message_count = {"$ifNull": ["$message_count", {"$size": messages}]}
+    appended = {"$concatArrays": [messages, [{"$literal": message}]]}
+    if CHAT_HISTORY_OVERFLOW == "cap":
+        appended = {"$slice": [appended, -CHAT_SESSION_MAX_MESSAGES]}
+    stage = {
+        "messages": appended,
+        "message_count": {"$add": [message_count, 1]},
+        "updated_at": now
     }
-    
-    # If this is the first user message, set it as the title (truncated)
-    if session and role == "user" and len(session.get("messages", [])) == 0:
+    if role == "user":
         title = content[:50] + "..." if len(content) > 50 else content
-        update_data["$set"]["title"] = title
+        stage["title"] = {"$cond": [{"$eq": [message_count, 0]}, {"$literal": title}, "$title"]}
     
-    database.chat_history.update_one(
+    if CHAT_HISTORY_OVERFLOW != "bucket":
+        database.chat_history.update_one({"session_id": session_id}, [{"$set": stage}])
+        return
+    
+    session = database.chat_history.find_one_and_update(
         {"session_id": session_id},
-        update_data
+        [{"$set": stage}],
+        projection={"message_count": 1, "bucketed_count": 1, "_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if session and session["message_count"] - session.get("bucketed_count", 0) > CHAT_SESSION_MAX_MESSAGES:
+        _spill_chat_messages(session_id, session.get("bucketed_count", 0))
+
+def _spill_chat_messages(session_id: str, bucketed_count: int):
+    """Move the oldest CHAT_BUCKET_SIZE inline messages into an overflow bucket document"""
+    database = get_db()
+    
+    seq = bucketed_count // CHAT_BUCKET_SIZE
+    head = database.chat_history.find_one({"session_id": session_id}, {"messages": {"$slice": CHAT_BUCKET_SIZE}, "_id": 0})
+    if not head or len(head.get("messages", [])) < CHAT_BUCKET_SIZE:
+        return
+    try:
+        # The unique (session_id, seq) index lets exactly one concurrent spill write the bucket
+        database.chat_history_buckets.insert_one({
+            "session_id": session_id,
+            "seq": seq,
+            "messages": head["messages"],
+            "first_timestamp": head["messages"][0]["timestamp"],
+            "last_timestamp": head["messages"][-1]["timestamp"]
+        })
+    except DuplicateKeyError:
+        # Another spill (or an earlier one that failed before trimming) already wrote
+        # this bucket; still trim, since the bucketed_count filter makes that idempotent
+        pass
+    database.chat_history.update_one(
+        {"session_id": session_id, "bucketed_count": {"$in": [bucketed_count, None]} if bucketed_count == 0 else bucketed_count},
+        [{"$set": {
+            "messages": {"$slice": ["$messages", CHAT_BUCKET_SIZE, {"$max": [{"$size": "$messages"}, 1]}]},
+            "bucketed_count": {"$add": [{"$ifNull": ["$bucketed_count", 0]}, CHAT_BUCKET_SIZE]}
+        }}]
     )
 
 def get_chat_history(session_id: str) -> List[Dict[str, Any]]:
     """Get chat history for a session"""
     database = get_db()
     
-    session = database.chat_history.find_one({"session_id": session_id})
+    session = database.chat_history.find_one({"session_id": session_id}, {"messages": 1, "_id": 0})
+    
+    if not session:
+        return []
+    buckets = database.chat_history_buckets.find({"session_id": session_id}, {"messages": 1, "_id": 0}).sort("seq", 1)
+    history = [message for bucket in buckets for message in bucket["messages"]]
+    history.extend(session.get("messages", []))
+    return history
+
+def _utc_naive(timestamp: Optional[datetime]) -> Optional[datetime]:
+    """Stored timestamps are naive UTC; bring client-supplied cursors to the same form"""
+    if timestamp is not None and timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+def _bucketed_messages(session_id: str, first: int, last: int) -> List[Dict[str, Any]]:
+    """Overflow-bucket messages with positions in [first, last), oldest first"""
+    if last <= first:
+        return []
+    database = get_db()
+    
+    buckets = database.chat_history_buckets.find(
+        {"session_id": session_id, "seq": {"$gte": first // CHAT_BUCKET_SIZE, "$lte": (last - 1) // CHAT_BUCKET_SIZE}},
+        {"seq": 1, "messages": 1, "_id": 0}
+    ).sort("seq", 1)
+    messages = []
+    for bucket in buckets:
+        base = bucket["seq"] * CHAT_BUCKET_SIZE
+        for i, message in enumerate(bucket["messages"]):
+            if first <= base + i < last:
+                messages.append({**message, "position": base + i})
+    return messages
+
+def get_chat_history_page(
+    session_id: str,
+    limit: int = 50,
+    before: Optional[int] = None,
+    after: Optional[int] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    One page of a session's messages, oldest first within the page.
+    Every message carries its `position` in the whole conversation, which
+    is the cursor: `before` pages backwards and `after` pages forwards from
+    a position, and without a cursor this is the newest page. Positions are
+    unique, unlike timestamps, so nothing is skipped at a page boundary.
+    The slicing happens in MongoDB, so only the page crosses the wire.
+    None if the session is unknown.
+    """
+    database = get_db()
+    forward = after is not None and before is None
+    
+    messages = {"$ifNull": ["$messages", []]}
+    count = {"$size": messages}
+    result = list(database.chat_history.aggregate([
+        {"$match": {"session_id": session_id}},
+        {"$project": {
+            "_id": 0,
+            "bucketed_count": 1,
+            "messages": messages,
+            # Position of the first inline message; older ones were spilled to buckets or capped away
+            "offset": {"$subtract": [{"$ifNull": ["$message_count", count]}, count]}
+        }},
+        # [lo, hi): inline indexes inside the cursor range
+        {"$project": {
+            "bucketed_count": 1,
+            "messages": 1,
+            "offset": 1,
+            "lo": 0 if after is None else {"$max": [{"$subtract": [after + 1, "$offset"]}, 0]},
+            "hi": {"$size": "$messages"} if before is None else {"$min": [{"$max": [{"$subtract": [before, "$offset"]}, 0]}, {"$size": "$messages"}]}
+        }},
+        # Newest page by default, oldest page after an `after` cursor
+        {"$project": {
+            "bucketed_count": 1,
+            "messages": 1,
+            "offset": 1,
+            "lo": 1,
+            "hi": 1,
+            "start": "$lo" if forward else {"$max": ["$lo", {"$subtract": ["$hi", limit]}]},
+            "end": {"$min": ["$hi", {"$add": ["$lo", limit]}]} if forward else "$hi"
+        }},
+        {"$project": {
+            "bucketed_count": 1,
+            "offset": 1,
+            "lo": 1,
+            "hi": 1,
+            "start": 1,
+            "end": 1,
+            "messages": {"$cond": [
+                {"$gt": ["$end", "$start"]},
+                {"$slice": ["$messages", "$start", {"$subtract": ["$end", "$start"]}]},
+                []
+            ]}
+        }}
+    ]))
+    if not result:
+        return None
+    head = result[0]
+    inline = [{**message, "position": head["offset"] + head["start"] + i} for i, message in enumerate(head["messages"])]
+    
+    # Bucketed messages hold positions [0, bucket_end), all older than the inline ones
+    bucket_end = min(head.get("bucketed_count") or 0, head["offset"])
+    first = 0 if after is None else after + 1
+    if forward:
+        last = min(bucket_end, first + limit)
+        older = _bucketed_messages(session_id, first, last)
+        has_more = bucket_end > last or len(older) + len(inline) > limit or head["end"] < head["hi"]
+        messages = (older + inline)[:limit]
+    else:
+        # Only read buckets when the inline messages do not fill the page
+        has_more = head["start"] > head["lo"]
+        older = []
+        if not has_more:
+            last = bucket_end if before is None else min(bucket_end, before)
+            wanted = limit - len(inline)
+            older = _bucketed_messages(session_id, max(first, last - wanted), last) if wanted > 0 else []
+            has_more = last - max(wanted, 0) > first
+        messages = older + inline
+    
+    return {
+        "messages": messages,
+        "has_more": has_more,
+        "before": messages[0]["position"] if messages else None,
+        "after": messages[-1]["position"] if messages else None
+    }
+
+def get_chat_session(session_id: str) -> Optional[Dict[str, Any]]:
+    """Session owner and document, without its messages"""
+    database = get_db()
     
-    if session:
-        return session.get("messages", [])
-    return []
+    return database.chat_history.find_one(
+        {"session_id": session_id},
+        {"session_id": 1, "document_id": 1, "user_id": 1, "title": 1, "_id": 0}
+    )
 
-def get_all_sessions(document_id: str) -> List[Dict[str, Any]]:
-    """Get all chat sessions for a document with titles"""
+def get_all_sessions(
+    document_id: str,
+    limit: int = 50,
+    before: Optional[datetime] = None,
+    before_session_id: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Chat sessions for a document with titles, most recently active first,
+    `limit` at a time. The cursor is the last session's (updated_at,
+    session_id), so sessions sharing a timestamp are not skipped between pages.
+    """
     database = get_db()
     
+    query: Dict[str, Any] = {"document_id": document_id}
+    before = _utc_naive(before)
+    if before is not None and before_session_id is not None:
+        query["$or"] = [
+            {"updated_at": {"$lt": before}},
+            {"updated_at": before, "session_id": {"$lt": before_session_id}}
+        ]
+    elif before is not None:
+        query["updated_at"] = {"$lt": before}
+    
+    # Served by the (document_id, updated_at, session_id) index without an in-memory sort
     sessions = database.chat_history.find(
-        {"document_id": document_id},
+        query,
         {"session_id": 1, "title": 1, "created_at": 1, "updated_at": 1, "_id": 0}
-    ).sort("updated_at", -1)
+    ).sort([("updated_at", -1), ("session_id", -1)]).limit(limit)
     
     return list(sessions)
 
@@ -307,6 +986,35 @@ def delete_session(session_id: str):
     database = get_db()
     
     database.chat_history.delete_one({"session_id": session_id})
+    database.chat_history_buckets.delete_many({"session_id": session_id})
+
+def clear_user_data(user_id: str) -> List[str]:
+    """Delete one user's documents, embeddings and chat history; returns the deleted document ids"""
+    database = get_db()
+    
+    docs = list(database.documents.find({"user_id": user_id}, {"document_id": 1, "source_document_id": 1, "_id": 0}))
+    document_ids = [doc["document_id"] for doc in docs]
+    database.documents.delete_many({"user_id": user_id})
+    session_ids = database.chat_history.distinct("session_id", {"user_id": user_id})
+    database.chat_history.delete_many({"user_id": user_id})
+    database.chat_history_buckets.delete_many({"session_id": {"$in": session_ids}})
+    
+    for document_id in document_ids:
+        _document_sources.pop(document_id, None)
+    # Embeddings live under the source document, which for a deduplicated upload belongs to
+    # someone else; delete each source's embeddings once no remaining document uses them
+    sources = {doc.get("source_document_id") or doc["document_id"] for doc in docs}
+    remaining = database.documents.find(
+        {"$or": [{"document_id": {"$in": list(sources)}}, {"source_document_id": {"$in": list(sources)}}]},
+        {"document_id": 1, "source_document_id": 1, "_id": 0}
+    )
+    still_referenced = set()
+    for doc in remaining:
+        still_referenced.add(doc.get("source_document_id") or doc["document_id"])
+    for source in sources - still_referenced:
+        delete_embeddings(source)
+    print(f"✅ Cleared {len(document_ids)} documents for user {user_id}")
+    return document_ids
 
 def clear_all_data():
     """Clear all data from MongoDB"""
@@ -314,5 +1022,10 @@ def clear_all_data():
     
     database.embeddings.delete_many({})
     database.chat_history.delete_many({})
+    database.chat_history_buckets.delete_many({})
     database.documents.delete_many({})
+    invalidate_document_index()
+    _document_sources.clear()
+    ann_index.clear()
+    mark_ann_index_changed()
     print("✅ All MongoDB data cleared")
@@ -0,0 +1,120 @@
+"""
+PDF Extraction Module
+Page-parallel text extraction with pdfplumber.
+Page ranges are extracted in a process pool and yielded in page order as
+they finish, so downstream chunking can start before the whole PDF is done.
+"""
+
+import io
+import os
+import time
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import AsyncIterator, List, Optional, Tuple
+import pdfplumber
+
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Page ranges submitted ahead of the consumer; enough to keep every worker busy
+PDF_MAX_IN_FLIGHT = int(os.getenv("PDF_MAX_IN_FLIGHT", str(2 * PDF_EXTRACT_WORKERS)))
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+@dataclass
+class PageText:
+    page_number: int
+    text: str
+    seconds: float
+
+@dataclass
+class ExtractionStats:
+    page_count: int = 0
+    page_seconds: List[float] = field(default_factory=list)
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: Optional[float] = None
+
+    def record(self, page: PageText):
+        self.page_seconds.append(page.seconds)
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+
+    @property
+    def total_seconds(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def pages_per_second(self) -> float:
+        return len(self.page_seconds) / self.total_seconds if self.total_seconds > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "pages": len(self.page_seconds),
+            "total_seconds": round(self.total_seconds, 3),
+            "pages_per_second": round(self.pages_per_second, 2),
+            "mean_page_ms": round(1000 * sum(self.page_seconds) / len(self.page_seconds), 2) if self.page_seconds else 0.0,
+            "max_page_ms": round(1000 * max(self.page_seconds), 2) if self.page_seconds else 0.0
+        }
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=PDF_EXTRACT_WORKERS)
+    return _executor
+
+def count_pages(file_content: bytes) -> int:
+    with pdfplumber.open(io.BytesIO(file_content)) as pdf:
+        return len(pdf.pages)
+
+def extract_page_range(file_content: bytes, start: int, end: int) -> List[Tuple[int, str, float]]:
+    """Extract pages [start, end) - runs inside a worker process"""
+    results = []
+    with pdfplumber.open(io.BytesIO(file_content)) as pdf:
+        for page_number in range(start, end):
+            page_start = time.perf_counter()
+            page_text = pdf.pages[page_number].extract_text() or ""
+            results.append((page_number, page_text, time.perf_counter() - page_start))
+    return results
+
+async def stream_pdf_pages(
+    file_content: bytes,
+    stats: Optional[ExtractionStats] = None,
+    pages_per_task: int = PDF_PAGES_PER_TASK
+) -> AsyncIterator[PageText]:
+    """Yield pages in order while later page ranges are still being extracted"""
+    loop = asyncio.get_running_loop()
+    page_count = await asyncio.to_thread(count_pages, file_content)
+    if stats is not None:
+        stats.page_count = page_count
+
+    ranges = [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+    # A single range is not worth a process hop - keep it off the event loop with a thread
+    executor = _get_executor() if len(ranges) > 1 else None
+
+    def submit(start: int, end: int) -> asyncio.Future:
+        if executor is None:
+            return asyncio.ensure_future(asyncio.to_thread(extract_page_range, file_content, start, end))
+        return loop.run_in_executor(executor, extract_page_range, file_content, start, end)
+
+    # Each submitted range pickles its own copy of file_content, so only keep
+    # a window of ranges in flight and submit the next one as each is consumed
+    pending = iter(ranges)
+    tasks = deque(submit(start, end) for start, end in islice(pending, PDF_MAX_IN_FLIGHT))
+    try:
+        while tasks:
+            results = await tasks.popleft()
+            for start, end in islice(pending, 1):
+                tasks.append(submit(start, end))
+            for page_number, page_text, seconds in results:
+                page = PageText(page_number, page_text, seconds)
+                if stats is not None:
+                    stats.record(page)
+                yield page
+    finally:
+        for task in tasks:
+            task.cancel()
+        if stats is not None:
+            stats.finish()
@@ -0,0 +1,127 @@
+"""
+Query Embedding Cache Module
+LRU + TTL cache of single-query embeddings keyed by (model name, normalized
+text), with optional persistence to a local .npz file across restarts.
+"""
+
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "10000"))
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", str(24 * 3600)))
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH", "")   # e.g. query_cache.npz; empty disables persistence
+
+_whitespace = re.compile(r"\s+")
+
+def normalize_query(text: str) -> str:
+    """Case- and whitespace-insensitive key (MiniLM is uncased, so lowercasing is lossless)"""
+    return _whitespace.sub(" ", text).strip().lower()
+
+class QueryEmbeddingCache:
+    def __init__(self, max_entries: int = QUERY_CACHE_MAX_ENTRIES, ttl_seconds: float = QUERY_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # (model name, normalized text) -> (expires_at wall-clock time, read-only float32 embedding)
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, model_name: str, text: str) -> Optional[List[float]]:
+        key = (model_name, normalize_query(text))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.time():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            embedding = entry[1]
+        return embedding.tolist()
+
+    @staticmethod
+    def _to_array(embedding: Sequence[float]) -> np.ndarray:
+        """Own float32 copy, read-only so a shared cached vector cannot be changed in place"""
+        vector = np.array(embedding, dtype=np.float32)
+        vector.setflags(write=False)
+        return vector
+
+    def put(self, model_name: str, text: str, embedding: Sequence[float]):
+        key = (model_name, normalize_query(text))
+        vector = self._to_array(embedding)
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def save(self, path: str = QUERY_CACHE_PATH):
+        """Write unexpired entries to path (atomically); no-op without a path"""
+        if not path:
+            return
+        now = time.time()
+        with self._lock:
+            live = [(key, entry) for key, entry in self._entries.items() if entry[0] >= now]
+        if not live:
+            return
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                models=np.array([key[0] for key, _ in live], dtype=str),
+                queries=np.array([key[1] for key, _ in live], dtype=str),
+                expires_at=np.array([entry[0] for _, entry in live], dtype=np.float64),
+                embeddings=np.stack([entry[1] for _, entry in live])
+            )
+        os.replace(tmp_path, path)
+
+    def load(self, path: str = QUERY_CACHE_PATH) -> int:
+        """Restore unexpired entries from path, oldest first so LRU order survives"""
+        if not path or not os.path.exists(path):
+            return 0
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                now = time.time()
+                loaded = 0
+                with self._lock:
+                    for model_name, query, expires_at, embedding in zip(
+                        data["models"], data["queries"], data["expires_at"], data["embeddings"]
+                    ):
+                        if expires_at >= now:
+                            self._entries[(str(model_name), str(query))] = (float(expires_at), self._to_array(embedding))
+                            loaded += 1
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                return loaded
+        except Exception as e:
+            print(f"⚠️ Could not load query embedding cache from {path}: {e}")
+            return 0
@@ -0,0 +1,179 @@
+"""
+Question Pool Module
+Per-document pool of pre-generated tutor questions.
+Pools are filled in the background once a document has chunks, several
+questions per LLM call, and topped up whenever they drop below the low
+watermark, so "next question" is normally a deque pop instead of an LLM
+round trip. Chunks are dealt from a shuffled deck, so every chunk of a
+document is asked about once before any chunk repeats.
+Pools are per process; a worker that has not seen a document yet simply
+starts with a miss and fills its own pool.
+"""
+
+import os
+import time
+import random
+import asyncio
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+from mongodb_client import count_document_chunks, get_chunks_by_index
+from tutor_model import DEFAULT_QUESTION, generate_tutor_question, generate_tutor_questions
+
+QUESTION_POOL_SIZE = int(os.getenv("QUESTION_POOL_SIZE", "8"))
+QUESTION_POOL_LOW_WATERMARK = int(os.getenv("QUESTION_POOL_LOW_WATERMARK", "3"))
+QUESTIONS_PER_CALL = int(os.getenv("QUESTIONS_PER_CALL", "4"))
+QUESTION_POOL_MAX_DOCUMENTS = int(os.getenv("QUESTION_POOL_MAX_DOCUMENTS", "500"))
+
+LAG_SAMPLES = 100
+
+@dataclass
+class PooledQuestion:
+    question: str
+    chunk_id: str
+    chunk_index: int
+    created_at: float = field(default_factory=time.time)
+
+class DocumentPool:
+    def __init__(self):
+        self.questions: Deque[PooledQuestion] = deque()
+        self.deck: List[int] = []      # chunk indexes not asked about yet in this round
+        self.dealt_up_to = 0           # chunk indexes below this are in (or went through) the deck
+        self.refill: Optional[asyncio.Task] = None
+        self.refill_requested_at: Optional[float] = None
+
+class QuestionPool:
+    def __init__(
+        self,
+        size: int = QUESTION_POOL_SIZE,
+        low_watermark: int = QUESTION_POOL_LOW_WATERMARK,
+        per_call: int = QUESTIONS_PER_CALL,
+        max_documents: int = QUESTION_POOL_MAX_DOCUMENTS
+    ):
+        self.size = size
+        self.low_watermark = low_watermark
+        self.per_call = per_call
+        self.max_documents = max_documents
+        self._pools: "OrderedDict[str, DocumentPool]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.refills = 0
+        self.refill_lags: Deque[float] = deque(maxlen=LAG_SAMPLES)
+
+    def _pool(self, document_id: str) -> DocumentPool:
+        pool = self._pools.get(document_id)
+        if pool is None:
+            pool = self._pools[document_id] = DocumentPool()
+            while len(self._pools) > self.max_documents:
+                _, evicted = self._pools.popitem(last=False)
+                if evicted.refill is not None:
+                    evicted.refill.cancel()
+        self._pools.move_to_end(document_id)
+        return pool
+
+    async def take(self, document_id: str) -> Optional[PooledQuestion]:
+        """Next question for a document: from the pool when possible, else generated now"""
+        pool = self._pool(document_id)
+        if pool.questions:
+            self.hits += 1
+            question = pool.questions.popleft()
+            if len(pool.questions) < self.low_watermark:
+                self.prefill(document_id)
+            return question
+
+        self.misses += 1
+        self.prefill(document_id)
+        chunks = await self._deal(pool, document_id, 1)
+        if not chunks:
+            return None
+        chunk = chunks[0]
+        question = await generate_tutor_question(chunk["text"])
+        return PooledQuestion(question, chunk["chunk_id"], chunk["chunk_index"])
+
+    def prefill(self, document_id: str):
+        """Top the pool up in the background (no-op while a refill is already running)"""
+        pool = self._pool(document_id)
+        if pool.refill is not None and not pool.refill.done():
+            return
+        pool.refill_requested_at = time.perf_counter()
+        pool.refill = asyncio.create_task(self._refill(document_id, pool))
+
+    def invalidate(self, document_id: Optional[str] = None):
+        """Drop one document's pool, or all of them"""
+        document_ids = [document_id] if document_id is not None else list(self._pools)
+        for key in document_ids:
+            pool = self._pools.pop(key, None)
+            if pool is not None and pool.refill is not None:
+                pool.refill.cancel()
+
+    async def _refill(self, document_id: str, pool: DocumentPool):
+        try:
+            while len(pool.questions) < self.size:
+                chunks = await self._deal(pool, document_id, min(self.per_call, self.size - len(pool.questions)))
+                if not chunks:
+                    return
+                questions = await generate_tutor_questions([chunk["text"] for chunk in chunks])
+                unused = []
+                for chunk, question in zip(chunks, questions):
+                    if question:
+                        pool.questions.append(PooledQuestion(question, chunk["chunk_id"], chunk["chunk_index"]))
+                        self.generated += 1
+                    else:
+                        unused.append(chunk)
+                if not any(questions):
+                    # Batch call failed; one question at a time is slower but still fills the pool
+                    question = await generate_tutor_question(chunks[0]["text"])
+                    if question == DEFAULT_QUESTION:
+                        # Model unavailable - keep every dealt chunk for the next refill
+                        pool.deck.extend(chunk["chunk_index"] for chunk in reversed(chunks))
+                        return
+                    pool.questions.append(PooledQuestion(question, chunks[0]["chunk_id"], chunks[0]["chunk_index"]))
+                    self.generated += 1
+                    unused = chunks[1:]
+                # Chunks that got no question go back on top of the deck, so they are dealt next
+                pool.deck.extend(chunk["chunk_index"] for chunk in reversed(unused))
+            self.refills += 1
+            self.refill_lags.append(time.perf_counter() - pool.refill_requested_at)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Question pool refill failed for document {document_id}: {e}")
+
+    async def _deal(self, pool: DocumentPool, document_id: str, n: int) -> List[Dict[str, Any]]:
+        """Up to n chunks nobody has been asked about in the current round"""
+        chunk_count = await asyncio.to_thread(count_document_chunks, document_id)
+        if chunk_count > pool.dealt_up_to:
+            # Chunks indexed since the last deal (e.g. ingestion still running) join the deck
+            pool.deck.extend(range(pool.dealt_up_to, chunk_count))
+            random.shuffle(pool.deck)
+            pool.dealt_up_to = chunk_count
+        if not pool.deck and chunk_count:
+            # Every chunk has been covered - start a new round
+            pool.deck = list(range(chunk_count))
+            random.shuffle(pool.deck)
+        if not pool.deck:
+            return []
+        indexes = [pool.deck.pop() for _ in range(min(n, len(pool.deck)))]
+        return await asyncio.to_thread(get_chunks_by_index, document_id, indexes)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        lags = sorted(self.refill_lags)
+        return {
+            "documents": len(self._pools),
+            "pooled_questions": sum(len(pool.questions) for pool in self._pools.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "questions_generated": self.generated,
+            "refills": self.refills,
+            "refill_lag_ms": {
+                "mean": round(1000 * sum(lags) / len(lags), 1) if lags else None,
+                "p95": round(1000 * lags[int(0.95 * (len(lags) - 1))], 1) if lags else None,
+                "max": round(1000 * lags[-1], 1) if lags else None
+            }
+        }
+
+question_pool = QuestionPool()
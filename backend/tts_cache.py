@@ -0,0 +1,243 @@
+"""
+TTS Cache Module
+Content-addressed cache of synthesized speech keyed by (voice, rate, text).
+- memory: LRU of recent clips, bounded by TTS_CACHE_MEMORY_BYTES
+- disk:   one MP3 per key under TTS_CACHE_DIR, LRU-evicted (by last use)
+          once the directory exceeds TTS_CACHE_DISK_BYTES; hits are read
+          through a memory-mapped file instead of being copied in whole
+The disk tier survives restarts, and files are written atomically, so
+several worker processes can share one directory. Each process tracks the
+directory size itself and re-scans it every TTS_CACHE_RESCAN_SECONDS, so
+with N workers the directory can overshoot TTS_CACHE_DISK_BYTES by what
+they write within one rescan interval, but not by a factor of N.
+"""
+
+import os
+import mmap
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional
+
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "1") == "1"
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "tts_cache")
+TTS_CACHE_MEMORY_BYTES = int(os.getenv("TTS_CACHE_MEMORY_BYTES", str(16 * 1024 * 1024)))
+TTS_CACHE_DISK_BYTES = int(os.getenv("TTS_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+# Clips larger than this skip the memory tier and are only served from disk
+TTS_CACHE_MEMORY_MAX_CLIP_BYTES = int(os.getenv("TTS_CACHE_MEMORY_MAX_CLIP_BYTES", str(512 * 1024)))
+# How often a writer re-reads the directory to pick up clips written by other workers
+TTS_CACHE_RESCAN_SECONDS = float(os.getenv("TTS_CACHE_RESCAN_SECONDS", "60"))
+
+STREAM_CHUNK_BYTES = 16 * 1024
+
+def tts_cache_key(voice: str, rate: str, text: str) -> str:
+    return hashlib.sha256(f"{voice}\0{rate}\0{text.strip()}".encode("utf-8")).hexdigest()
+
+class TTSCache:
+    def __init__(
+        self,
+        directory: Optional[str] = TTS_CACHE_DIR,
+        memory_bytes: int = TTS_CACHE_MEMORY_BYTES,
+        disk_bytes: int = TTS_CACHE_DISK_BYTES,
+        memory_max_clip_bytes: int = TTS_CACHE_MEMORY_MAX_CLIP_BYTES,
+        enabled: bool = TTS_CACHE_ENABLED,
+        rescan_seconds: float = TTS_CACHE_RESCAN_SECONDS
+    ):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.memory_max_clip_bytes = memory_max_clip_bytes
+        self.enabled = enabled
+        self.rescan_seconds = rescan_seconds
+        self._scanned_at = 0.0
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_used = 0
+        # key -> file size, least recently used first
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_used = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.enabled and self.directory:
+            self._scan_directory()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def _scan_directory(self):
+        """Index the clips in the directory (left by earlier runs or other workers), oldest use first"""
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".mp3"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    # Evicted by another worker mid-scan
+                    continue
+                entries.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        disk: "OrderedDict[str, int]" = OrderedDict((key, size) for _, key, size in sorted(entries))
+        with self._lock:
+            self._disk = disk
+            self._disk_used = sum(disk.values())
+            self._scanned_at = time.monotonic()
+            self._evict_disk()
+
+    def get(self, voice: str, rate: str, text: str) -> Optional[bytes]:
+        """Whole clip, from memory or disk (a disk hit is promoted to memory)"""
+        if not self.enabled:
+            return None
+        key = tts_cache_key(voice, rate, text)
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                if key in self._disk:
+                    self._disk.move_to_end(key)
+                self.memory_hits += 1
+                return audio
+        mapped = self._read_disk(key)
+        if mapped is None:
+            return None
+        try:
+            audio = mapped[:]
+        finally:
+            mapped.close()
+        self._remember(key, audio)
+        return audio
+
+    def stream(self, voice: str, rate: str, text: str) -> Optional[Iterator[bytes]]:
+        """
+        A hit as an iterator of chunks, or None on a miss. Disk hits are sliced
+        straight out of the memory-mapped file, so large clips are never copied
+        into the process in one piece.
+        """
+        if not self.enabled:
+            return None
+        key = tts_cache_key(voice, rate, text)
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                if key in self._disk:
+                    self._disk.move_to_end(key)
+                self.memory_hits += 1
+        if audio is not None:
+            view = memoryview(audio)
+            return (bytes(view[i:i + STREAM_CHUNK_BYTES]) for i in range(0, len(view), STREAM_CHUNK_BYTES))
+        mapped = self._read_disk(key)
+        if mapped is None:
+            return None
+        return self._iter_mapped(mapped)
+
+    @staticmethod
+    def _iter_mapped(mapped: mmap.mmap) -> Iterator[bytes]:
+        try:
+            for i in range(0, len(mapped), STREAM_CHUNK_BYTES):
+                yield mapped[i:i + STREAM_CHUNK_BYTES]
+        finally:
+            mapped.close()
+
+    def _read_disk(self, key: str) -> Optional[mmap.mmap]:
+        """Memory-map a disk hit, counting the lookup either way"""
+        if self.directory is not None:
+            # The file may also have been written by another worker sharing the directory
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                # mtime records last use, so LRU order survives a restart
+                os.utime(path)
+                with self._lock:
+                    if key not in self._disk:
+                        self._disk_used += len(mapped)
+                    self._disk[key] = len(mapped)
+                    self._disk.move_to_end(key)
+                    self.disk_hits += 1
+                return mapped
+            except (OSError, ValueError):
+                # Not cached, evicted by another worker, or empty
+                with self._lock:
+                    self._disk_used -= self._disk.pop(key, 0)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, voice: str, rate: str, text: str, audio: bytes):
+        if not self.enabled or not audio:
+            return
+        key = tts_cache_key(voice, rate, text)
+        self._remember(key, audio)
+        if self.directory is None:
+            return
+        with self._lock:
+            if key in self._disk:
+                return
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"⚠️ Could not write TTS cache file: {e}")
+            return
+        if time.monotonic() - self._scanned_at >= self.rescan_seconds:
+            # Count what other workers wrote too, so eviction sees the whole directory
+            self._scan_directory()
+            return
+        with self._lock:
+            if key not in self._disk:
+                self._disk_used += len(audio)
+            self._disk[key] = len(audio)
+            self._evict_disk()
+
+    def _remember(self, key: str, audio: bytes):
+        if len(audio) > self.memory_max_clip_bytes:
+            return
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._memory[key] = audio
+            self._memory_used += len(audio)
+            while self._memory_used > self.memory_bytes and self._memory:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_used -= len(evicted)
+
+    def _evict_disk(self):
+        # Caller holds the lock
+        while self._disk_used > self.disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_used -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def contains(self, voice: str, rate: str, text: str) -> bool:
+        key = tts_cache_key(voice, rate, text)
+        with self._lock:
+            return key in self._memory or key in self._disk
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "memory_clips": len(self._memory),
+                "memory_bytes": self._memory_used,
+                "disk_clips": len(self._disk),
+                "disk_bytes": self._disk_used,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+            }
+
+tts_cache = TTSCache()
@@ -5,17 +5,25 @@ Handles tutor-related GPT interactions via Groq API
 
 import os
 import re
+import json
+import time
+import asyncio
+from typing import Any, Dict, List, Tuple
 from dotenv import load_dotenv
-from openai import OpenAI
+from llm_gateway import chat_completion, CHAT_MODEL
 
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client for Groq
-client = OpenAI(
-    api_key=os.environ.get("GROQ_API_KEY"),
-    base_url="https://api.groq.com/openai/v1"
-)
+DEFAULT_QUESTION = "What are the main concepts discussed in this document section?"
+
+# "json": schema-constrained evaluation with validation and one repair retry; "text": legacy SCORE:/POINTS: sections
+TUTOR_EVAL_MODE = os.getenv("TUTOR_EVAL_MODE", "json")
+# "json_object" works on every Groq chat model; "json_schema" also enforces the schema where the model supports it
+TUTOR_EVAL_RESPONSE_FORMAT = os.getenv("TUTOR_EVAL_RESPONSE_FORMAT", "json_object")
+TUTOR_EVAL_MAX_TOKENS = int(os.getenv("TUTOR_EVAL_MAX_TOKENS", "350"))
+TUTOR_REPAIR_MODEL = os.getenv("TUTOR_REPAIR_MODEL", "llama-3.1-8b-instant")
+TUTOR_EVAL_MAX_BATCH = int(os.getenv("TUTOR_EVAL_MAX_BATCH", "10"))
 
 async def generate_tutor_question(chunk_text: str) -> str:
     """Generate a short tutor question from document content"""
@@ -27,8 +35,8 @@ Document excerpt:
 Create a brief, focused question that asks for a specific fact or concept. The answer should only need 1-2 sentences:"""
     
     try:
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+        response = await chat_completion(
+            model=CHAT_MODEL,
             messages=[
                 {"role": "system", "content": "You are a helpful tutor creating questions from document content."},
                 {"role": "user", "content": prompt}
@@ -37,48 +45,92 @@ Create a brief, focused question that asks for a specific fact or concept. The a
             temperature=0.7
         )
         question = response.choices[0].message.content.strip()
-        return question if question else "What are the main concepts discussed in this document section?"
+        return question if question else DEFAULT_QUESTION
     except Exception as e:
         print(f"Question generation error: {e}")
-        return "What are the main concepts discussed in this document section?"
+        return DEFAULT_QUESTION
 
-async def evaluate_tutor_answer(question: str, user_answer: str, context: str) -> dict:
-    """Evaluate a student's answer and return structured feedback"""
+async def generate_tutor_questions(chunk_texts: List[str]) -> List[str]:
+    """
+    Generate one short question per document section in a single call.
+    The result lines up with chunk_texts; a section the model skipped gets "".
+    """
+    if not chunk_texts:
+        return []
+    if len(chunk_texts) == 1:
+        return [await generate_tutor_question(chunk_texts[0])]
+    
+    sections = "\n\n".join(f"Section {i + 1}:\n{text}" for i, text in enumerate(chunk_texts))
+    prompt = f"""For EACH document section below, create a SHORT question that can be answered in 1-2 sentences. Make each one simple and specific, asking for a fact or concept from that section only.
+
+{sections}
+
+Reply with JSON only: {{"questions": ["question for section 1", "question for section 2", ...]}} with exactly {len(chunk_texts)} questions, in section order."""
     
-    # Check if user said "I don't know" or similar
-    dont_know_phrases = ["i don't know", "don't know", "no idea", "not sure", "idk", "dunno"]
-    user_said_dont_know = any(phrase in user_answer.lower() for phrase in dont_know_phrases)
+    try:
+        response = await chat_completion(
+            model=CHAT_MODEL,
+            messages=[
+                {"role": "system", "content": "You are a helpful tutor creating questions from document content."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=80 * len(chunk_texts),
+            temperature=0.7,
+            response_format={"type": "json_object"}
+        )
+        questions = json.loads(response.choices[0].message.content)["questions"]
+    except Exception as e:
+        print(f"Batch question generation error: {e}")
+        return [""] * len(chunk_texts)
     
-    if user_said_dont_know:
-        # Generate a proper answer from the context
-        answer_prompt = f"""Based on the reference material below, provide a clear and complete answer to this question.
+    questions = [q.strip() if isinstance(q, str) else "" for q in questions[:len(chunk_texts)]]
+    return questions + [""] * (len(chunk_texts) - len(questions))
+
+DONT_KNOW_PHRASES = ["i don't know", "don't know", "no idea", "not sure", "idk", "dunno"]
+
+def is_dont_know_answer(user_answer: str) -> bool:
+    """Check if user said "I don't know" or similar"""
+    return any(phrase in user_answer.lower() for phrase in DONT_KNOW_PHRASES)
+
+async def explain_answer(question: str, context: str) -> dict:
+    """Feedback for an "I don't know" answer: the answer itself, from the context"""
+    # Generate a proper answer from the context
+    answer_prompt = f"""Based on the reference material below, provide a clear and complete answer to this question.
 
 Question: {question}
 Reference Material: {context}
 
 Provide a comprehensive answer that directly addresses the question using information from the reference material. Make it educational and easy to understand."""
-        
-        try:
-            answer_response = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[
-                    {"role": "system", "content": "You are a helpful tutor providing clear answers based on document content."},
-                    {"role": "user", "content": answer_prompt}
-                ],
-                max_tokens=500,
-                temperature=0.7
-            )
-            proper_answer = answer_response.choices[0].message.content.strip()
-        except Exception as e:
-            print(f"Answer generation error: {e}")
-            proper_answer = f"Based on the document: {context[:500]}"
-        
-        return {
-            "score": 1,
-            "correct_points": ["It's okay to not know something - that's how we learn!"],
-            "missing_points": ["Try reading the document section and understanding the key concepts."],
-            "improved_answer": proper_answer
-        }
+    
+    try:
+        answer_response = await chat_completion(
+            model=CHAT_MODEL,
+            messages=[
+                {"role": "system", "content": "You are a helpful tutor providing clear answers based on document content."},
+                {"role": "user", "content": answer_prompt}
+            ],
+            max_tokens=500,
+            temperature=0.7
+        )
+        proper_answer = answer_response.choices[0].message.content.strip()
+    except Exception as e:
+        print(f"Answer generation error: {e}")
+        proper_answer = f"Based on the document: {context[:500]}"
+    
+    return {
+        "score": 1,
+        "correct_points": ["It's okay to not know something - that's how we learn!"],
+        "missing_points": ["Try reading the document section and understanding the key concepts."],
+        "improved_answer": proper_answer
+    }
+
+async def evaluate_tutor_answer(question: str, user_answer: str, context: str) -> dict:
+    """Evaluate a student's answer and return structured feedback"""
+    if is_dont_know_answer(user_answer):
+        return await explain_answer(question, context)
+    
+    if TUTOR_EVAL_MODE == "json":
+        return await evaluate_tutor_answer_json(question, user_answer, context)
     
     prompt = f"""You are a friendly tutor evaluating a student's answer. Provide structured feedback.
 
@@ -104,8 +156,8 @@ IMPROVED ANSWER:
 Be encouraging and constructive in your feedback."""
     
     try:
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+        response = await chat_completion(
+            model=CHAT_MODEL,
             messages=[
                 {"role": "system", "content": "You are a friendly tutor providing structured feedback to students."},
                 {"role": "user", "content": prompt}
@@ -114,6 +166,7 @@ Be encouraging and constructive in your feedback."""
             temperature=0.7
         )
         evaluation_text = response.choices[0].message.content.strip()
+        evaluation_stats.record_call(response)
     except Exception as e:
         print(f"Evaluation error: {e}")
         return {
@@ -134,6 +187,8 @@ Be encouraging and constructive in your feedback."""
         score_match = re.search(r'SCORE:\s*(\d+)', evaluation_text, re.IGNORECASE)
         if score_match:
             score = int(score_match.group(1))
+        else:
+            evaluation_stats.parse_failures += 1
         
         # Extract correct points
         correct_section = re.search(r'CORRECT POINTS:(.*?)(?=MISSING POINTS:|$)', evaluation_text, re.DOTALL | re.IGNORECASE)
@@ -176,3 +231,225 @@ Be encouraging and constructive in your feedback."""
             "improved_answer": f"Based on the document: {context[:500]}"
         }
 
+EVALUATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "score": {"type": "integer", "minimum": 1, "maximum": 10},
+        "correct_points": {"type": "array", "items": {"type": "string"}, "maxItems": 3},
+        "missing_points": {"type": "array", "items": {"type": "string"}, "maxItems": 3},
+        "improved_answer": {"type": "string"}
+    },
+    "required": ["score", "correct_points", "missing_points", "improved_answer"],
+    "additionalProperties": False
+}
+
+BATCH_EVALUATION_SCHEMA = {
+    "type": "object",
+    "properties": {"evaluations": {"type": "array", "items": EVALUATION_SCHEMA}},
+    "required": ["evaluations"],
+    "additionalProperties": False
+}
+
+EVALUATION_FORMAT = """{"score": <integer 1-10>, "correct_points": [<up to 3 short strings>], "missing_points": [<up to 3 short strings>], "improved_answer": "<complete answer, at most 80 words>"}"""
+
+class EvaluationStats:
+    """Counters behind the parse-failure rate reported in /health"""
+
+    def __init__(self):
+        self.evaluations = 0
+        self.llm_calls = 0
+        self.parse_failures = 0
+        self.repairs = 0
+        self.fallbacks = 0
+        self.completion_tokens = 0
+        self.seconds = 0.0
+
+    def record_call(self, response):
+        self.llm_calls += 1
+        usage = getattr(response, "usage", None)
+        if usage is not None and getattr(usage, "completion_tokens", None):
+            self.completion_tokens += usage.completion_tokens
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "mode": TUTOR_EVAL_MODE,
+            "evaluations": self.evaluations,
+            "llm_calls": self.llm_calls,
+            "parse_failures": self.parse_failures,
+            "parse_failure_rate": round(self.parse_failures / self.llm_calls, 4) if self.llm_calls else 0.0,
+            "repairs": self.repairs,
+            "fallbacks": self.fallbacks,
+            "mean_completion_tokens": round(self.completion_tokens / self.llm_calls, 1) if self.llm_calls else 0.0,
+            "mean_latency_ms": round(1000 * self.seconds / self.evaluations, 1) if self.evaluations else 0.0
+        }
+
+evaluation_stats = EvaluationStats()
+
+def get_evaluation_stats() -> Dict[str, Any]:
+    return evaluation_stats.to_dict()
+
+def _response_format(schema: Dict[str, Any], name: str) -> Dict[str, Any]:
+    if TUTOR_EVAL_RESPONSE_FORMAT == "json_schema":
+        return {"type": "json_schema", "json_schema": {"name": name, "schema": schema, "strict": True}}
+    return {"type": "json_object"}
+
+def _string_list(value: Any, field: str) -> List[str]:
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"'{field}' must be a list of strings")
+    return [item.strip() for item in value if item.strip()][:3]
+
+def validate_evaluation(data: Any) -> dict:
+    """Check a parsed evaluation against EVALUATION_SCHEMA; raises ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError("evaluation must be a JSON object")
+    missing = [key for key in EVALUATION_SCHEMA["required"] if key not in data]
+    if missing:
+        raise ValueError(f"missing fields: {', '.join(missing)}")
+    score = data["score"]
+    if isinstance(score, bool) or not isinstance(score, int) or not 1 <= score <= 10:
+        raise ValueError("'score' must be an integer from 1 to 10")
+    improved_answer = data["improved_answer"]
+    if not isinstance(improved_answer, str) or not improved_answer.strip():
+        raise ValueError("'improved_answer' must be a non-empty string")
+    return {
+        "score": score,
+        "correct_points": _string_list(data["correct_points"], "correct_points") or ["You showed understanding of the topic."],
+        "missing_points": _string_list(data["missing_points"], "missing_points") or ["Try to include more specific details from the document."],
+        "improved_answer": improved_answer.strip()
+    }
+
+def _fallback_evaluation(context: str, reason: str) -> dict:
+    evaluation_stats.fallbacks += 1
+    return {
+        "score": 5,
+        "correct_points": ["Answer received"],
+        "missing_points": [reason],
+        "improved_answer": f"Based on the document: {context[:500]}"
+    }
+
+async def _repair_json(raw: str, error: Exception, schema: Dict[str, Any], max_tokens: int) -> Any:
+    """One cheap retry: a small model reshapes the invalid output, nothing is re-evaluated"""
+    evaluation_stats.repairs += 1
+    response = await chat_completion(
+        model=TUTOR_REPAIR_MODEL,
+        messages=[
+            {"role": "system", "content": "You fix JSON so it matches a JSON schema. Reply with the corrected JSON only."},
+            {"role": "user", "content": f"Schema: {json.dumps(schema)}\nProblem: {error}\nOutput to fix:\n{raw[:4000]}"}
+        ],
+        max_tokens=max_tokens,
+        temperature=0,
+        response_format={"type": "json_object"}
+    )
+    evaluation_stats.record_call(response)
+    return json.loads(response.choices[0].message.content)
+
+async def evaluate_tutor_answer_json(question: str, user_answer: str, context: str) -> dict:
+    """Schema-constrained evaluation with strict validation and one repair retry"""
+    started = time.perf_counter()
+    evaluation_stats.evaluations += 1
+    try:
+        try:
+            response = await chat_completion(
+                model=CHAT_MODEL,
+                messages=[
+                    {"role": "system", "content": "You are a friendly tutor giving structured, encouraging feedback. Reply with JSON only."},
+                    {"role": "user", "content": f"""Question: {question}
+Student's Answer: {user_answer}
+Reference Material: {context}
+
+Evaluate the student's answer against the reference material. Reply with exactly this JSON:
+{EVALUATION_FORMAT}"""}
+                ],
+                max_tokens=TUTOR_EVAL_MAX_TOKENS,
+                temperature=0.3,
+                response_format=_response_format(EVALUATION_SCHEMA, "evaluation")
+            )
+            evaluation_stats.record_call(response)
+            raw = response.choices[0].message.content or ""
+        except Exception as e:
+            print(f"Evaluation error: {e}")
+            return _fallback_evaluation(context, "Unable to evaluate at this time")
+        
+        try:
+            return validate_evaluation(json.loads(raw))
+        except ValueError as e:
+            evaluation_stats.parse_failures += 1
+            print(f"Evaluation did not match the schema ({e}), repairing")
+            try:
+                return validate_evaluation(await _repair_json(raw, e, EVALUATION_SCHEMA, TUTOR_EVAL_MAX_TOKENS))
+            except Exception as repair_error:
+                print(f"Evaluation repair failed: {repair_error}")
+                return _fallback_evaluation(context, "Could not parse evaluation properly")
+    finally:
+        evaluation_stats.seconds += time.perf_counter() - started
+
+def _evaluation_list(data: Any) -> List[Any]:
+    """The "evaluations" array of a batch reply; raises ValueError for any other shape"""
+    evaluations = data.get("evaluations") if isinstance(data, dict) else None
+    if not isinstance(evaluations, list):
+        raise ValueError("reply must be an object with an 'evaluations' array")
+    return evaluations
+
+async def evaluate_tutor_answers(items: List[Tuple[str, str, str]]) -> List[dict]:
+    """
+    Evaluate several (question, user_answer, context) items with one LLM call.
+    "I don't know" answers are explained instead; any item the batch reply
+    gets wrong is re-evaluated on its own.
+    """
+    results: List[Any] = [None] * len(items)
+    pending = []
+    for i, (question, user_answer, context) in enumerate(items):
+        if is_dont_know_answer(user_answer):
+            pending.append((i, explain_answer(question, context)))
+    
+    graded = [i for i, (_, user_answer, _) in enumerate(items) if not is_dont_know_answer(user_answer)]
+    if len(graded) == 1 or (graded and TUTOR_EVAL_MODE != "json"):
+        pending.extend((i, evaluate_tutor_answer(*items[i])) for i in graded)
+        graded = []
+    
+    if graded:
+        started = time.perf_counter()
+        evaluation_stats.evaluations += len(graded)
+        entries = "\n\n".join(
+            f"Item {n + 1}:\nQuestion: {items[i][0]}\nStudent's Answer: {items[i][1]}\nReference Material: {items[i][2]}"
+            for n, i in enumerate(graded)
+        )
+        max_tokens = TUTOR_EVAL_MAX_TOKENS * len(graded)
+        evaluations: List[Any] = []
+        try:
+            response = await chat_completion(
+                model=CHAT_MODEL,
+                messages=[
+                    {"role": "system", "content": "You are a friendly tutor giving structured, encouraging feedback. Reply with JSON only."},
+                    {"role": "user", "content": f"""{entries}
+
+Evaluate each student's answer against its reference material. Reply with exactly this JSON, one evaluation per item, in item order:
+{{"evaluations": [{EVALUATION_FORMAT}, ...]}}"""}
+                ],
+                max_tokens=max_tokens,
+                temperature=0.3,
+                response_format=_response_format(BATCH_EVALUATION_SCHEMA, "evaluations")
+            )
+            evaluation_stats.record_call(response)
+            raw = response.choices[0].message.content or ""
+            try:
+                evaluations = _evaluation_list(json.loads(raw))
+            except ValueError as e:
+                evaluation_stats.parse_failures += 1
+                evaluations = _evaluation_list(await _repair_json(raw, e, BATCH_EVALUATION_SCHEMA, max_tokens))
+        except Exception as e:
+            print(f"Batch evaluation error: {e}")
+        
+        for n, i in enumerate(graded):
+            try:
+                results[i] = validate_evaluation(evaluations[n])
+            except (ValueError, IndexError, TypeError):
+                # Counted again by the single-item path
+                evaluation_stats.evaluations -= 1
+                pending.append((i, evaluate_tutor_answer_json(*items[i])))
+        evaluation_stats.seconds += time.perf_counter() - started
+    
+    if pending:
+        for (i, _), result in zip(pending, await asyncio.gather(*(coro for _, coro in pending))):
+            results[i] = result
+    return results
@@ -0,0 +1,236 @@
+"""
+Tutor Session Store Module
+Pluggable storage for conversational tutor sessions.
+- memory: per-process LRU with an idle TTL (single worker / development)
+- mongo:  MongoDB-backed, shared by every worker. Every turn reads the
+          current session and writes its changes through as one atomic
+          update, so no worker answers from or overwrites a stale copy.
+Select the backend with TUTOR_SESSION_STORE.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from mongodb_client import load_tutor_session, update_tutor_session, delete_tutor_session
+
+TUTOR_SESSION_STORE = os.getenv("TUTOR_SESSION_STORE", "memory")
+TUTOR_SESSION_MAX_SESSIONS = int(os.getenv("TUTOR_SESSION_MAX_SESSIONS", "10000"))
+TUTOR_SESSION_TTL_SECONDS = float(os.getenv("TUTOR_SESSION_TTL_SECONDS", str(24 * 3600)))
+TUTOR_HISTORY_MAX_MESSAGES = int(os.getenv("TUTOR_HISTORY_MAX_MESSAGES", "20"))
+
+class TutorSession:
+    __slots__ = (
+        "session_id", "conversation_history", "current_topic", "questions_asked", "correct_answers",
+        "_unsaved_messages", "_saved_topic", "_saved_asked", "_saved_correct"
+    )
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.conversation_history: List[Dict[str, str]] = []
+        self.current_topic = None
+        self.questions_asked = 0
+        self.correct_answers = 0
+        self.mark_saved()
+
+    def add_message(self, role: str, content: str):
+        """Append to the history, keeping only the most recent TUTOR_HISTORY_MAX_MESSAGES"""
+        message = {"role": role, "content": content}
+        self.conversation_history.append(message)
+        self._unsaved_messages.append(message)
+        overflow = len(self.conversation_history) - TUTOR_HISTORY_MAX_MESSAGES
+        if overflow > 0:
+            del self.conversation_history[:overflow]
+        overflow = len(self._unsaved_messages) - TUTOR_HISTORY_MAX_MESSAGES
+        if overflow > 0:
+            del self._unsaved_messages[:overflow]
+
+    def mark_saved(self):
+        """Take the current state as the stored baseline for pending_changes()"""
+        self._unsaved_messages: List[Dict[str, str]] = []
+        self._saved_topic = self.current_topic
+        self._saved_asked = self.questions_asked
+        self._saved_correct = self.correct_answers
+
+    def pending_changes(self) -> Dict[str, Any]:
+        """What this turn changed since the session was loaded or last saved"""
+        return {
+            "new_messages": list(self._unsaved_messages),
+            "asked_delta": self.questions_asked - self._saved_asked,
+            "correct_delta": self.correct_answers - self._saved_correct,
+            "current_topic": self.current_topic,
+            "set_topic": self.current_topic != self._saved_topic
+        }
+
+    def to_dict(self):
+        return {
+            "session_id": self.session_id,
+            "current_topic": self.current_topic,
+            "questions_asked": self.questions_asked,
+            "correct_answers": self.correct_answers,
+            "accuracy": (self.correct_answers / self.questions_asked * 100) if self.questions_asked > 0 else 0
+        }
+
+    def to_state(self) -> Dict[str, Any]:
+        """Full state for storage"""
+        return {
+            "session_id": self.session_id,
+            "conversation_history": list(self.conversation_history),
+            "current_topic": self.current_topic,
+            "questions_asked": self.questions_asked,
+            "correct_answers": self.correct_answers
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "TutorSession":
+        session = cls(state["session_id"])
+        session.conversation_history = list(state.get("conversation_history", []))[-TUTOR_HISTORY_MAX_MESSAGES:]
+        session.current_topic = state.get("current_topic")
+        session.questions_asked = state.get("questions_asked", 0)
+        session.correct_answers = state.get("correct_answers", 0)
+        session.mark_saved()
+        return session
+
+class MemorySessionStore:
+    """Process-local sessions, evicted LRU beyond max_sessions or after ttl_seconds idle"""
+
+    remote = False
+
+    def __init__(self, max_sessions: int = TUTOR_SESSION_MAX_SESSIONS, ttl_seconds: float = TUTOR_SESSION_TTL_SECONDS):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        # session_id -> (expires_at, session)
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, session_id: str) -> Optional[TutorSession]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None and entry[0] < time.time():
+                del self._sessions[session_id]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            # Sliding expiry: every access keeps the session alive
+            self._sessions[session_id] = (time.time() + self.ttl_seconds, entry[1])
+            self._sessions.move_to_end(session_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, session: TutorSession):
+        session.mark_saved()
+        with self._lock:
+            self._sessions[session.session_id] = (time.time() + self.ttl_seconds, session)
+            self._sessions.move_to_end(session.session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def flush(self) -> int:
+        return 0
+
+    def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+class MongoSessionStore:
+    """
+    Sessions shared through MongoDB (expired there by a TTL index).
+    Nothing is cached locally: get() always loads the stored state, and put()
+    writes the turn's changes through as deltas, so concurrent turns on other
+    workers are merged rather than overwritten.
+    """
+
+    remote = True
+
+    def __init__(self, ttl_seconds: float = TUTOR_SESSION_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.writes = 0
+        self.write_errors = 0
+
+    def get(self, session_id: str) -> Optional[TutorSession]:
+        state = load_tutor_session(session_id)
+        with self._lock:
+            self.loads += 1
+        if state is None:
+            return None
+        return TutorSession.from_state(state)
+
+    def put(self, session: TutorSession):
+        """Write the session's changes through and refresh it with the merged state"""
+        try:
+            state = update_tutor_session(
+                session.session_id,
+                max_messages=TUTOR_HISTORY_MAX_MESSAGES,
+                ttl_seconds=self.ttl_seconds,
+                **session.pending_changes()
+            )
+        except Exception:
+            with self._lock:
+                self.write_errors += 1
+            raise
+        with self._lock:
+            self.writes += 1
+        merged = TutorSession.from_state(state)
+        session.conversation_history = merged.conversation_history
+        session.current_topic = merged.current_topic
+        session.questions_asked = merged.questions_asked
+        session.correct_answers = merged.correct_answers
+        session.mark_saved()
+
+    def delete(self, session_id: str):
+        delete_tutor_session(session_id)
+
+    def flush(self) -> int:
+        return 0
+
+    def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "mongo",
+                "loads": self.loads,
+                "writes": self.writes,
+                "write_errors": self.write_errors
+            }
+
+def create_session_store(backend: str = TUTOR_SESSION_STORE):
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "mongo":
+        return MongoSessionStore()
+    raise ValueError(f"Unknown TUTOR_SESSION_STORE '{backend}'. Choose 'memory' or 'mongo'")
@@ -0,0 +1,66 @@
+"""
+Vector Codec Module
+Compact binary storage of embeddings in MongoDB.
+- array:   legacy BSON array of doubles (~3.5 KB for 384-d)
+- float32: little-endian float32 BinData (lossless for model output)
+- float16: half precision BinData
+- int8:    symmetric per-vector quantization, scale kept in embedding_scale
+Readers decode BinData with np.frombuffer, so no per-element Python objects
+are created.
+"""
+
+import os
+from typing import Any, Dict, Sequence
+import numpy as np
+from bson.binary import Binary
+
+EMBEDDING_STORAGE_FORMAT = os.getenv("EMBEDDING_STORAGE_FORMAT", "float32")
+
+FORMATS = ("array", "float32", "float16", "int8")
+_DTYPES = {
+    "float32": np.dtype("<f4"),
+    "float16": np.dtype("<f2"),
+    "int8": np.dtype("i1")
+}
+
+# Fields readers need to project alongside the embedding itself
+EMBEDDING_FIELDS = {"embedding": 1, "embedding_format": 1, "embedding_scale": 1}
+
+def encode_embedding(vector: Sequence[float], fmt: str = EMBEDDING_STORAGE_FORMAT) -> Dict[str, Any]:
+    """Fields to store for one embedding in the given format"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown embedding storage format '{fmt}'. Choose from: {', '.join(FORMATS)}")
+
+    values = np.asarray(vector, dtype=np.float32)
+    if fmt == "array":
+        return {"embedding": values.tolist(), "embedding_format": fmt}
+    if fmt == "int8":
+        peak = float(np.abs(values).max()) if values.size else 0.0
+        scale = peak / 127 if peak > 0 else 1.0
+        quantized = np.clip(np.rint(values / scale), -127, 127).astype(_DTYPES[fmt])
+        return {"embedding": Binary(quantized.tobytes()), "embedding_format": fmt, "embedding_scale": scale}
+    return {"embedding": Binary(values.astype(_DTYPES[fmt]).tobytes()), "embedding_format": fmt}
+
+def decode_embedding(doc: Dict[str, Any]) -> np.ndarray:
+    """float32 vector from a stored document (documents without a format are legacy arrays)"""
+    fmt = doc.get("embedding_format", "array")
+    if fmt == "array":
+        return np.asarray(doc["embedding"], dtype=np.float32)
+    values = np.frombuffer(doc["embedding"], dtype=_DTYPES[fmt])
+    if fmt == "int8":
+        return values.astype(np.float32) * np.float32(doc.get("embedding_scale", 1.0))
+    return values.astype(np.float32, copy=False)
+
+def decode_matrix(docs: Sequence[Dict[str, Any]]) -> np.ndarray:
+    """Stack stored embeddings into one contiguous float32 matrix"""
+    if not docs:
+        return np.zeros((0, 0), dtype=np.float32)
+    fmt = docs[0].get("embedding_format", "array")
+    if fmt in _DTYPES and all(doc.get("embedding_format") == fmt for doc in docs):
+        # One buffer, one frombuffer call for the whole document
+        raw = b"".join(doc["embedding"] for doc in docs)
+        matrix = np.frombuffer(raw, dtype=_DTYPES[fmt]).reshape(len(docs), -1).astype(np.float32, copy=False)
+        if fmt == "int8":
+            matrix = matrix * np.array([doc.get("embedding_scale", 1.0) for doc in docs], dtype=np.float32)[:, None]
+        return matrix
+    return np.stack([decode_embedding(doc) for doc in docs])
@@ -0,0 +1,164 @@
+"""
+Vector Search Module
+Vectorized top-k retrieval over document embeddings using NumPy
+"""
+
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Callable
+import numpy as np
+from vector_codec import decode_matrix
+
+
+class VectorIndex:
+    """Contiguous, pre-normalized embedding matrix for a single document"""
+
+    def __init__(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        texts: Sequence[str],
+        chunk_ids: Optional[Sequence[str]] = None
+    ):
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.size == 0:
+            matrix = matrix.reshape(0, 0)
+        elif matrix.ndim != 2:
+            raise ValueError(f"Expected a 2-D embedding matrix, got shape {matrix.shape}")
+
+        if len(texts) != matrix.shape[0]:
+            raise ValueError("Number of texts does not match number of embeddings")
+
+        # Normalize once so a query only needs a single dot product per chunk
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.matrix = np.ascontiguousarray(matrix / norms, dtype=np.float32)
+        self.texts = list(texts)
+        self.chunk_ids = list(chunk_ids) if chunk_ids is not None else None
+        self._text_bytes = sum(len(text) for text in self.texts)
+
+    @classmethod
+    def from_documents(cls, docs: Sequence[Dict[str, Any]]) -> "VectorIndex":
+        """Build an index from embedding documents as stored in MongoDB"""
+        return cls(
+            decode_matrix(docs),
+            [doc["text"] for doc in docs],
+            [doc.get("chunk_id") for doc in docs]
+        )
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the index (matrix plus chunk texts)"""
+        return self.matrix.nbytes + self._text_bytes
+
+    def top_k(self, query_embedding: Sequence[float], k: int = 5) -> List[Tuple[int, float]]:
+        """Return (row, cosine similarity) pairs for the k best matching chunks"""
+        n = len(self)
+        if n == 0 or k <= 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        scores = self.matrix @ query
+
+        k = min(k, n)
+        if k < n:
+            candidates = np.argpartition(-scores, k - 1)[:k]
+            candidates.sort()
+        else:
+            candidates = np.arange(n)
+
+        # Stable sort keeps document order between equal scores, like list.sort did
+        order = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(i), float(scores[i])) for i in order]
+
+    def search(self, query_embedding: Sequence[float], k: int = 5) -> List[str]:
+        """Return the texts of the k most similar chunks"""
+        return [self.texts[i] for i, _ in self.top_k(query_embedding, k)]
+
+
+class DocumentIndexCache:
+    """LRU cache of decoded VectorIndex objects keyed by document_id, bounded by bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, VectorIndex]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, document_id: str) -> Optional[VectorIndex]:
+        with self._lock:
+            index = self._entries.get(document_id)
+            if index is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(document_id)
+            self.hits += 1
+            return index
+
+    def put(self, document_id: str, index: VectorIndex):
+        size = index.nbytes
+        with self._lock:
+            self._discard(document_id)
+            if size > self.max_bytes:
+                # Larger than the whole budget - serve it uncached
+                return
+            while self._entries and self._bytes + size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+            self._entries[document_id] = index
+            self._bytes += size
+
+    def get_or_load(
+        self,
+        document_id: str,
+        loader: Callable[[], VectorIndex],
+        expected_chunks: Optional[int] = None
+    ) -> VectorIndex:
+        """
+        Return the cached index, building it with loader() on a miss. When
+        expected_chunks is given, a cached index of a different size is stale
+        (another process added or removed chunks) and is rebuilt.
+        """
+        index = self.get(document_id)
+        if index is not None and expected_chunks is not None and len(index) != expected_chunks:
+            index = None
+        if index is None:
+            index = loader()
+            self.put(document_id, index)
+        return index
+
+    def invalidate(self, document_id: Optional[str] = None):
+        """Drop one document, or every document when document_id is None"""
+        with self._lock:
+            if document_id is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                self._discard(document_id)
+
+    def _discard(self, document_id: str):
+        index = self._entries.pop(document_id, None)
+        if index is not None:
+            self._bytes -= index.nbytes
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
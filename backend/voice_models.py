@@ -6,26 +6,32 @@ Handles speech-to-text and text-to-speech
 """
 
 import os
+import re
+import time
 import asyncio
 import edge_tts
 from io import BytesIO
-from openai import OpenAI
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, List, Union
 from dotenv import load_dotenv
+from llm_gateway import transcribe, TRANSCRIPTION_MODEL
+from tts_cache import tts_cache
+from audio_processing import preprocess_for_stt, STT_PREPROCESS
 
 load_dotenv()
 
-# Initialize Groq client for speech-to-text
-client = OpenAI(
-    api_key=os.environ.get("GROQ_API_KEY"),
-    base_url="https://api.groq.com/openai/v1"
-)
-
 VOICE = "en-IN-PrabhatNeural"   # Indian male neural voice
+RATE = "+20%"
 # Alternatives:
 # en-IN-NeerjaNeural  (Indian female)
 # en-US-GuyNeural
 # en-GB-RyanNeural
 
+# Sentences synthesized ahead of the one being streamed, and the shortest piece worth its own request
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", "4"))
+TTS_MIN_SENTENCE_CHARS = int(os.getenv("TTS_MIN_SENTENCE_CHARS", "24"))
+
+SENTENCE_END = re.compile(r'(?<=[.!?])["\')\]]*\s+')
+
 async def speech_to_text(audio_file_path: str) -> str:
     """
     Convert speech to text using Whisper Large V3 via Groq
@@ -38,8 +44,8 @@ async def speech_to_text(audio_file_path: str) -> str:
     """
     try:
         with open(audio_file_path, "rb") as audio_file:
-            transcription = client.audio.transcriptions.create(
-                model="whisper-large-v3",
+            transcription = await transcribe(
+                model=TRANSCRIPTION_MODEL,
                 file=audio_file,
                 response_format="text"
             )
@@ -48,34 +54,83 @@ async def speech_to_text(audio_file_path: str) -> str:
         print(f"Speech-to-text error: {e}")
         return ""
 
-async def speech_to_text_from_bytes(audio_bytes: bytes, filename: str = "audio.wav") -> str:
+class STTStats:
+    """Upload sizes and latency of transcriptions, with and without preprocessing"""
+
+    def __init__(self):
+        self.requests = 0
+        self.preprocessed = 0
+        self.original_bytes = 0
+        self.uploaded_bytes = 0
+        self.preprocess_seconds = 0.0
+        self.transcribe_seconds = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "preprocessed": self.preprocessed,
+            "original_bytes": self.original_bytes,
+            "uploaded_bytes": self.uploaded_bytes,
+            "bytes_saved_ratio": round(1 - self.uploaded_bytes / self.original_bytes, 4) if self.original_bytes else 0.0,
+            "mean_preprocess_ms": round(1000 * self.preprocess_seconds / self.requests, 1) if self.requests else 0.0,
+            "mean_transcribe_ms": round(1000 * self.transcribe_seconds / self.requests, 1) if self.requests else 0.0
+        }
+
+stt_stats = STTStats()
+
+def get_stt_stats() -> Dict[str, Any]:
+    return stt_stats.to_dict()
+
+async def speech_to_text_from_bytes(audio_bytes: bytes, filename: str = "audio.wav", preprocess: bool = STT_PREPROCESS) -> str:
     """
     Convert speech to text from audio bytes using Whisper Large V3 via Groq
     
     Args:
         audio_bytes: Audio data as bytes
         filename: Filename for the audio (with extension)
+        preprocess: Downmix, resample to 16 kHz and trim silence first
         
     Returns:
         Transcribed text
     """
     try:
+        original_bytes = len(audio_bytes)
+        preprocess_ms = 0.0
+        if preprocess:
+            result = await asyncio.to_thread(preprocess_for_stt, audio_bytes, filename)
+            preprocess_ms = result.elapsed_ms
+            if result.applied:
+                audio_bytes, filename = result.audio, result.filename
+                stt_stats.preprocessed += 1
+        
         # Create a file-like object from bytes
         audio_file = BytesIO(audio_bytes)
         audio_file.name = filename
         
-        transcription = client.audio.transcriptions.create(
-            model="whisper-large-v3",
+        started = time.perf_counter()
+        transcription = await transcribe(
+            model=TRANSCRIPTION_MODEL,
             file=audio_file,
             response_format="text"
         )
+        transcribe_ms = (time.perf_counter() - started) * 1000
+        
+        stt_stats.requests += 1
+        stt_stats.original_bytes += original_bytes
+        stt_stats.uploaded_bytes += len(audio_bytes)
+        stt_stats.preprocess_seconds += preprocess_ms / 1000
+        stt_stats.transcribe_seconds += transcribe_ms / 1000
+        print(
+            f"🎙️ STT {filename}: {original_bytes} -> {len(audio_bytes)} bytes "
+            f"({original_bytes - len(audio_bytes)} saved), preprocess {preprocess_ms:.0f} ms, transcribe {transcribe_ms:.0f} ms"
+        )
         return transcription
     except Exception as e:
         print(f"Speech-to-text error: {e}")
         return ""
 
 async def speak_async(text, filename):
-    communicate = edge_tts.Communicate(text=text, voice=VOICE, rate="+20%")
+    communicate = edge_tts.Communicate(text=text, voice=VOICE, rate=RATE)
     await communicate.save(filename)
 
 async def text_to_speech(text: str) -> bytes:
@@ -91,9 +146,14 @@ async def text_to_speech(text: str) -> bytes:
     if not text.strip():
         return b""
     
+    # A disk hit opens and maps a file - keep that off the event loop
+    cached = await asyncio.to_thread(tts_cache.get, VOICE, RATE, text)
+    if cached is not None:
+        return cached
+    
     try:
         # Create a communicate object with faster rate
-        communicate = edge_tts.Communicate(text=text, voice=VOICE, rate="+20%")
+        communicate = edge_tts.Communicate(text=text, voice=VOICE, rate=RATE)
         
         # Save to BytesIO instead of file
         audio_data = BytesIO()
@@ -102,8 +162,9 @@ async def text_to_speech(text: str) -> bytes:
                 audio_data.write(chunk["data"])
         
         # Return the audio bytes
-        audio_data.seek(0)
-        return audio_data.read()
+        audio_bytes = audio_data.getvalue()
+        await asyncio.to_thread(tts_cache.put, VOICE, RATE, text, audio_bytes)
+        return audio_bytes
         
     except Exception as e:
         print(f"Text-to-speech error: {e}")
@@ -122,13 +183,153 @@ async def text_to_speech_stream(text: str):
     if not text.strip():
         return
     
+    cached = await asyncio.to_thread(tts_cache.stream, VOICE, RATE, text)
+    if cached is not None:
+        # Slicing the memory map may fault pages in from disk, so chunks are read in a thread too
+        try:
+            while (chunk := await asyncio.to_thread(next, cached, None)) is not None:
+                yield chunk
+        finally:
+            cached.close()
+        return
+    
     try:
-        communicate = edge_tts.Communicate(text=text, voice=VOICE, rate="+20%")
+        communicate = edge_tts.Communicate(text=text, voice=VOICE, rate=RATE)
         
+        parts = []
         async for chunk in communicate.stream():
             if chunk["type"] == "audio":
+                parts.append(chunk["data"])
                 yield chunk["data"]
+        # Only a clip that streamed to the end is cached
+        await asyncio.to_thread(tts_cache.put, VOICE, RATE, text, b"".join(parts))
             
     except Exception as e:
+        # Re-raised so the stream ends with an error instead of silently losing the sentence
         print(f"Text-to-speech streaming error: {e}")
-        yield b""
+        raise
+
+class SentenceSplitter:
+    """
+    Incremental sentence splitter for text that arrives in pieces (e.g. LLM
+    tokens). Fragments shorter than min_chars are held back and joined to
+    the next sentence, so "Yes." or "1." do not cost a synthesis each.
+    """
+
+    def __init__(self, min_chars: int = TTS_MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add text; return the sentences it completed"""
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in SENTENCE_END.finditer(self._buffer):
+            if match.end() - start >= self.min_chars:
+                sentences.append(self._buffer[start:match.end()].strip())
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        """Whatever is left once the text is complete"""
+        rest, self._buffer = self._buffer.strip(), ""
+        return [rest] if rest else []
+
+def split_sentences(text: str, min_chars: int = TTS_MIN_SENTENCE_CHARS) -> List[str]:
+    splitter = SentenceSplitter(min_chars)
+    return splitter.feed(text) + splitter.flush()
+
+async def _iterate_sentences(sentences: Union[Iterable[str], AsyncIterable[str]]) -> AsyncIterator[str]:
+    if hasattr(sentences, "__aiter__"):
+        async for sentence in sentences:
+            yield sentence
+    else:
+        for sentence in sentences:
+            yield sentence
+
+async def _synthesize_into(sentence: str, queue: asyncio.Queue):
+    # Audio chunks, then None once the sentence is done; a failure is queued for the reader to raise
+    try:
+        async for chunk in text_to_speech_stream(sentence):
+            if chunk:
+                queue.put_nowait(chunk)
+    except Exception as e:
+        queue.put_nowait(e)
+    finally:
+        queue.put_nowait(None)
+
+async def synthesize_sentences(
+    sentences: Union[Iterable[str], AsyncIterable[str]],
+    concurrency: int = TTS_CONCURRENCY
+) -> AsyncIterator[bytes]:
+    """
+    MP3 audio for a sequence of sentences, in order. Up to `concurrency`
+    sentences are synthesized at once; the first one streams as its audio
+    arrives and later ones are buffered until their turn. Sentences may
+    come from an async iterator (e.g. a sentence splitter over LLM tokens),
+    so speech can start before the text is complete. A sentence that fails
+    to synthesize raises here and ends the stream.
+    """
+    window = asyncio.Semaphore(max(concurrency, 1))
+    # One queue of audio chunks per sentence, in sentence order; None ends the stream
+    order: asyncio.Queue = asyncio.Queue()
+    tasks = []
+
+    async def produce():
+        try:
+            async for sentence in _iterate_sentences(sentences):
+                if not sentence.strip():
+                    continue
+                await window.acquire()
+                queue: asyncio.Queue = asyncio.Queue()
+                tasks.append(asyncio.create_task(_synthesize_into(sentence, queue)))
+                order.put_nowait(queue)
+        finally:
+            order.put_nowait(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            queue = await order.get()
+            if queue is None:
+                break
+            while True:
+                chunk = await queue.get()
+                if chunk is None:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+            window.release()
+        await producer
+    finally:
+        for task in [producer, *tasks]:
+            task.cancel()
+        await asyncio.gather(producer, *tasks, return_exceptions=True)
+
+def text_to_speech_sentences(text: str) -> AsyncIterator[bytes]:
+    """Streamed MP3 for a whole text, synthesized sentence by sentence"""
+    return synthesize_sentences(split_sentences(text))
+
+async def prewarm_tts(phrases: Iterable[str], concurrency: int = 2) -> int:
+    """
+    Synthesize fixed phrases into the TTS cache ahead of time, both whole
+    (for /voice/synthesize) and per sentence (for the streaming endpoints).
+    Returns how many clips had to be synthesized.
+    """
+    texts = []
+    for phrase in phrases:
+        for text in [phrase, *split_sentences(phrase)]:
+            if text.strip() and text not in texts and not tts_cache.contains(VOICE, RATE, text):
+                texts.append(text)
+    
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def warm(text: str) -> bool:
+        async with semaphore:
+            return bool(await text_to_speech(text))
+    
+    results = await asyncio.gather(*(warm(text) for text in texts))
+    return sum(results)
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
-import API_URL from '../config/api';
+import API_URL, { documentParams } from '../config/api';
 
 const ChatMode = ({ onBack, onNewDocument }) => {
   const [messages, setMessages] = useState([]);
@@ -10,13 +10,17 @@ const ChatMode = ({ onBack, onNewDocument }) => {
   const [sessions, setSessions] = useState([]);
   const [sidebarOpen, setSidebarOpen] = useState(true);
   const [creatingSession, setCreatingSession] = useState(false);
+  // Paging cursors returned by the backend; null when there is nothing more to load
+  const [olderCursor, setOlderCursor] = useState(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
+  const [sessionsCursor, setSessionsCursor] = useState(null);
 
   // Load sessions on mount, create new session only if none exist
   useEffect(() => {
     const initializeChat = async () => {
       await loadSessions();
       // Only create a new session if there are no existing sessions
-      const response = await axios.get(`${API_URL}/chat/sessions`);
+      const response = await axios.get(`${API_URL}/chat/sessions`, { params: documentParams() });
       const existingSessions = response.data.sessions || [];
       
       if (existingSessions.length === 0) {
@@ -37,10 +41,10 @@ const ChatMode = ({ onBack, onNewDocument }) => {
     
     try {
       setCreatingSession(true);
-      const userId = localStorage.getItem('userId');
-      const response = await axios.post(`${API_URL}/chat/session/create?user_id=${userId}`);
+      const response = await axios.post(`${API_URL}/chat/session/create`, null, { params: documentParams() });
       setSessionId(response.data.session_id);
       setMessages([]);
+      setOlderCursor(null);
       await loadSessions(); // Refresh sessions list
     } catch (error) {
       console.error('Error creating session:', error);
@@ -49,34 +53,67 @@ const ChatMode = ({ onBack, onNewDocument }) => {
     }
   };
 
+  const sessionsPageCursor = (data) => (
+    data.before ? { before: data.before, before_session_id: data.before_session_id } : null
+  );
+
   const loadSessions = async () => {
     try {
-      const response = await axios.get(`${API_URL}/chat/sessions`);
+      const response = await axios.get(`${API_URL}/chat/sessions`, { params: documentParams() });
       setSessions(response.data.sessions || []);
+      setSessionsCursor(sessionsPageCursor(response.data));
+    } catch (error) {
+      console.error('Error loading sessions:', error);
+    }
+  };
+
+  const loadMoreSessions = async () => {
+    if (!sessionsCursor) return;
+    try {
+      const response = await axios.get(`${API_URL}/chat/sessions`, {
+        params: { ...documentParams(), ...sessionsCursor }
+      });
+      setSessions(prev => [...prev, ...(response.data.sessions || [])]);
+      setSessionsCursor(sessionsPageCursor(response.data));
     } catch (error) {
       console.error('Error loading sessions:', error);
     }
   };
 
+  // Convert history to message format
+  const formatHistory = (history) => history.map(msg => ({
+    type: msg.role === 'user' ? 'user' : 'bot',
+    content: msg.content,
+    sources: msg.sources || []
+  }));
+
   const loadSessionHistory = async (sid) => {
     try {
       const response = await axios.get(`${API_URL}/chat/session/${sid}/history`);
-      const history = response.data.messages || [];
-      
-      // Convert history to message format
-      const formattedMessages = history.map(msg => ({
-        type: msg.role === 'user' ? 'user' : 'bot',
-        content: msg.content,
-        sources: msg.sources || []
-      }));
-      
-      setMessages(formattedMessages);
+      setMessages(formatHistory(response.data.messages || []));
+      setOlderCursor(response.data.has_more ? response.data.before : null);
       setSessionId(sid);
     } catch (error) {
       console.error('Error loading history:', error);
     }
   };
 
+  const loadOlderMessages = async () => {
+    if (olderCursor === null || loadingOlder) return;
+    try {
+      setLoadingOlder(true);
+      const response = await axios.get(`${API_URL}/chat/session/${sessionId}/history`, {
+        params: { before: olderCursor }
+      });
+      setMessages(prev => [...formatHistory(response.data.messages || []), ...prev]);
+      setOlderCursor(response.data.has_more ? response.data.before : null);
+    } catch (error) {
+      console.error('Error loading older messages:', error);
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
   const deleteSession = async (sid, e) => {
     e.stopPropagation();
     try {
@@ -103,7 +140,8 @@ const ChatMode = ({ onBack, onNewDocument }) => {
 
     try {
       const response = await axios.post(`${API_URL}/chat/session/${sessionId}/message`, {
-        message: inputMessage
+        message: inputMessage,
+        ...documentParams()
       });
 
       const botMessage = {
@@ -211,6 +249,14 @@ const ChatMode = ({ onBack, onNewDocument }) => {
                   </div>
                 </div>
               ))}
+              {sessionsCursor && (
+                <button
+                  onClick={loadMoreSessions}
+                  className="w-full px-3 py-2 text-xs text-gray-500 hover:text-white hover:bg-gray-800/50 rounded-lg transition-all"
+                >
+                  Load older chats
+                </button>
+              )}
             </div>
           )}
         </div>
@@ -270,6 +316,18 @@ const ChatMode = ({ onBack, onNewDocument }) => {
         {/* Messages */}
         <div className="flex-1 overflow-y-auto p-6 bg-gray-900">
           <div className="max-w-3xl mx-auto">
+            {olderCursor !== null && (
+              <div className="flex justify-center mb-6">
+                <button
+                  onClick={loadOlderMessages}
+                  disabled={loadingOlder}
+                  className="px-4 py-2 bg-gray-800 hover:bg-gray-700 text-gray-300 rounded-lg text-xs font-medium transition-all disabled:opacity-50 disabled:cursor-not-allowed"
+                >
+                  {loadingOlder ? 'Loading...' : 'Load older messages'}
+                </button>
+              </div>
+            )}
+
             {messages.length === 0 && (
               <div className="flex flex-col items-center justify-center h-full text-center py-12">
                 <div className="w-20 h-20 bg-gradient-to-br from-blue-500/20 to-cyan-500/20 rounded-2xl flex items-center justify-center mb-4">
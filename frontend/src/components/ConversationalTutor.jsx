@@ -102,40 +102,29 @@ const ConversationalTutor = ({ onBack, onNewDocument }) => {
     
     setIsSpeaking(true);
     
-    // Try server-side TTS first
-    axios.post(`${API_URL}/voice/synthesize`, { text })
-      .then(res => {
-        if (res.data.audio) {
-          // Use server TTS
-          const audio = new Audio(`data:audio/mp3;base64,${res.data.audio}`);
-          audioRef.current = audio;
-          
-          audio.onerror = () => {
-            // If audio fails to play, fallback to browser TTS
-            audioRef.current = null;
-            useBrowserTTS(text);
-          };
-          
-          audio.onended = () => {
-            audioRef.current = null;
-            setIsSpeaking(false);
-            setTimeout(() => startListening(), 500);
-          };
-          
-          audio.play().catch(() => {
-            // If play fails, use browser TTS
-            audioRef.current = null;
-            useBrowserTTS(text);
-          });
-        } else {
-          // No audio returned, use browser TTS
-          useBrowserTTS(text);
-        }
-      })
-      .catch(() => {
-        // Server error, use browser TTS
-        useBrowserTTS(text);
-      });
+    // Try server-side TTS first; the audio streams sentence by sentence, so playback starts right away
+    const audio = new Audio(`${API_URL}/voice/synthesize/stream?text=${encodeURIComponent(text)}`);
+    audioRef.current = audio;
+    
+    audio.onerror = () => {
+      // Server TTS unavailable or the audio failed to play, fallback to browser TTS
+      if (audioRef.current !== audio) return;
+      audioRef.current = null;
+      useBrowserTTS(text);
+    };
+    
+    audio.onended = () => {
+      audioRef.current = null;
+      setIsSpeaking(false);
+      setTimeout(() => startListening(), 500);
+    };
+    
+    audio.play().catch(() => {
+      // If play fails, use browser TTS
+      if (audioRef.current !== audio) return;
+      audioRef.current = null;
+      useBrowserTTS(text);
+    });
   };
 
   const useBrowserTTS = (text) => {
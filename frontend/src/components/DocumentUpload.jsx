@@ -74,6 +74,7 @@ const DocumentUpload = ({ onUploadSuccess }) => {
       });
 
       if (response.data.success) {
+        localStorage.setItem('documentId', response.data.document_id);
         onUploadSuccess();
       }
     } catch (err) {
@@ -1,9 +1,10 @@
 import { useState, useEffect } from 'react';
 import axios from 'axios';
-import API_URL from '../config/api';
+import API_URL, { documentParams } from '../config/api';
 
 const TutorMode = ({ onBack, onNewDocument }) => {
   const [currentQuestion, setCurrentQuestion] = useState('');
+  const [questionChunkId, setQuestionChunkId] = useState(null);
   const [userAnswer, setUserAnswer] = useState('');
   const [evaluation, setEvaluation] = useState(null);
   const [loading, setLoading] = useState(false);
@@ -16,10 +17,14 @@ const TutorMode = ({ onBack, onNewDocument }) => {
 
     try {
       // Add timestamp to prevent caching
-      const response = await axios.get(`${API_URL}/tutor/question?t=${Date.now()}`);
+      const response = await axios.get(`${API_URL}/tutor/question`, {
+        params: { ...documentParams(), t: Date.now() }
+      });
       setCurrentQuestion(response.data.question);
+      setQuestionChunkId(response.data.chunk_id || null);
     } catch (error) {
       setCurrentQuestion('Error loading question. Please try again.');
+      setQuestionChunkId(null);
     } finally {
       setQuestionLoading(false);
     }
@@ -33,7 +38,9 @@ const TutorMode = ({ onBack, onNewDocument }) => {
     try {
       const response = await axios.post(`${API_URL}/tutor/evaluate`, {
         question: currentQuestion,
-        user_answer: userAnswer
+        chunk_id: questionChunkId,
+        user_answer: userAnswer,
+        ...documentParams()
       });
 
       setEvaluation(response.data);
@@ -1,6 +1,6 @@
 import { useState, useRef, useEffect } from 'react';
 import axios from 'axios';
-import API_URL from '../config/api';
+import API_URL, { documentParams } from '../config/api';
 
 const VoiceMode = ({ onBack, onNewDocument }) => {
   const [isListening, setIsListening] = useState(false);
@@ -8,6 +8,7 @@ const VoiceMode = ({ onBack, onNewDocument }) => {
   const [response, setResponse] = useState('');
   const [mode, setMode] = useState('chat'); // 'chat' or 'tutor'
   const [currentQuestion, setCurrentQuestion] = useState('');
+  const [questionChunkId, setQuestionChunkId] = useState(null);
   const [isProcessing, setIsProcessing] = useState(false);
   const [error, setError] = useState('');
   
@@ -47,7 +48,7 @@ const VoiceMode = ({ onBack, onNewDocument }) => {
         recognitionRef.current.stop();
       }
     };
-  }, [mode, currentQuestion]);
+  }, [mode, currentQuestion, questionChunkId]);
 
   const startListening = () => {
     if (recognitionRef.current && !isListening) {
@@ -87,7 +88,8 @@ const VoiceMode = ({ onBack, onNewDocument }) => {
         // Voice chat mode
         const res = await axios.post(`${API_URL}/voice/chat`, {
           message: text,
-          mode: 'chat'
+          mode: 'chat',
+          ...documentParams()
         });
         
         setResponse(res.data.response);
@@ -101,7 +103,9 @@ const VoiceMode = ({ onBack, onNewDocument }) => {
 
         const res = await axios.post(`${API_URL}/voice/tutor/evaluate`, {
           question: currentQuestion,
-          user_answer: text
+          chunk_id: questionChunkId,
+          user_answer: text,
+          ...documentParams()
         });
         
         const feedback = `You scored ${res.data.score} out of 10. ${res.data.audio_text}`;
@@ -124,8 +128,9 @@ const VoiceMode = ({ onBack, onNewDocument }) => {
     setResponse('');
 
     try {
-      const res = await axios.get(`${API_URL}/voice/tutor/question`);
+      const res = await axios.get(`${API_URL}/voice/tutor/question`, { params: documentParams() });
       setCurrentQuestion(res.data.question);
+      setQuestionChunkId(res.data.chunk_id || null);
       speak(res.data.audio_text);
     } catch (err) {
       const errorMsg = err.response?.data?.detail || 'Error getting question';
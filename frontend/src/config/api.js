@@ -1,3 +1,9 @@
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
+// The document and user every document-scoped request refers to
+export const documentParams = () => ({
+  document_id: localStorage.getItem('documentId') || '',
+  user_id: localStorage.getItem('userId') || '',
+});
+
 export default API_URL;